@@ -25,15 +25,21 @@ async function runMigration() {
   const client = await pool.connect();
   
   try {
-    const sqlPath = path.join(__dirname, '../../database/init/01_init.sql');
-    console.log(`Leyendo script SQL desde: ${sqlPath}`);
+    // Se ejecutan todos los scripts en orden (01_init.sql, 02_..., etc.), igual que docker-entrypoint-initdb.d
+    const initDir = path.join(__dirname, '../../database/init');
+    const sqlFiles = fs.readdirSync(initDir).filter((f) => f.endsWith('.sql')).sort();
     
-    let sql = fs.readFileSync(sqlPath, 'utf8');
-    
-    console.log('Ejecutando script de inicialización...');
-    
-    // Ejecución de la consulta
-    await client.query(sql);
+    for (const file of sqlFiles) {
+      const sqlPath = path.join(initDir, file);
+      console.log(`Leyendo script SQL desde: ${sqlPath}`);
+      
+      let sql = fs.readFileSync(sqlPath, 'utf8');
+      
+      console.log('Ejecutando script de inicialización...');
+      
+      // Ejecución de la consulta
+      await client.query(sql);
+    }
     
     console.log('Migración completada exitosamente.');
     
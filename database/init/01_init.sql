@@ -15,21 +15,25 @@ CREATE TABLE IF NOT EXISTS projects (
 );
 
 -- 2. Weather Data (Hypertable)
+-- Variables stored as REAL (float4): 4 bytes per value, no numeric decoding on read
 CREATE TABLE IF NOT EXISTS weather_data (
     time TIMESTAMP NOT NULL,
     latitude DECIMAL(10, 6) NOT NULL,
     longitude DECIMAL(10, 6) NOT NULL,
-    temperature_2m DECIMAL(5, 2), -- Celsius
-    radiation DECIMAL(10, 2), -- W/m2 (GHI or DNI depending on column interpretation, usually GHI here)
-    wind_speed_10m DECIMAL(5, 2), -- m/s
-    wind_speed_100m DECIMAL(5, 2), -- m/s
-    precipitation DECIMAL(10, 2), -- mm
-    surface_pressure DECIMAL(10, 2), -- hPa (Added for Density Correction)
+    temperature_2m REAL, -- Celsius
+    radiation REAL, -- W/m2 (GHI or DNI depending on column interpretation, usually GHI here)
+    radiation_dni REAL, -- W/m2 Direct Normal Irradiance (local POA transposition)
+    radiation_dhi REAL, -- W/m2 Diffuse Horizontal Irradiance (local POA transposition)
+    wind_speed_10m REAL, -- m/s
+    wind_speed_100m REAL, -- m/s
+    precipitation REAL, -- mm
+    surface_pressure REAL, -- hPa (Added for Density Correction)
     UNIQUE (time, latitude, longitude)
 );
 
 -- Convert to hypertable partitioned by time
-SELECT create_hypertable('weather_data', 'time', if_not_exists => TRUE);
+-- 1-year chunks: reads are whole years per site, so a site-year touches a single chunk
+SELECT create_hypertable('weather_data', 'time', chunk_time_interval => INTERVAL '1 year', if_not_exists => TRUE);
 
 -- 3. Electricity Prices (Hypertable)
 CREATE TABLE IF NOT EXISTS prices_hourly (
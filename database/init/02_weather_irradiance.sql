@@ -0,0 +1,5 @@
+-- Migration: store DNI and diffuse irradiance alongside GHI so the physics engine
+-- can compute plane-of-array irradiance for any tilt/azimuth from cached data.
+-- Safe to run on fresh databases (columns already created by 01_init.sql).
+ALTER TABLE weather_data ADD COLUMN IF NOT EXISTS radiation_dni REAL; -- W/m2
+ALTER TABLE weather_data ADD COLUMN IF NOT EXISTS radiation_dhi REAL; -- W/m2
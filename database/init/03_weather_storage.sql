@@ -0,0 +1,60 @@
+-- Migration: compact storage for weather_data.
+-- 1. DECIMAL -> REAL (float4) for every weather variable (coordinates keep DECIMAL: they are the lookup key).
+-- 2. 1-year chunks (whole years per site are the access pattern). Applies to chunks created from now on.
+-- 3. Native compression segmented by cell and ordered by time: a site-year becomes a few
+--    compressed batches that decompress straight into the time-ordered range scan.
+-- Safe to re-run and a no-op on fresh databases (01_init.sql already creates REAL columns).
+
+-- Runs under psql (docker-entrypoint-initdb.d / DOCS_DEPLOY.md): \gset, \if and \ir are psql meta-commands.
+SELECT EXISTS (
+    SELECT 1 FROM information_schema.columns
+    WHERE table_name = 'weather_data' AND data_type = 'numeric'
+    AND column_name NOT IN ('latitude', 'longitude')
+) AS weather_needs_float4 \gset
+
+\if :weather_needs_float4
+    -- The continuous aggregates depend on these columns: drop them here and recreate them below,
+    -- so this file is self-contained and re-running it never leaves the aggregates missing.
+    DROP MATERIALIZED VIEW IF EXISTS weather_annual;
+    DROP MATERIALIZED VIEW IF EXISTS weather_monthly;
+    DROP MATERIALIZED VIEW IF EXISTS weather_daily;
+
+    DO $$
+    DECLARE
+        col TEXT;
+    BEGIN
+        FOR col IN
+            SELECT column_name FROM information_schema.columns
+            WHERE table_name = 'weather_data' AND data_type = 'numeric'
+            AND column_name NOT IN ('latitude', 'longitude')
+        LOOP
+            EXECUTE format('ALTER TABLE weather_data ALTER COLUMN %I TYPE REAL USING %I::real', col, col);
+        END LOOP;
+    END $$;
+
+    \ir 04_weather_aggregates.sql
+    -- Recreated aggregates start empty: materialize the stored history once
+    CALL refresh_continuous_aggregate('weather_daily', NULL, NULL);
+    CALL refresh_continuous_aggregate('weather_monthly', NULL, NULL);
+    CALL refresh_continuous_aggregate('weather_annual', NULL, NULL);
+\endif
+
+SELECT set_chunk_time_interval('weather_data', INTERVAL '1 year');
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM timescaledb_information.hypertables
+        WHERE hypertable_name = 'weather_data' AND compression_enabled
+    ) THEN
+        ALTER TABLE weather_data SET (
+            timescaledb.compress,
+            timescaledb.compress_segmentby = 'latitude, longitude',
+            timescaledb.compress_orderby = 'time ASC'
+        );
+    END IF;
+END $$;
+
+-- Reanalysis data is final once ingested: compress every chunk whose range ended more than 30 days ago.
+-- Late upserts (backfills) still work on compressed chunks (TimescaleDB >= 2.11).
+SELECT add_compression_policy('weather_data', compress_after => INTERVAL '30 days', if_not_exists => TRUE);
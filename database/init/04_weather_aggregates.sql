@@ -0,0 +1,74 @@
+-- Resource summaries per grid cell (TimescaleDB continuous aggregates)
+-- Daily -> monthly -> annual (hierarchical). Sums and counts only, so every level
+-- can be re-aggregated exactly; means are computed on read (sum / hours).
+-- Sums are accumulated in float8 (the hourly columns are float4).
+-- materialized_only = false: buckets not yet materialized are computed in real time.
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS weather_daily
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT
+    time_bucket(INTERVAL '1 day', time) AS bucket,
+    latitude,
+    longitude,
+    SUM(radiation::float8) AS ghi_sum, -- Wh/m2
+    SUM(wind_speed_10m::float8) AS wind_10m_sum,
+    SUM(wind_speed_100m::float8) AS wind_100m_sum,
+    COUNT(wind_speed_100m) AS wind_hours,
+    SUM(precipitation::float8) AS precipitation_sum, -- mm
+    SUM(temperature_2m::float8) AS temperature_sum,
+    COUNT(temperature_2m) AS temperature_hours,
+    COUNT(*) AS hours
+FROM weather_data
+GROUP BY bucket, latitude, longitude
+WITH NO DATA;
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS weather_monthly
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT
+    time_bucket(INTERVAL '1 month', bucket) AS bucket,
+    latitude,
+    longitude,
+    SUM(ghi_sum) AS ghi_sum,
+    SUM(wind_10m_sum) AS wind_10m_sum,
+    SUM(wind_100m_sum) AS wind_100m_sum,
+    SUM(wind_hours)::bigint AS wind_hours,
+    SUM(precipitation_sum) AS precipitation_sum,
+    SUM(temperature_sum) AS temperature_sum,
+    SUM(temperature_hours)::bigint AS temperature_hours,
+    SUM(hours)::bigint AS hours
+FROM weather_daily
+GROUP BY 1, latitude, longitude
+WITH NO DATA;
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS weather_annual
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT
+    time_bucket(INTERVAL '1 year', bucket) AS bucket,
+    latitude,
+    longitude,
+    SUM(ghi_sum) AS ghi_sum,
+    SUM(wind_10m_sum) AS wind_10m_sum,
+    SUM(wind_100m_sum) AS wind_100m_sum,
+    SUM(wind_hours)::bigint AS wind_hours,
+    SUM(precipitation_sum) AS precipitation_sum,
+    SUM(temperature_sum) AS temperature_sum,
+    SUM(temperature_hours)::bigint AS temperature_hours,
+    SUM(hours)::bigint AS hours
+FROM weather_monthly
+GROUP BY 1, latitude, longitude
+WITH NO DATA;
+
+-- Point lookups by cell and year
+CREATE INDEX IF NOT EXISTS weather_annual_cell_idx ON weather_annual (latitude, longitude, bucket);
+
+-- Background refresh for recent (live) data. Historical backfills are refreshed
+-- explicitly by the ingestion path (DatabaseManager.refresh_weather_aggregates).
+SELECT add_continuous_aggregate_policy('weather_daily',
+    start_offset => INTERVAL '3 days', end_offset => INTERVAL '1 hour',
+    schedule_interval => INTERVAL '1 hour', if_not_exists => TRUE);
+SELECT add_continuous_aggregate_policy('weather_monthly',
+    start_offset => INTERVAL '3 months', end_offset => INTERVAL '1 day',
+    schedule_interval => INTERVAL '1 day', if_not_exists => TRUE);
+SELECT add_continuous_aggregate_policy('weather_annual',
+    start_offset => INTERVAL '3 years', end_offset => INTERVAL '1 month',
+    schedule_interval => INTERVAL '1 day', if_not_exists => TRUE);
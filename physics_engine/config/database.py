@@ -1,11 +1,204 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, UniqueConstraint, text
+from sqlalchemy import create_engine, event, Column, Integer, String, Float, DateTime, UniqueConstraint, text
 from sqlalchemy.orm import sessionmaker, declarative_base
 from config.settings import settings
+from config.instrumentation import db_metrics, async_db_metrics
+import asyncio
+import asyncpg
 import pandas as pd
+import numpy as np
+import io
+from contextlib import contextmanager, asynccontextmanager
 from datetime import datetime
 
 Base = declarative_base()
 
+# Columnas internas del DataFrame de clima -> columnas de la tabla weather_data
+WEATHER_COLUMN_MAP = {
+    'temperature': 'temperature_2m',
+    'radiation_ghi': 'radiation',
+    'radiation_dni': 'radiation_dni',
+    'radiation_dhi': 'radiation_dhi',
+    'wind_speed_10m': 'wind_speed_10m',
+    'wind_speed_100m': 'wind_speed_100m',
+    'precipitation': 'precipitation',
+    'surface_pressure': 'surface_pressure',
+}
+
+def _prepare_weather_frame(df, lat, lon):
+    """
+    Mapea el DataFrame interno de clima a las columnas de weather_data:
+    time (UTC sin zona, la tabla usa TIMESTAMP), latitude, longitude y variables presentes.
+    """
+    dates = pd.to_datetime(df['date'])
+    if dates.dt.tz is not None:
+        dates = dates.dt.tz_convert(None)
+
+    db_df = pd.DataFrame({'time': dates.to_numpy(dtype='datetime64[s]')})
+    db_df['latitude'] = lat
+    db_df['longitude'] = lon
+    for internal_col, db_col in WEATHER_COLUMN_MAP.items():
+        if internal_col in df:
+            db_df[db_col] = df[internal_col].to_numpy()
+    return db_df
+
+def _weather_merge_sql(columns):
+    """
+    Upsert desde la tabla de staging hacia la hypertable.
+    Un NULL entrante nunca sobreescribe un valor almacenado. Devuelve (insertadas, actualizadas).
+    """
+    column_list = ", ".join(columns)
+    update_list = ", ".join(f"{c} = COALESCE(EXCLUDED.{c}, weather_data.{c})" for c in columns[3:])
+    return f"""
+    WITH upsert AS (
+        INSERT INTO weather_data ({column_list})
+        SELECT DISTINCT ON (time) {column_list} FROM weather_staging ORDER BY time
+        ON CONFLICT (time, latitude, longitude) DO UPDATE SET {update_list}
+        RETURNING (xmax = 0) AS inserted
+    )
+    SELECT count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE NOT inserted) FROM upsert
+    """
+
+WEATHER_STAGING_SQL = "CREATE TEMP TABLE weather_staging (LIKE weather_data INCLUDING DEFAULTS) ON COMMIT DROP"
+
+def _weather_range_sql(lat_param, lon_param, start_param, end_param):
+    """Consulta de rango multianual (solo columnas de los modelos, ya en float8). Placeholders según driver."""
+    select_list = ", ".join(f"{db_col}::float8" for db_col in WEATHER_COLUMN_MAP.values())
+    return f"""
+    SELECT time, {select_list}
+    FROM weather_data
+    WHERE latitude = {lat_param} AND longitude = {lon_param}
+    AND time >= {start_param} AND time < {end_param}
+    ORDER BY time ASC
+    """
+
+def _empty_coverage(start_year, end_year):
+    return {year: {"rows": 0, "complete": False} for year in range(start_year, end_year + 1)}
+
+def _weather_rows_to_frame(rows, start_year, end_year):
+    """
+    Filas (time, variables...) -> (DataFrame con nombres internos, cobertura por año).
+    Los arrays NumPy se construyen directamente (None -> NaN), sin DataFrame intermedio.
+    """
+    coverage = _empty_coverage(start_year, end_year)
+    if not rows:
+        return pd.DataFrame(), coverage
+
+    # Transponer filas a columnas y construir arrays NumPy (None -> NaN)
+    columns = list(zip(*rows))
+    times = np.array(columns[0], dtype='datetime64[ns]')
+    data = {'date': times}
+    for i, internal_col in enumerate(WEATHER_COLUMN_MAP.keys(), start=1):
+        data[internal_col] = np.array(columns[i], dtype=np.float64)
+
+    # Cobertura por año desde el mismo resultado: 8760 horas por año, umbral del 90%
+    years = times.astype('datetime64[Y]').astype(np.int64) + 1970
+    counts = np.bincount(years - start_year, minlength=end_year - start_year + 1)
+    for offset, n in enumerate(counts):
+        coverage[start_year + offset] = {"rows": int(n), "complete": bool(n > 8000)}
+
+    return pd.DataFrame(data, copy=False), coverage
+
+# Agregados continuos de weather_data, en orden jerárquico (diario -> mensual -> anual)
+WEATHER_AGGREGATE_VIEWS = ("weather_daily", "weather_monthly", "weather_annual")
+
+RESOURCE_SUMMARY_COLUMNS = (
+    "ghi_sum", "wind_10m_sum", "wind_100m_sum", "wind_hours",
+    "precipitation_sum", "temperature_sum", "temperature_hours", "hours"
+)
+
+def _resource_summary_sql(lat_param, lon_param, year_param):
+    """Resumen anual de una celda: una sola fila del agregado weather_annual."""
+    return f"""
+    SELECT {", ".join(RESOURCE_SUMMARY_COLUMNS)}
+    FROM weather_annual
+    WHERE latitude = {lat_param} AND longitude = {lon_param} AND bucket = {year_param}
+    """
+
+def _resource_summary(sums):
+    """Sumas/recuentos del agregado -> magnitudes del recurso (medias = suma / horas)."""
+    hours = int(sums["hours"] or 0)
+    wind_hours = int(sums["wind_hours"] or 0)
+    temperature_hours = int(sums["temperature_hours"] or 0)
+    return {
+        "hours": hours,
+        "complete": hours > 8000, # mismo umbral del 90% que la cobertura horaria
+        "peak_sun_hours": float(sums["ghi_sum"] or 0.0) / 1000.0, # Wh/m2 -> kWh/m2 (HSP)
+        "wind_speed_10m_mean": float(sums["wind_10m_sum"] or 0.0) / wind_hours if wind_hours else None,
+        "wind_speed_100m_mean": float(sums["wind_100m_sum"] or 0.0) / wind_hours if wind_hours else None,
+        "precipitation_sum": float(sums["precipitation_sum"] or 0.0),
+        "temperature_mean": float(sums["temperature_sum"] or 0.0) / temperature_hours if temperature_hours else None
+    }
+
+def resource_summary_from_frame(df):
+    """Mismo resumen que weather_annual, calculado desde un DataFrame horario (ruta sin agregado)."""
+    def column(name):
+        return df[name].to_numpy(dtype=np.float64) if name in df else np.full(len(df), np.nan)
+    ghi, wind_10m, wind_100m = column("radiation_ghi"), column("wind_speed_10m"), column("wind_speed_100m")
+    precipitation, temperature = column("precipitation"), column("temperature")
+    return _resource_summary({
+        "ghi_sum": np.nansum(ghi),
+        "wind_10m_sum": np.nansum(wind_10m),
+        "wind_100m_sum": np.nansum(wind_100m),
+        "wind_hours": np.count_nonzero(~np.isnan(wind_100m)),
+        "precipitation_sum": np.nansum(precipitation),
+        "temperature_sum": np.nansum(temperature),
+        "temperature_hours": np.count_nonzero(~np.isnan(temperature)),
+        "hours": len(df)
+    })
+
+# Curvas de precio horarias (prices_hourly): un año = 8760 horas, como las curvas sintéticas de MarketModel
+PRICE_CURVE_HOURS = 8760
+
+def _price_curve_sql(source_param, start_param, end_param):
+    """Precios horarios de una fuente en [start, end) (float8: sin objetos Decimal)."""
+    return f"""
+    SELECT time, price_eur_mwh::float8
+    FROM prices_hourly
+    WHERE source = {source_param} AND time >= {start_param} AND time < {end_param}
+    ORDER BY time ASC
+    """
+
+def _price_rows_to_curve(rows, year):
+    """
+    Filas (time, precio) -> array de 8760 horas del año, o None si la cobertura no llega al 90%.
+    Los huecos aislados se rellenan por interpolación lineal; la hora 8761+ (año bisiesto) se descarta.
+    """
+    if not rows:
+        return None
+    times, values = zip(*rows)
+    hour_index = (np.array(times, dtype='datetime64[h]') - np.datetime64(f"{int(year)}-01-01T00", 'h')).astype(np.int64)
+    values = np.array(values, dtype=np.float64)
+    keep = (hour_index >= 0) & (hour_index < PRICE_CURVE_HOURS) & ~np.isnan(values)
+    hour_index, values = hour_index[keep], values[keep]
+    if len(hour_index) <= 8000:
+        return None
+    return np.interp(np.arange(PRICE_CURVE_HOURS), hour_index, values)
+
+def _price_curve_records(prices, year, source):
+    """Registros (time, precio, fuente) para COPY: hora h del año -> 1 de enero + h horas."""
+    start = datetime(int(year), 1, 1)
+    times = pd.date_range(start, periods=len(prices), freq="h").to_pydatetime()
+    return [(t, round(float(p), 2), source) for t, p in zip(times, prices)]
+
+PRICES_STAGING_SQL = "CREATE TEMP TABLE prices_staging (LIKE prices_hourly INCLUDING DEFAULTS) ON COMMIT DROP"
+
+PRICES_MERGE_SQL = """
+INSERT INTO prices_hourly (time, price_eur_mwh, source)
+SELECT time, price_eur_mwh, source FROM prices_staging
+ON CONFLICT (time, source) DO UPDATE SET price_eur_mwh = EXCLUDED.price_eur_mwh
+"""
+
+def _aggregate_refresh_window(df):
+    """Ventana de refresco alineada a años completos (los buckets parcialmente cubiertos no se refrescan)."""
+    dates = pd.to_datetime(df['date'])
+    if dates.dt.tz is not None:
+        dates = dates.dt.tz_convert(None)
+    return datetime(dates.min().year, 1, 1), datetime(dates.max().year + 1, 1, 1)
+
+def _requires_ssl():
+    # SSL básico para bases de datos en la nube (Neon, AWS RDS, etc.)
+    return "localhost" not in settings.DB_HOST and "timescaledb" not in settings.DB_HOST
+
 # Definir Modelo de Tabla de Clima (Coincide con init.sql aproximadamente vía ORM)
 class WeatherData(Base):
     __tablename__ = 'weather_data'
@@ -21,6 +214,8 @@ class WeatherData(Base):
     longitude = Column(Float, primary_key=True)
     temperature_2m = Column(Float)
     radiation = Column(Float) # GHI
+    radiation_dni = Column(Float, nullable=True) # DNI (para transposición local a POA)
+    radiation_dhi = Column(Float, nullable=True) # Difusa horizontal
     wind_speed_10m = Column(Float)
     wind_speed_100m = Column(Float)
     precipitation = Column(Float)
@@ -29,17 +224,10 @@ class WeatherData(Base):
 
 class DatabaseManager:
     def __init__(self):
-        # Determine SSL requirement based on Host
-        connect_args = {}
-        if "localhost" not in settings.DB_HOST and "timescaledb" not in settings.DB_HOST:
-             # Basic SSL for Neon/Cloud
-            connect_args = {"sslmode": "require"}
-
-        self.engine = create_engine(
-            settings.DATABASE_URL,
-            connect_args=connect_args
-        )
-        self.Session = sessionmaker(bind=self.engine)
+        self.engine = None
+        self.Session = None
+        # El engine se crea aquí con la configuración del pool de settings (no conecta hasta el primer uso)
+        self.init_db_connection()
 
     def get_session(self):
         return self.Session()
@@ -61,7 +249,7 @@ class DatabaseManager:
         """)
         
         try:
-            with self.engine.connect() as conn:
+            with self._connect() as conn:
                 result = conn.execute(query, {
                     "lat": lat, 
                     "lon": lon, 
@@ -74,78 +262,234 @@ class DatabaseManager:
             # Table doesn't exist or connection error
             return False
 
-    def save_weather_data(self, df, lat, lon):
+    def save_weather_data(self, df, lat, lon, raise_errors=False):
         """
-        Bulk save dataframe to DB.
-        Expects df to have standard columns.
+        Ingesta masiva en weather_data mediante COPY + tabla de staging + upsert.
+        1. COPY del DataFrame (CSV en memoria) a una tabla temporal.
+        2. INSERT ... ON CONFLICT (time, latitude, longitude) DO UPDATE hacia la hypertable.
+        Los solapamientos parciales actualizan las filas existentes en lugar de descartar el lote,
+        y un valor nulo entrante nunca sobreescribe un valor ya almacenado.
+        Retorna {"inserted": n, "updated": m}.
+        raise_errors: propaga los fallos de ingesta y de refresco de agregados (trabajos de backfill);
+        por defecto se registran y la petición en curso continúa con los datos ya descargados.
         """
-        # Map DF columns to Table columns
-        # DF has: date, temperature, precipitation, wind_speed_10m...
-        
-        # Prepare for DB
-        db_df = pd.DataFrame()
-        db_df['time'] = df['date']
-        db_df['latitude'] = lat
-        db_df['longitude'] = lon
-        db_df['temperature_2m'] = df.get('temperature')
-        db_df['radiation'] = df.get('radiation_ghi')
-        db_df['wind_speed_10m'] = df.get('wind_speed_10m')
-        db_df['wind_speed_100m'] = df.get('wind_speed_100m')
-        db_df['precipitation'] = df.get('precipitation')
-        if 'surface_pressure' in df:
-            db_df['surface_pressure'] = df['surface_pressure']
-            
-        # Write to SQL
-        try:
-            # Chunksize is important for network performance
-            db_df.to_sql('weather_data', self.engine, if_exists='append', index=False, method='multi', chunksize=1000)
-            print(f"Saved {len(db_df)} rows to weather_data for ({lat}, {lon})")
+        result = {"inserted": 0, "updated": 0}
+        if df is None or df.empty:
+            return result
+
+        # Prepare for DB (mapear nombres internos -> columnas de la tabla)
+        db_df = _prepare_weather_frame(df, lat, lon)
+        # Fechas pre-formateadas en ISO (mucho más rápido que date_format en to_csv)
+        db_df['time'] = np.datetime_as_string(db_df['time'].to_numpy(dtype='datetime64[s]'), unit='s')
+        columns = list(db_df.columns)
+
+        # CSV en memoria: los NaN se escriben como campo vacío, que COPY interpreta como NULL
+        buffer = io.StringIO()
+        db_df.to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+
+        try:
+            # COPY requiere la conexión DBAPI (psycopg2) subyacente
+            with self._raw_connection() as conn:
+                try:
+                    with db_metrics.query("weather_copy_upsert").time(), conn.cursor() as cur:
+                        cur.execute(WEATHER_STAGING_SQL)
+                        cur.copy_expert(f"COPY weather_staging ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+                        cur.execute(_weather_merge_sql(columns))
+                        inserted, updated = cur.fetchone()
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+            result = {"inserted": int(inserted), "updated": int(updated)}
+            print(f"Saved weather_data for ({lat}, {lon}): {result['inserted']} inserted, {result['updated']} updated")
+        except Exception as e:
+            if raise_errors:
+                raise
+            print(f"Error saving to DB: {e}")
+            return result
+
+        # Mantener al día los resúmenes (los datos históricos quedan fuera de la política de refresco)
+        if result["inserted"] or result["updated"]:
+            try:
+                self.refresh_weather_aggregates(*_aggregate_refresh_window(df))
+            except Exception as e:
+                if raise_errors:
+                    raise
+                # Sin refresco los agregados siguen siendo correctos (agregación en tiempo real), solo más lentos
+                print(f"Aviso: no se pudieron refrescar los agregados de clima: {e}")
+        return result
+
+    def refresh_weather_aggregates(self, start, end):
+        """
+        Materializa los agregados continuos en [start, end) tras una ingesta.
+        refresh_continuous_aggregate no puede ejecutarse dentro de una transacción: la conexión se abre
+        en modo AUTOCOMMIT (el pool restablece el aislamiento al devolverla). Los errores se propagan.
+        """
+        with db_metrics.pool_wait.time():
+            conn = self.engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+        with conn, db_metrics.query("weather_aggregates_refresh").time():
+            for view in WEATHER_AGGREGATE_VIEWS:
+                conn.execute(
+                    text(f"CALL refresh_continuous_aggregate('{view}', CAST(:start AS timestamp), CAST(:end AS timestamp))"),
+                    {"start": start, "end": end}
+                )
+
+    def load_resource_summary(self, lat, lon, year):
+        """
+        Resumen anual del recurso (radiación, viento, precipitación) de una celda desde weather_annual.
+        Retorna el dict de _resource_summary o None si la celda/año no está en BD.
+        """
+        query = text(_resource_summary_sql(":lat", ":lon", ":year_start"))
+        try:
+            with self._connect() as conn, db_metrics.query("resource_summary").time():
+                row = conn.execute(query, {"lat": lat, "lon": lon, "year_start": datetime(int(year), 1, 1)}).mappings().first()
         except Exception as e:
-            print(f"Error saving to DB (duplicate or constraint): {e}") 
+            print(f"Error reading resource summary from DB: {e}")
+            return None
+        return _resource_summary(row) if row else None
 
     def load_weather_data(self, lat, lon, year):
         """
         Load from DB into DataFrame format expected by models.
         """
-        start_date = f"{year}-01-01"
-        end_date = f"{year}-12-31"
-        
+        df, _ = self.load_weather_range(lat, lon, year, year)
+        return df
+
+    def load_weather_range(self, lat, lon, start_year, end_year):
+        """
+        Carga varios años [start_year, end_year] de una ubicación en UNA sola consulta.
+        - Selecciona solo las columnas que usan los modelos (REAL en la tabla, float8 en la respuesta:
+          sin objetos Decimal) y las lee directamente a arrays NumPy.
+        - Calcula la cobertura por año a partir del mismo resultado (sin count(*) adicional).
+        Retorna (df, coverage) donde coverage = {año: {"rows": n, "complete": bool}}.
+        """
+        start_year, end_year = int(start_year), int(end_year)
+        params = {
+            "lat": lat,
+            "lon": lon,
+            "start_date": datetime(start_year, 1, 1),
+            "end_date": datetime(end_year + 1, 1, 1)
+        }
+
+        try:
+            with self._raw_connection() as conn:
+                # Sentencia preparada por conexión (ver _prepare_statements); si no existe, SQL directo
+                if conn.info.get("weather_range_prepared"):
+                    query = "EXECUTE weather_range(%(lat)s, %(lon)s, %(start_date)s, %(end_date)s)"
+                else:
+                    query = _weather_range_sql("%(lat)s", "%(lon)s", "%(start_date)s", "%(end_date)s")
+                with db_metrics.query("weather_range").time(), conn.cursor() as cur:
+                    cur.execute(query, params)
+                    rows = cur.fetchall()
+                conn.commit()
+        except Exception as e:
+            print(f"Error reading from DB: {e}")
+            return pd.DataFrame(), _empty_coverage(start_year, end_year)
+
+        return _weather_rows_to_frame(rows, start_year, end_year)
+
+    def load_price_curve(self, year, source):
+        """
+        Curva horaria de precios (8760 valores) de una fuente ('OMIE', 'PREDICTION'...) para un año.
+        Retorna None si la fuente/año no está en BD o está incompleto (el llamador usa la curva sintética).
+        """
+        query = text(_price_curve_sql(":source", ":start_date", ":end_date"))
+        params = {"source": source, "start_date": datetime(int(year), 1, 1), "end_date": datetime(int(year) + 1, 1, 1)}
+        try:
+            with self._connect() as conn, db_metrics.query("price_curve").time():
+                rows = conn.execute(query, params).fetchall()
+        except Exception as e:
+            print(f"Error reading price curve from DB: {e}")
+            return None
+        return _price_rows_to_curve(rows, year)
+
+    def load_weather_cells(self):
+        """
+        Lista de celdas (lat, lon) con clima almacenado, para el índice espacial (etl/grid_index.py).
+        """
+        query = text("SELECT DISTINCT latitude::float8, longitude::float8 FROM weather_data")
+        try:
+            with self._connect() as conn, db_metrics.query("weather_cells").time():
+                return [(float(lat), float(lon)) for lat, lon in conn.execute(query)]
+        except Exception as e:
+            print(f"Error reading weather cells from DB: {e}")
+            return []
+
+    def load_weather_coverage(self, start_year, end_year):
+        """
+        Filas almacenadas por (celda, año) en el rango, para planificar backfills.
+        Retorna {(lat, lon): {año: filas}}.
+        """
         query = text("""
-        SELECT * FROM weather_data 
-        WHERE latitude = :lat AND longitude = :lon
-        AND time >= :start_date AND time <= :end_date
-        ORDER BY time ASC
+        SELECT latitude::float8, longitude::float8, extract(year FROM time)::int AS year, count(*)
+        FROM weather_data
+        WHERE time >= :start_date AND time < :end_date
+        GROUP BY 1, 2, 3
         """)
-        
+        coverage = {}
         try:
-            # pd.read_sql can take a connection and params in recent versions, 
-            # but standard way with sqlalchemy engine is safer to bind manually or use params arg
-            with self.engine.connect() as conn:
-                 df = pd.read_sql(query, conn, params={
-                    "lat": lat, 
-                    "lon": lon, 
-                    "start_date": start_date, 
-                    "end_date": end_date
-                 })
-            
-            if df.empty:
-                return pd.DataFrame()
-
-            # Remap back to internal naming
-            out_df = pd.DataFrame()
-            out_df['date'] = pd.to_datetime(df['time'])
-            out_df['temperature'] = df['temperature_2m']
-            out_df['radiation_ghi'] = df['radiation']
-            out_df['wind_speed_10m'] = df['wind_speed_10m']
-            out_df['wind_speed_100m'] = df.get('wind_speed_100m', 0) # Handle missing col if old schema
-            out_df['precipitation'] = df['precipitation']
-            if 'surface_pressure' in df:
-                out_df['surface_pressure'] = df['surface_pressure']
-            
-            return out_df
+            with self._connect() as conn, db_metrics.query("weather_coverage").time():
+                rows = conn.execute(query, {
+                    "start_date": datetime(int(start_year), 1, 1),
+                    "end_date": datetime(int(end_year) + 1, 1, 1)
+                })
+                for lat, lon, year, n in rows:
+                    coverage.setdefault((float(lat), float(lon)), {})[int(year)] = int(n)
         except Exception as e:
-            print(f"Error reading from DB: {e}")
-            return pd.DataFrame()
+            print(f"Error reading weather coverage from DB: {e}")
+        return coverage
+
+    @contextmanager
+    def _raw_connection(self):
+        """Conexión DBAPI del pool, midiendo el tiempo de espera en el checkout."""
+        with db_metrics.pool_wait.time():
+            conn = self.engine.raw_connection()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _connect(self):
+        """Conexión SQLAlchemy del pool, midiendo el tiempo de espera en el checkout."""
+        with db_metrics.pool_wait.time():
+            conn = self.engine.connect()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _prepare_statements(dbapi_connection, connection_record):
+        """
+        Evento 'connect': prepara en cada conexión nueva las consultas fijas de clima,
+        de modo que el plan se reutiliza en lugar de analizarse en cada petición.
+        """
+        try:
+            with dbapi_connection.cursor() as cur:
+                cur.execute(
+                    "PREPARE weather_range (numeric, numeric, timestamp, timestamp) AS "
+                    + _weather_range_sql("$1", "$2", "$3", "$4")
+                )
+            dbapi_connection.commit()
+            connection_record.info["weather_range_prepared"] = True
+        except Exception as e:
+            # Esquema antiguo o tabla inexistente: se usará el SQL directo
+            dbapi_connection.rollback()
+            connection_record.info["weather_range_prepared"] = False
+            print(f"Aviso: no se pudo preparar weather_range: {e}")
+
+    def pool_stats(self):
+        """Estado del pool síncrono: conexiones en uso, libres y en overflow."""
+        pool = self.engine.pool
+        return {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": pool.overflow(),
+            "max_overflow": settings.DB_MAX_OVERFLOW
+        }
 
     def init_db_connection(self):
         if self.engine:
@@ -154,20 +498,184 @@ class DatabaseManager:
         try:
             # Handle SSL for Cloud Databases (Neon, AWS RDS, etc)
             connect_args = {}
-            if "localhost" not in settings.DB_HOST and "timescaledb" not in settings.DB_HOST:
-                connect_args = {"sslmode": "require"}
+            if _requires_ssl():
+                connect_args["sslmode"] = "require"
+            if settings.DB_STATEMENT_TIMEOUT_MS > 0:
+                connect_args["options"] = f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"
 
             self.engine = create_engine(
                 settings.DATABASE_URL, 
-                pool_pre_ping=True, 
-                pool_size=10, 
-                max_overflow=20,
+                pool_pre_ping=settings.DB_POOL_PRE_PING, 
+                pool_size=settings.DB_POOL_SIZE, 
+                max_overflow=settings.DB_MAX_OVERFLOW,
+                pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+                pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
                 connect_args=connect_args
             )
+            event.listen(self.engine, "connect", self._prepare_statements)
             # Not using global SessionLocal here, just instance Session
             self.Session = sessionmaker(bind=self.engine)
-            print("Database connection initialized.")
         except Exception as e:
             print(f"Error initializing database connection: {e}")
 
-db = DatabaseManager()
\ No newline at end of file
+class AsyncDatabaseManager:
+    """
+    Acceso a BD no bloqueante (asyncpg) para los endpoints async.
+    Mismas consultas que DatabaseManager, pero sin ocupar el bucle de eventos durante la espera de E/S.
+    El pool se crea perezosamente dentro del bucle de eventos en el primer uso.
+    """
+    def __init__(self):
+        self.pool = None
+        self._pool_lock = None
+
+    async def get_pool(self):
+        if self.pool is None:
+            if self._pool_lock is None:
+                self._pool_lock = asyncio.Lock()
+            async with self._pool_lock:
+                if self.pool is None:
+                    server_settings = {}
+                    if settings.DB_STATEMENT_TIMEOUT_MS > 0:
+                        server_settings["statement_timeout"] = str(settings.DB_STATEMENT_TIMEOUT_MS)
+                    # asyncpg cachea las sentencias preparadas por conexión (statement_cache_size)
+                    self.pool = await asyncpg.create_pool(
+                        settings.DATABASE_URL,
+                        min_size=settings.DB_ASYNC_POOL_MIN_SIZE,
+                        max_size=settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW,
+                        max_inactive_connection_lifetime=settings.DB_POOL_RECYCLE_SECONDS,
+                        server_settings=server_settings,
+                        ssl="require" if _requires_ssl() else None
+                    )
+        return self.pool
+
+    async def load_weather_range(self, lat, lon, start_year, end_year):
+        """Versión async de DatabaseManager.load_weather_range. Retorna (df, coverage)."""
+        start_year, end_year = int(start_year), int(end_year)
+        # Coordenadas como numeric (igual que los literales de psycopg2) para usar el índice único
+        query = _weather_range_sql("$1::numeric", "$2::numeric", "$3", "$4")
+        try:
+            async with self.acquire() as conn:
+                with async_db_metrics.query("weather_range").time():
+                    rows = await conn.fetch(
+                        query, str(lat), str(lon),
+                        datetime(start_year, 1, 1), datetime(end_year + 1, 1, 1)
+                    )
+        except Exception as e:
+            print(f"Error reading from DB: {e}")
+            return pd.DataFrame(), _empty_coverage(start_year, end_year)
+
+        return _weather_rows_to_frame(rows, start_year, end_year)
+
+    async def load_resource_summary(self, lat, lon, year):
+        """Versión async de DatabaseManager.load_resource_summary (lectura de una fila)."""
+        query = _resource_summary_sql("$1::numeric", "$2::numeric", "$3")
+        try:
+            async with self.acquire() as conn:
+                with async_db_metrics.query("resource_summary").time():
+                    row = await conn.fetchrow(query, str(lat), str(lon), datetime(int(year), 1, 1))
+        except Exception as e:
+            print(f"Error reading resource summary from DB: {e}")
+            return None
+        return _resource_summary(row) if row else None
+
+    async def refresh_weather_aggregates(self, start, end):
+        """Versión async de DatabaseManager.refresh_weather_aggregates (fuera de transacción; los errores se propagan)."""
+        async with self.acquire() as conn:
+            with async_db_metrics.query("weather_aggregates_refresh").time():
+                for view in WEATHER_AGGREGATE_VIEWS:
+                    await conn.execute(
+                        f"CALL refresh_continuous_aggregate('{view}', $1::timestamp, $2::timestamp)", start, end
+                    )
+
+    async def save_weather_data(self, df, lat, lon, raise_errors=False):
+        """Versión async de DatabaseManager.save_weather_data (COPY binario + upsert)."""
+        result = {"inserted": 0, "updated": 0}
+        if df is None or df.empty:
+            return result
+
+        db_df = _prepare_weather_frame(df, lat, lon)
+        columns = list(db_df.columns)
+        # Registros Python para COPY binario: datetime nativo y None en lugar de NaN
+        times = db_df['time'].dt.to_pydatetime()
+        values = db_df[columns[1:]].astype(object).where(db_df[columns[1:]].notna(), None).to_numpy()
+        records = [(t, *row) for t, row in zip(times, values)]
+
+        try:
+            async with self.acquire() as conn:
+                with async_db_metrics.query("weather_copy_upsert").time():
+                    async with conn.transaction():
+                        await conn.execute(WEATHER_STAGING_SQL)
+                        await conn.copy_records_to_table("weather_staging", records=records, columns=columns)
+                        inserted, updated = await conn.fetchrow(_weather_merge_sql(columns))
+            result = {"inserted": int(inserted), "updated": int(updated)}
+            print(f"Saved weather_data for ({lat}, {lon}): {result['inserted']} inserted, {result['updated']} updated")
+        except Exception as e:
+            if raise_errors:
+                raise
+            print(f"Error saving to DB: {e}")
+            return result
+
+        if result["inserted"] or result["updated"]:
+            try:
+                await self.refresh_weather_aggregates(*_aggregate_refresh_window(df))
+            except Exception as e:
+                if raise_errors:
+                    raise
+                print(f"Aviso: no se pudieron refrescar los agregados de clima: {e}")
+        return result
+
+    async def load_price_curve(self, year, source):
+        """Versión async de DatabaseManager.load_price_curve."""
+        query = _price_curve_sql("$1", "$2", "$3")
+        try:
+            async with self.acquire() as conn:
+                with async_db_metrics.query("price_curve").time():
+                    rows = await conn.fetch(query, source, datetime(int(year), 1, 1), datetime(int(year) + 1, 1, 1))
+        except Exception as e:
+            print(f"Error reading price curve from DB: {e}")
+            return None
+        return _price_rows_to_curve(rows, year)
+
+    async def save_price_curve(self, prices, year, source):
+        """
+        Guarda una curva horaria en prices_hourly (COPY + upsert por (time, source)), p.ej. una curva
+        sintética con semilla bajo source='PREDICTION' para reutilizarla después. Retorna las filas escritas.
+        """
+        records = _price_curve_records(prices, year, source)
+        try:
+            async with self.acquire() as conn:
+                with async_db_metrics.query("price_curve_upsert").time():
+                    async with conn.transaction():
+                        await conn.execute(PRICES_STAGING_SQL)
+                        await conn.copy_records_to_table("prices_staging", records=records, columns=["time", "price_eur_mwh", "source"])
+                        await conn.execute(PRICES_MERGE_SQL)
+        except Exception as e:
+            print(f"Error saving price curve to DB: {e}")
+            return 0
+        return len(records)
+
+    @asynccontextmanager
+    async def acquire(self):
+        """Conexión del pool asyncpg, midiendo el tiempo de espera en el checkout."""
+        pool = await self.get_pool()
+        with async_db_metrics.pool_wait.time():
+            conn = await pool.acquire()
+        try:
+            yield conn
+        finally:
+            await pool.release(conn)
+
+    def pool_stats(self):
+        if self.pool is None:
+            return {"size": 0, "checked_out": 0, "idle": 0, "max_size": settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW}
+        size = self.pool.get_size()
+        idle = self.pool.get_idle_size()
+        return {"size": size, "checked_out": size - idle, "idle": idle, "max_size": self.pool.get_max_size()}
+
+    async def close(self):
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+db = DatabaseManager()
+async_db = AsyncDatabaseManager()
\ No newline at end of file
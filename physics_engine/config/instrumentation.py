@@ -0,0 +1,90 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Límites de los cubos de latencia (ms), al estilo de los histogramas de Prometheus
+DEFAULT_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class LatencyHistogram:
+    """Histograma de latencias con cubos fijos (thread-safe) y percentiles aproximados."""
+    def __init__(self, buckets_ms=DEFAULT_BUCKETS_MS):
+        self.buckets_ms = tuple(buckets_ms)
+        self.counts = [0] * (len(self.buckets_ms) + 1) # último cubo: +Inf
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value_ms):
+        index = len(self.buckets_ms)
+        for i, bound in enumerate(self.buckets_ms):
+            if value_ms <= bound:
+                index = i
+                break
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total_ms += value_ms
+            self.max_ms = max(self.max_ms, value_ms)
+
+    @contextmanager
+    def time(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe((time.perf_counter() - started) * 1000.0)
+
+    def _percentile(self, q):
+        # Límite superior del cubo que contiene el percentil q
+        target = q * self.count
+        cumulative = 0
+        for i, n in enumerate(self.counts):
+            cumulative += n
+            if cumulative >= target:
+                return self.buckets_ms[i] if i < len(self.buckets_ms) else self.max_ms
+        return self.max_ms
+
+    def snapshot(self):
+        with self._lock:
+            labels = [f"le_{b}" for b in self.buckets_ms] + ["le_inf"]
+            return {
+                "count": self.count,
+                "mean_ms": self.total_ms / self.count if self.count else 0.0,
+                "max_ms": self.max_ms,
+                "p50_ms": self._percentile(0.50) if self.count else 0.0,
+                "p95_ms": self._percentile(0.95) if self.count else 0.0,
+                "p99_ms": self._percentile(0.99) if self.count else 0.0,
+                "buckets": dict(zip(labels, self.counts))
+            }
+
+
+class DatabaseMetrics:
+    """
+    Métricas del subsistema de conexiones:
+    - pool_wait: tiempo esperando una conexión del pool (inanición del pool).
+    - queries[nombre]: latencia de cada consulta fija (coste en la propia BD).
+    """
+    def __init__(self):
+        self.pool_wait = LatencyHistogram()
+        self.queries = {}
+        self._lock = threading.Lock()
+
+    def query(self, name):
+        with self._lock:
+            if name not in self.queries:
+                self.queries[name] = LatencyHistogram()
+            return self.queries[name]
+
+    def snapshot(self):
+        with self._lock:
+            queries = dict(self.queries)
+        return {
+            "pool_wait": self.pool_wait.snapshot(),
+            "queries": {name: h.snapshot() for name, h in queries.items()}
+        }
+
+
+db_metrics = DatabaseMetrics()
+async_db_metrics = DatabaseMetrics()
@@ -7,6 +7,10 @@ load_dotenv()
 class Settings:
     # URL de API meteorológica
     OPENMETEO_URL = os.getenv("OPENMETEO_URL", "https://archive-api.open-meteo.com/v1/archive")
+    # Años máximos por llamada al archivo histórico (los rangos mayores se parten en tramos)
+    OPENMETEO_MAX_SPAN_YEARS = int(os.getenv("OPENMETEO_MAX_SPAN_YEARS", 10))
+    # Descargas simultáneas máximas cuando un rango se divide en varios tramos
+    OPENMETEO_MAX_CONCURRENCY = int(os.getenv("OPENMETEO_MAX_CONCURRENCY", 4))
 
     # Credenciales de Base de Datos
     DB_HOST = os.getenv("DB_HOST", "localhost")
@@ -18,11 +22,58 @@ class Settings:
     # Cadena de conexión SQLAlchemy
     DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
+    # Pool de conexiones (SQLAlchemy síncrono y asyncpg)
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+    DB_POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", 30))
+    DB_POOL_RECYCLE_SECONDS = int(os.getenv("DB_POOL_RECYCLE_SECONDS", 1800))
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    DB_ASYNC_POOL_MIN_SIZE = int(os.getenv("DB_ASYNC_POOL_MIN_SIZE", 1))
+    # Límite por sentencia en el servidor (0 = sin límite)
+    DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", 30000))
+
+    # Caché de clima en memoria (LRU por bytes con stale-while-revalidate)
+    WEATHER_CACHE_MAX_BYTES = int(os.getenv("WEATHER_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+    WEATHER_CACHE_TTL_SECONDS = float(os.getenv("WEATHER_CACHE_TTL_SECONDS", 6 * 3600))
+    WEATHER_CACHE_STALE_SECONDS = float(os.getenv("WEATHER_CACHE_STALE_SECONDS", 24 * 3600))
+
+    # Almacén columnar local en disco (un .npy por variable, celda y año) delante de TimescaleDB
+    WEATHER_STORE_DIR = os.getenv("WEATHER_STORE_DIR", ".weather_store")
+    WEATHER_STORE_MAX_BYTES = int(os.getenv("WEATHER_STORE_MAX_BYTES", 2 * 1024 * 1024 * 1024))
+
+    # Rejilla de reanálisis (grados): las coordenadas se ajustan a su celda para compartir caché
+    WEATHER_GRID_RESOLUTION = float(os.getenv("WEATHER_GRID_RESOLUTION", 0.1))
+    # Distancia máxima (grados) para reutilizar una celda ya almacenada en BD
+    WEATHER_GRID_TOLERANCE = float(os.getenv("WEATHER_GRID_TOLERANCE", 0.05))
+
     # Valores por defecto de simulación
     DEFAULT_YEARS = int(os.getenv("DEFAULT_YEARS", 25))
     BASE_YEAR = int(os.getenv("BASE_YEAR", 2023))
+    # Escenarios máximos por petición en /predict/solar/batch (memoria ~ escenarios x horas)
+    SOLAR_BATCH_MAX_SCENARIOS = int(os.getenv("SOLAR_BATCH_MAX_SCENARIOS", 200))
+    # Puntos máximos de la rejilla en /predict/hydro/sweep
+    HYDRO_SWEEP_MAX_POINTS = int(os.getenv("HYDRO_SWEEP_MAX_POINTS", 2500))
+    # Trayectorias de precio máximas en /predict/biomass/monte-carlo (memoria ~ trayectorias x 8760 x 8 B)
+    BIOMASS_MAX_PRICE_PATHS = int(os.getenv("BIOMASS_MAX_PRICE_PATHS", 2000))
+    # Años máximos de vida útil en /predict/lifetime-hourly (streaming: la memoria no depende de los años)
+    PROJECTION_MAX_YEARS = int(os.getenv("PROJECTION_MAX_YEARS", 100))
+    # Proyectos máximos por petición en /predict/portfolio
+    PORTFOLIO_MAX_PROJECTS = int(os.getenv("PORTFOLIO_MAX_PROJECTS", 500))
     
+    # Caché de resultados de /predict/* (clave: hash de la petición + huella de modelos)
+    RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", 128 * 1024 * 1024))
+    RESULT_CACHE_TTL_SECONDS = float(os.getenv("RESULT_CACHE_TTL_SECONDS", 24 * 3600))
+    # Nivel en disco opcional (vacío = desactivado)
+    RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR", "")
+    RESULT_CACHE_DISK_MAX_BYTES = int(os.getenv("RESULT_CACHE_DISK_MAX_BYTES", 1024 * 1024 * 1024))
+
+    # Caché de perfiles horarios por kW instalado (sitio, tecnología, parámetros físicos)
+    UNIT_PROFILE_CACHE_MAX_BYTES = int(os.getenv("UNIT_PROFILE_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+    UNIT_PROFILE_CACHE_TTL_SECONDS = float(os.getenv("UNIT_PROFILE_CACHE_TTL_SECONDS", 6 * 3600))
+
     # Valores por defecto de Mercado/Financiero
     DEFAULT_PRICE_EUR_MWH = float(os.getenv("DEFAULT_PRICE_EUR_MWH", 50.0))
+    # Semilla de las curvas de precio sintéticas de /predict/biomass cuando la petición no indica price_seed
+    DEFAULT_PRICE_SEED = int(os.getenv("DEFAULT_PRICE_SEED", 42))
 
 settings = Settings()
@@ -0,0 +1,144 @@
+import asyncio
+import httpx
+import numpy as np
+import pandas as pd
+from functools import partial
+from config.settings import settings
+from config.database import async_db
+from etl.weather_connector import WeatherConnector, weather_flight_key
+from etl.grid_index import grid_index
+from etl.single_flight import weather_flight
+
+# Variables horarias de Open-Meteo -> nombres internos del DataFrame de clima
+OPENMETEO_HOURLY_VARIABLES = {
+    "temperature_2m": "temperature",
+    "precipitation": "precipitation",
+    "wind_speed_10m": "wind_speed_10m",
+    "wind_speed_100m": "wind_speed_100m",
+    "shortwave_radiation": "radiation_ghi",
+    "direct_normal_irradiance": "radiation_dni",
+    "diffuse_radiation": "radiation_dhi",
+    "surface_pressure": "surface_pressure",
+}
+
+# Cliente HTTP asíncrono compartido por todo el proceso (mantiene vivo su pool de conexiones)
+_http_client = None
+
+
+def get_http_client():
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(timeout=httpx.Timeout(60.0, connect=10.0))
+    return _http_client
+
+
+async def close_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+class AsyncWeatherConnector:
+    """
+    Equivalente no bloqueante de WeatherConnector para los endpoints async.
+    Mismo orden de niveles (memoria -> almacén columnar -> BD -> Open-Meteo), pero la espera
+    de BD (asyncpg) y de red (httpx) no bloquea el bucle de eventos de uvicorn.
+    """
+    def __init__(self, retries=5, backoff_factor=0.2):
+        self.url = settings.OPENMETEO_URL
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+
+    async def fetch_weather_range(self, lat, lon, start_year, end_year, tilt=None, azimuth=None):
+        cell_lat, cell_lon = await asyncio.to_thread(grid_index.snap, lat, lon)
+        start_year, end_year = int(start_year), int(end_year)
+        # Mismo registro single-flight que la ruta síncrona: una sola carga por (celda, rango, variables)
+        df = await weather_flight.do_async(
+            weather_flight_key(cell_lat, cell_lon, start_year, end_year),
+            partial(self._load_cell_years, cell_lat, cell_lon, start_year, end_year)
+        )
+        if df.empty:
+            return df
+        # La transposición POA es CPU: fuera del bucle de eventos
+        return await asyncio.to_thread(WeatherConnector.add_plane_of_array, df, lat, lon, tilt, azimuth)
+
+    async def _load_cell_years(self, cell_lat, cell_lon, start_year, end_year):
+        years = list(range(start_year, end_year + 1))
+        # 1. Caché en memoria y 2. almacén columnar local: sin espera de red, pero con locks
+        # y lectura de .npy bloqueantes, por eso se ejecutan fuera del bucle de eventos
+        frames = await asyncio.to_thread(WeatherConnector._load_local_years, cell_lat, cell_lon, years)
+        pending = [year for year in years if year not in frames]
+
+        # 3. Base de datos (asyncpg): una sola consulta para los años pendientes
+        if pending:
+            cached_df, coverage = await async_db.load_weather_range(cell_lat, cell_lon, pending[0], pending[-1])
+            complete = [year for year in pending if coverage[year]["complete"]]
+            if complete:
+                for year, df_year in WeatherConnector._split_by_year(cached_df).items():
+                    if year in complete:
+                        frames[year] = df_year
+                        await asyncio.to_thread(WeatherConnector._store_in_cache, cell_lat, cell_lon, year, df_year)
+            pending = [year for year in pending if year not in frames]
+
+        # 4. Open-Meteo (httpx): tramos contiguos, descargados concurrentemente
+        if pending:
+            print(f"Fallo de Caché: Descargando {pending} para {cell_lat}, {cell_lon}")
+            semaphore = asyncio.Semaphore(settings.OPENMETEO_MAX_CONCURRENCY)
+
+            async def fetch_span(span):
+                span_start, span_end = span
+                async with semaphore:
+                    df_span = await self.request_openmeteo(cell_lat, cell_lon, f"{span_start}-01-01", f"{span_end}-12-31")
+                await async_db.save_weather_data(df_span, cell_lat, cell_lon)
+                return df_span
+
+            spans = WeatherConnector.split_into_spans(pending)
+            span_frames = await asyncio.gather(*(fetch_span(span) for span in spans))
+            grid_index.register(cell_lat, cell_lon)
+
+            for df_span in span_frames:
+                for year, df_year in WeatherConnector._split_by_year(df_span).items():
+                    frames[year] = df_year
+                    await asyncio.to_thread(WeatherConnector._store_in_cache, cell_lat, cell_lon, year, df_year)
+
+        dfs = [frames[year] for year in years if year in frames and not frames[year].empty]
+        if not dfs:
+            return pd.DataFrame()
+        return dfs[0] if len(dfs) == 1 else pd.concat(dfs, ignore_index=True)
+
+    async def request_openmeteo(self, lat, lon, start_date, end_date):
+        """Llamada JSON a Open-Meteo con reintentos y backoff exponencial."""
+        params = {
+            "latitude": lat,
+            "longitude": lon,
+            "start_date": start_date,
+            "end_date": end_date,
+            "hourly": ",".join(OPENMETEO_HOURLY_VARIABLES.keys()),
+            "timezone": "GMT"
+        }
+        client = get_http_client()
+        for attempt in range(self.retries + 1):
+            try:
+                response = await client.get(self.url, params=params)
+                response.raise_for_status()
+                payload = response.json()
+                break
+            except httpx.HTTPStatusError as e:
+                # Solo se reintentan límites de tasa y errores del servidor
+                status = e.response.status_code
+                if (status != 429 and status < 500) or attempt == self.retries:
+                    raise
+            except httpx.TransportError:
+                if attempt == self.retries:
+                    raise
+            await asyncio.sleep(self.backoff_factor * (2 ** attempt))
+
+        hourly = payload["hourly"]
+        data = {"date": np.array(hourly["time"], dtype="datetime64[ns]")}
+        for api_name, internal_name in OPENMETEO_HOURLY_VARIABLES.items():
+            values = hourly.get(api_name)
+            # null -> NaN; variable ausente -> columna de NaN
+            data[internal_name] = (np.array(values, dtype=np.float64) if values is not None
+                                   else np.full(len(data["date"]), np.nan))
+        return pd.DataFrame(data, copy=False)
@@ -0,0 +1,195 @@
+"""
+Backfill regional de weather_data (pre-calentamiento de caché).
+
+Enumera las celdas de la rejilla de reanálisis de una región (bounding box o lista de emplazamientos),
+omite las celdas/años ya cubiertos en BD y descarga el resto de Open-Meteo con concurrencia acotada
+y limitación de tasa, cargando cada celda con la ingesta COPY + upsert de DatabaseManager.
+El progreso se guarda en un fichero de estado, por lo que el trabajo se puede reanudar tras una interrupción.
+
+Uso (desde physics_engine/):
+    python -m etl.backfill --bbox 36.0,-9.5,43.8,3.3 --start-year 2021 --end-year 2023
+    python -m etl.backfill --site 40.41,-3.70 --site 41.38,2.17 --start-year 2021 --end-year 2023
+    python -m etl.backfill --sites-file sites.csv --start-year 2021 --end-year 2023 --concurrency 4 --rate 2
+"""
+import argparse
+import csv
+import json
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from config.settings import settings
+from config.database import db
+from etl.grid_index import grid_index
+from etl.weather_connector import WeatherConnector
+
+
+class RateLimiter:
+    """Token bucket: como máximo `rate` peticiones por segundo, compartido entre hilos."""
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_slot = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.interval == 0.0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+class BackfillState:
+    """
+    Fichero JSON con los años completados por celda (lat, lon, año); se reescribe de forma atómica
+    tras cada celda. Por años y no por celda: reanudar con un rango más amplio solo descarga lo que falta.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                # Entradas antiguas [lat, lon] (sin año) se ignoran: la cobertura en BD decide
+                self.done = {tuple(entry) for entry in json.load(f).get("done", []) if len(entry) == 3}
+
+    def is_done(self, cell, year):
+        return (cell[0], cell[1], int(year)) in self.done
+
+    def mark_done(self, cell, years):
+        with self._lock:
+            self.done.update((cell[0], cell[1], int(year)) for year in years)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"done": sorted(self.done)}, f)
+            os.replace(tmp_path, self.path)
+
+
+def enumerate_bbox_cells(min_lat, min_lon, max_lat, max_lon):
+    """Centros de celda de la rejilla regular que cubren la bounding box."""
+    res = grid_index.resolution
+    lat_steps = range(math.floor(min_lat / res), math.ceil(max_lat / res) + 1)
+    lon_steps = range(math.floor(min_lon / res), math.ceil(max_lon / res) + 1)
+    return [grid_index.grid_cell(i * res, j * res) for i in lat_steps for j in lon_steps]
+
+
+def enumerate_site_cells(sites):
+    """Celdas (sin duplicados) de una lista de emplazamientos (lat, lon)."""
+    return list(dict.fromkeys(grid_index.snap(lat, lon) for lat, lon in sites))
+
+
+def plan_backfill(cells, start_year, end_year, state):
+    """
+    Retorna [(celda, [años pendientes])]: por celda, los años del rango que no constan como completados
+    en el fichero de estado ni están cubiertos (>90%) en BD.
+    """
+    coverage = db.load_weather_coverage(start_year, end_year)
+    years = range(start_year, end_year + 1)
+    plan = []
+    for cell in cells:
+        stored = coverage.get(cell, {})
+        pending = [year for year in years if not state.is_done(cell, year)]
+        missing = [year for year in pending if stored.get(year, 0) <= 8000]
+        if missing:
+            plan.append((cell, missing))
+        covered = [year for year in pending if year not in missing]
+        if covered:
+            state.mark_done(cell, covered)
+    return plan
+
+
+def run_backfill(cells, start_year, end_year, concurrency=4, rate=1.0, state_path=".backfill_state.json"):
+    state = BackfillState(state_path)
+    plan = plan_backfill(cells, start_year, end_year, state)
+    print(f"Backfill: {len(cells)} celdas, {len(cells) - len(plan)} ya cubiertas, {len(plan)} pendientes")
+    if not plan:
+        return {"cells": 0, "rows": 0, "errors": 0, "seconds": 0.0}
+
+    limiter = RateLimiter(rate)
+    # Cliente Open-Meteo compartido por proceso (un solo pool de conexiones para todos los hilos)
+    connector = WeatherConnector()
+    progress = {"cells": 0, "rows": 0, "errors": 0}
+    progress_lock = threading.Lock()
+    started = time.monotonic()
+
+    def backfill_cell(cell, missing_years):
+        rows = 0
+        for span_start, span_end in WeatherConnector.split_into_spans(missing_years):
+            limiter.acquire()
+            df = connector.request_openmeteo(cell[0], cell[1], f"{span_start}-01-01", f"{span_end}-12-31")
+            # Errores de ingesta o de refresco de agregados: la celda cuenta como fallida y no se marca
+            result = db.save_weather_data(df, cell[0], cell[1], raise_errors=True)
+            rows += result["inserted"] + result["updated"]
+        grid_index.register(*cell)
+        state.mark_done(cell, missing_years)
+        return rows
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        futures = {executor.submit(backfill_cell, cell, missing): cell for cell, missing in plan}
+        for future in as_completed(futures):
+            cell = futures[future]
+            with progress_lock:
+                try:
+                    progress["rows"] += future.result()
+                except Exception as e:
+                    progress["errors"] += 1
+                    print(f"Error en celda {cell}: {e}")
+                progress["cells"] += 1
+                elapsed = time.monotonic() - started
+                cells_per_min = progress["cells"] / elapsed * 60 if elapsed > 0 else 0.0
+                rows_per_s = progress["rows"] / elapsed if elapsed > 0 else 0.0
+                remaining = len(plan) - progress["cells"]
+                eta_min = remaining / cells_per_min if cells_per_min > 0 else float("inf")
+                print(f"[{progress['cells']}/{len(plan)}] {cell} | {cells_per_min:.1f} celdas/min | "
+                      f"{rows_per_s:.0f} filas/s | errores {progress['errors']} | ETA {eta_min:.1f} min")
+
+    elapsed = time.monotonic() - started
+    print(f"Backfill completado: {progress['cells']} celdas, {progress['rows']} filas en {elapsed:.1f} s")
+    return {"cells": progress["cells"], "rows": progress["rows"], "errors": progress["errors"], "seconds": elapsed}
+
+
+def _parse_pair(value):
+    lat, lon = (float(x) for x in value.split(","))
+    return lat, lon
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-calienta weather_data para una región o lista de emplazamientos.")
+    parser.add_argument("--bbox", help="min_lat,min_lon,max_lat,max_lon")
+    parser.add_argument("--site", action="append", default=[], help="lat,lon (repetible)")
+    parser.add_argument("--sites-file", help="CSV con columnas lat,lon (con o sin cabecera)")
+    parser.add_argument("--start-year", type=int, default=settings.BASE_YEAR - 2)
+    parser.add_argument("--end-year", type=int, default=settings.BASE_YEAR)
+    parser.add_argument("--concurrency", type=int, default=settings.OPENMETEO_MAX_CONCURRENCY)
+    parser.add_argument("--rate", type=float, default=1.0, help="Peticiones por segundo a Open-Meteo")
+    parser.add_argument("--state-file", default=".backfill_state.json")
+    args = parser.parse_args()
+
+    cells = []
+    if args.bbox:
+        min_lat, min_lon, max_lat, max_lon = (float(x) for x in args.bbox.split(","))
+        cells.extend(enumerate_bbox_cells(min_lat, min_lon, max_lat, max_lon))
+
+    sites = [_parse_pair(s) for s in args.site]
+    if args.sites_file:
+        with open(args.sites_file, newline="") as f:
+            for row in csv.reader(f):
+                try:
+                    sites.append((float(row[0]), float(row[1])))
+                except (ValueError, IndexError):
+                    continue # cabecera o fila inválida
+    cells.extend(enumerate_site_cells(sites))
+
+    if not cells:
+        parser.error("Indique --bbox, --site o --sites-file")
+
+    run_backfill(list(dict.fromkeys(cells)), args.start_year, args.end_year,
+                 concurrency=args.concurrency, rate=args.rate, state_path=args.state_file)
+
+
+if __name__ == "__main__":
+    main()
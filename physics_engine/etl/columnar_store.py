@@ -0,0 +1,177 @@
+import os
+import shutil
+import threading
+import time
+import uuid
+import numpy as np
+from config.settings import settings
+
+
+class ColumnarWeatherStore:
+    """
+    Nivel de caché en disco, columnar, delante de TimescaleDB (que sigue siendo el sistema de registro).
+    Estructura: <root>/<lat>_<lon>/<año> -> <año>.v-<id>/<variable>.npy  (un array NumPy por variable).
+    - Lectura con np.load(mmap_mode='r'): casi sin copia y compartida entre procesos vía page cache.
+    - Escritura atómica: cada versión se escribe en su propio directorio y el enlace simbólico del año
+      se sustituye con os.replace, así un lector ve siempre la versión anterior o la nueva, nunca un hueco.
+    - Límite de tamaño con desalojo LRU (se usa el mtime del directorio como "último acceso"); el total
+      de bytes se lleva en memoria y el disco solo se recorre al superar el límite.
+    """
+    # Versiones sin enlace (escritura interrumpida) más antiguas que esto se borran al recorrer el disco
+    ORPHAN_SECONDS = 3600
+    # Lecturas que coinciden con una reescritura del mismo año se reintentan sobre la versión nueva
+    READ_ATTEMPTS = 3
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.Lock()
+        self._bytes = None # total estimado; None = aún no calculado (primer recorrido en la primera escritura)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _year_dir(self, cell_lat, cell_lon, year):
+        return os.path.join(self.root, f"{cell_lat:.4f}_{cell_lon:.4f}", str(int(year)))
+
+    def read(self, cell_lat, cell_lon, year, variables):
+        """Retorna {columna: array memmap} o None si la celda/año no está (o le faltan variables)."""
+        year_dir = self._year_dir(cell_lat, cell_lon, year)
+        for attempt in range(self.READ_ATTEMPTS):
+            try:
+                arrays = {
+                    name: np.load(os.path.join(year_dir, f"{name}.npy"), mmap_mode="r")
+                    for name in ("date",) + tuple(variables)
+                }
+                # Marcar como usado recientemente para el desalojo LRU (sigue el enlace hasta la versión)
+                os.utime(year_dir)
+                break
+            except FileNotFoundError:
+                # El año se reescribió mientras se leía (la versión anterior ya se borró): se reintenta
+                # con la nueva; si el enlace no existe es un fallo normal
+                if attempt + 1 < self.READ_ATTEMPTS and os.path.islink(year_dir):
+                    continue
+            except (ValueError, OSError):
+                pass
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return arrays
+
+    def write(self, cell_lat, cell_lon, year, arrays):
+        """Guarda un año completo. arrays: {columna: ndarray} (incluye 'date' como datetime64)."""
+        year_dir = self._year_dir(cell_lat, cell_lon, year)
+        version = f"{os.path.basename(year_dir)}.v-{uuid.uuid4().hex}"
+        version_dir = os.path.join(os.path.dirname(year_dir), version)
+        link_tmp = f"{year_dir}.tmp-{uuid.uuid4().hex}"
+        try:
+            os.makedirs(version_dir)
+            for name, values in arrays.items():
+                np.save(os.path.join(version_dir, f"{name}.npy"), np.ascontiguousarray(values))
+            size = _dir_size(version_dir)
+            previous = _version_dir(year_dir)
+            if previous is None and os.path.isdir(year_dir):
+                # Directorio del formato anterior (sin enlace): se aparta antes de enlazar la versión nueva
+                previous = f"{year_dir}.old-{uuid.uuid4().hex}"
+                os.replace(year_dir, previous)
+            os.symlink(version, link_tmp)
+            os.replace(link_tmp, year_dir)
+        except OSError as e:
+            print(f"Error escribiendo almacén columnar ({cell_lat}, {cell_lon}, {year}): {e}")
+            shutil.rmtree(version_dir, ignore_errors=True)
+            if os.path.lexists(link_tmp):
+                os.remove(link_tmp)
+            return False
+
+        # Los lectores que ya abrieron la versión anterior conservan sus mmap (POSIX)
+        replaced = 0
+        if previous is not None:
+            replaced = _dir_size(previous)
+            shutil.rmtree(previous, ignore_errors=True)
+        self._account(size - replaced)
+        return True
+
+    def _account(self, delta):
+        with self._lock:
+            if self._bytes is None:
+                self._bytes = self._scan_and_evict() # ya incluye la escritura recién hecha
+                return
+            self._bytes += delta
+            if self._bytes > self.max_bytes:
+                # Solo al superar el límite se recorre el disco (corrige también lo escrito por otros procesos)
+                self._bytes = self._scan_and_evict()
+
+    def _scan_and_evict(self):
+        # Recorrido completo del almacén con el lock tomado: desaloja por LRU y retorna el total resultante
+        entries = []
+        total = 0
+        now = time.time()
+        for cell in os.scandir(self.root):
+            if not cell.is_dir():
+                continue
+            linked = set()
+            versions = []
+            for entry in os.scandir(cell.path):
+                if ".tmp-" in entry.name:
+                    continue
+                if ".v-" in entry.name or ".old-" in entry.name:
+                    versions.append(entry)
+                    continue
+                try:
+                    if entry.is_symlink():
+                        linked.add(os.readlink(entry.path))
+                    size = _dir_size(entry.path)
+                    entries.append((entry.stat().st_mtime, size, entry.path))
+                except OSError:
+                    continue
+                total += size
+            for entry in versions:
+                try:
+                    if entry.name not in linked and now - entry.stat().st_mtime > self.ORPHAN_SECONDS:
+                        shutil.rmtree(entry.path, ignore_errors=True)
+                except OSError:
+                    continue
+
+        # Desalojar los años menos usados recientemente hasta respetar el límite
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            _remove_year(path)
+            total -= size
+            self.evictions += 1
+        return total
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "bytes": self._bytes, "max_bytes": self.max_bytes}
+
+
+def _version_dir(year_dir):
+    """Directorio de la versión enlazada por el año (None si no es un enlace)."""
+    if not os.path.islink(year_dir):
+        return None
+    return os.path.join(os.path.dirname(year_dir), os.readlink(year_dir))
+
+
+def _remove_year(year_dir):
+    # Primero desaparece el enlace (atómico para los lectores) y después los datos
+    version = _version_dir(year_dir)
+    if version is None:
+        shutil.rmtree(year_dir, ignore_errors=True)
+        return
+    os.remove(year_dir)
+    shutil.rmtree(version, ignore_errors=True)
+
+
+def _dir_size(path):
+    return sum(f.stat().st_size for f in os.scandir(path) if f.is_file())
+
+
+columnar_store = ColumnarWeatherStore(
+    root=settings.WEATHER_STORE_DIR,
+    max_bytes=settings.WEATHER_STORE_MAX_BYTES
+)
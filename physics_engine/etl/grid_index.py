@@ -0,0 +1,98 @@
+import math
+import threading
+import time
+from config.settings import settings
+from config.database import db
+
+
+class GridIndex:
+    """
+    Índice espacial de celdas de reanálisis ya almacenadas en weather_data.
+    Open-Meteo sirve datos de una rejilla (~0.1 grados, ~10 km): dos emplazamientos a 50 m
+    reciben la misma serie. Para compartir caché, toda coordenada entrante se traduce a una celda:
+    1. La celda almacenada más cercana dentro de la tolerancia (reaprovecha datos existentes).
+    2. Si no hay ninguna, el centro de la celda de la rejilla regular (resolution).
+    Las celdas se agrupan en cubos de la rejilla para que la búsqueda solo mire los cubos vecinos
+    (3x3 salvo en latitudes altas); requiere tolerance <= resolution / 2.
+    """
+    def __init__(self, resolution, tolerance, reload_seconds=600):
+        self.resolution = float(resolution)
+        self.tolerance = float(tolerance)
+        self.reload_seconds = float(reload_seconds)
+        if self.resolution <= 0:
+            raise ValueError("La resolución de la rejilla debe ser positiva")
+        if not 0 <= self.tolerance <= self.resolution / 2:
+            # Con una tolerancia mayor, la celda más cercana puede quedar fuera de los cubos vecinos
+            raise ValueError(f"La tolerancia ({self.tolerance}) debe estar entre 0 y resolución / 2 ({self.resolution / 2})")
+
+        self._buckets = {} # (i, j) -> set[(lat, lon)]; se sustituye entero en cada recarga
+        self._loaded_at = None
+        self._registered = [] # celdas registradas mientras se recarga (la consulta puede no verlas)
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    def _bucket(self, lat, lon):
+        return (math.floor(lat / self.resolution), math.floor(lon / self.resolution))
+
+    def _is_fresh(self):
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < self.reload_seconds
+
+    def _ensure_loaded(self):
+        # Carga perezosa (y recarga periódica) de las celdas presentes en BD.
+        # Una sola carga a la vez: las peticiones concurrentes esperan y reutilizan su resultado.
+        if self._is_fresh():
+            return
+        with self._load_lock:
+            if self._is_fresh():
+                return
+            with self._lock:
+                self._registered = []
+            cells = db.load_weather_cells()
+            buckets = {}
+            for lat, lon in cells:
+                buckets.setdefault(self._bucket(lat, lon), set()).add((lat, lon))
+            with self._lock:
+                for lat, lon in self._registered:
+                    buckets.setdefault(self._bucket(lat, lon), set()).add((lat, lon))
+                # Índice completo sustituido de una vez: las búsquedas nunca ven uno a medio construir
+                self._buckets = buckets
+                self._loaded_at = time.monotonic()
+
+    def register(self, lat, lon):
+        """Añade una celda recién escrita en BD para que la vean las siguientes búsquedas."""
+        with self._lock:
+            self._buckets.setdefault(self._bucket(lat, lon), set()).add((lat, lon))
+            self._registered.append((lat, lon))
+
+    def nearest_stored(self, lat, lon):
+        """Celda almacenada más cercana dentro de la tolerancia, o None."""
+        self._ensure_loaded()
+        bi, bj = self._bucket(lat, lon)
+        # Distancia equirectangular en grados (longitud escalada por cos(lat)); en latitudes altas
+        # la tolerancia abarca más grados de longitud y se miran más cubos vecinos en ese eje
+        lon_scale = math.cos(math.radians(lat))
+        lon_reach = max(1, math.ceil(self.tolerance / (self.resolution * max(lon_scale, 1e-3))))
+        best, best_dist = None, self.tolerance
+        with self._lock:
+            for di in (-1, 0, 1):
+                for dj in range(-lon_reach, lon_reach + 1):
+                    for cell in self._buckets.get((bi + di, bj + dj), ()):
+                        dist = math.hypot(cell[0] - lat, (cell[1] - lon) * lon_scale)
+                        if dist <= best_dist:
+                            best, best_dist = cell, dist
+        return best
+
+    def grid_cell(self, lat, lon):
+        """Centro de la celda de la rejilla regular que contiene la coordenada."""
+        return (round(round(lat / self.resolution) * self.resolution, 4),
+                round(round(lon / self.resolution) * self.resolution, 4))
+
+    def snap(self, lat, lon):
+        """Clave espacial (lat, lon) con la que se leen y escriben todas las cachés de clima."""
+        return self.nearest_stored(lat, lon) or self.grid_cell(lat, lon)
+
+
+grid_index = GridIndex(
+    resolution=settings.WEATHER_GRID_RESOLUTION,
+    tolerance=settings.WEATHER_GRID_TOLERANCE
+)
@@ -0,0 +1,74 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """
+    Coalescencia de peticiones idénticas concurrentes ("single-flight").
+    El primer llamador de una clave ejecuta la carga; los que llegan mientras está en curso
+    esperan a ese mismo resultado (o excepción) en lugar de repetir BD/Open-Meteo.
+    La clave se libera al terminar: no es una caché (de eso se ocupan los niveles de clima).
+    Sirve a la vez a la ruta síncrona (hilos) y a la async (bucle de eventos): ambas comparten
+    el registro de llamadas en curso mediante concurrent.futures.Future.
+    """
+    def __init__(self):
+        self._calls = {} # key -> Future
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+
+    def _join(self, key):
+        # Retorna (future, es_líder)
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = Future()
+            self._calls[key] = future
+            self.leaders += 1
+            return future, True
+
+    def _finish(self, key, future, result=None, error=None):
+        with self._lock:
+            self._calls.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key, fn):
+        """Ejecuta fn() una sola vez por clave entre los llamadores concurrentes (bloqueante)."""
+        future, leader = self._join(key)
+        if not leader:
+            return future.result()
+        try:
+            result = fn()
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result)
+        return result
+
+    async def do_async(self, key, coro_fn):
+        """Versión async: coro_fn() devuelve la corrutina a ejecutar; los seguidores esperan sin bloquear el bucle."""
+        future, leader = self._join(key)
+        if not leader:
+            return await asyncio.wrap_future(future)
+        try:
+            result = await coro_fn()
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result)
+        return result
+
+    def stats(self):
+        with self._lock:
+            in_flight = len(self._calls)
+        return {"leaders": self.leaders, "coalesced": self.coalesced, "in_flight": in_flight}
+
+
+# Registro único por proceso para las cargas de clima (rutas síncrona y async)
+weather_flight = SingleFlight()
@@ -0,0 +1,140 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from config.settings import settings
+
+
+class WeatherCache:
+    """
+    Caché LRU en memoria de arrays horarios listos para usar (un año por entrada).
+    - Clave: (lat redondeada, lon redondeada, año, conjunto de variables).
+    - Límite por memoria (bytes de los arrays), no por número de entradas.
+    - TTL con "stale-while-revalidate": pasada la vigencia, la entrada se sigue sirviendo
+      durante la ventana de obsolescencia mientras se refresca en segundo plano.
+    - Contadores de aciertos/fallos/desalojos expuestos vía stats().
+    """
+    def __init__(self, max_bytes, ttl_seconds, stale_seconds):
+        self.max_bytes = int(max_bytes)
+        self.ttl_seconds = float(ttl_seconds)
+        self.stale_seconds = float(stale_seconds)
+
+        self._entries = OrderedDict() # key -> (arrays, nbytes, stored_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="weather-cache-refresh")
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+
+    @staticmethod
+    def make_key(lat, lon, year, variables):
+        return (round(float(lat), 4), round(float(lon), 4), int(year), tuple(sorted(variables)))
+
+    def get(self, key, refresh=None):
+        """
+        Retorna el dict de arrays o None.
+        refresh: callable opcional sin argumentos que devuelve arrays nuevos (o None);
+        se lanza en segundo plano cuando la entrada está obsoleta pero aún servible.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            arrays, _, stored_at = entry
+            age = now - stored_at
+            if age > self.ttl_seconds + self.stale_seconds:
+                # Demasiado antigua: se descarta y se trata como fallo
+                self._remove(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            if age <= self.ttl_seconds:
+                self.hits += 1
+                return arrays
+
+            self.stale_hits += 1
+            schedule = refresh is not None and key not in self._refreshing
+            if schedule:
+                self._refreshing.add(key)
+
+        if schedule:
+            self._executor.submit(self._refresh, key, refresh)
+        return arrays
+
+    def put(self, key, arrays):
+        """Guarda un dict de arrays NumPy (se marcan como solo lectura porque se comparten)."""
+        nbytes = sum(getattr(a, "nbytes", 0) for a in arrays.values())
+        if nbytes > self.max_bytes:
+            return False
+        for a in arrays.values():
+            if hasattr(a, "flags"):
+                a.flags.writeable = False
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (arrays, nbytes, time.monotonic())
+            self._bytes += nbytes
+            # Desalojar las entradas menos usadas hasta respetar el presupuesto
+            while self._bytes > self.max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "refreshes": self.refreshes,
+                "refresh_errors": self.refresh_errors,
+                "hit_rate": (self.hits + self.stale_hits) / lookups if lookups else 0.0
+            }
+
+    def _remove(self, key):
+        _, nbytes, _ = self._entries.pop(key)
+        self._bytes -= nbytes
+
+    def _refresh(self, key, refresh):
+        try:
+            arrays = refresh()
+            if arrays is not None:
+                self.put(key, arrays)
+            with self._lock:
+                self.refreshes += 1
+        except Exception as e:
+            print(f"Error refrescando caché de clima {key}: {e}")
+            with self._lock:
+                self.refresh_errors += 1
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+
+weather_cache = WeatherCache(
+    max_bytes=settings.WEATHER_CACHE_MAX_BYTES,
+    ttl_seconds=settings.WEATHER_CACHE_TTL_SECONDS,
+    stale_seconds=settings.WEATHER_CACHE_STALE_SECONDS
+)
@@ -1,35 +1,265 @@
 import openmeteo_requests
 import requests_cache
+import threading
+import numpy as np
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from retry_requests import retry
 from config.settings import settings
-from config.database import db
+from config.database import db, WEATHER_COLUMN_MAP
+from etl.weather_cache import WeatherCache, weather_cache
+from etl.grid_index import grid_index
+from etl.columnar_store import columnar_store
+from etl.single_flight import weather_flight
+from models.irradiance import IrradianceFrame
+
+# Variables horarias (nombres internos) que se cachean por año
+WEATHER_VARIABLES = tuple(WEATHER_COLUMN_MAP.keys())
+# Marca en DataFrame.attrs del clima degradado (año base único en lugar del rango multianual)
+WEATHER_FALLBACK_ATTR = "single_year_fallback"
+
+# Cliente API de Open-Meteo compartido por todo el proceso (mantiene vivo su pool de conexiones)
+_openmeteo_client = None
+_openmeteo_client_lock = threading.Lock()
+
+
+def get_openmeteo_client():
+    global _openmeteo_client
+    if _openmeteo_client is None:
+        with _openmeteo_client_lock:
+            if _openmeteo_client is None:
+                # Configurar cliente API de Open-Meteo con caché y reintentos
+                cache_session = requests_cache.CachedSession('.cache', expire_after=3600)
+                retry_session = retry(cache_session, retries=5, backoff_factor=0.2)
+                _openmeteo_client = openmeteo_requests.Client(session=retry_session)
+    return _openmeteo_client
+
+
+def weather_flight_key(cell_lat, cell_lon, start, end):
+    """Clave de coalescencia: (celda, rango pedido, conjunto de variables)."""
+    return (cell_lat, cell_lon, start, end, WEATHER_VARIABLES)
+
 
 class WeatherConnector:
     def __init__(self):
-        # Configurar cliente API de Open-Meteo con caché y reintentos
-        cache_session = requests_cache.CachedSession('.cache', expire_after=3600)
-        retry_session = retry(cache_session, retries=5, backoff_factor=0.2)
-        self.openmeteo = openmeteo_requests.Client(session=retry_session)
+        self.openmeteo = get_openmeteo_client()
         self.url = settings.OPENMETEO_URL
 
     def fetch_historical_weather(self, lat, lon, start_date, end_date, tilt=None, azimuth=None):
         # 0. Verificar Caché en Base de Datos
-        # CRÍTICO: Si se incluye 'tilt' (Experto Solar), necesitamos 'global_tilted_irradiance' (POA).
-        # El esquema actual de BD solo almacena 'radiation' (GHI).
-        # Usar GHI para paneles inclinados subestima la producción invernal y aplana diferencias geográficas.
-        # Por tanto, SALTAMOS la lectura de caché si se usa tilt, asegurando que pedimos POA a OpenMeteo.
-        # Aún guardamos la parte GHI en BD para otros usos futuros.
+        # Si se incluye 'tilt' (Experto Solar), la irradiancia en el plano (POA) se calcula localmente
+        # a partir de GHI/DNI/DHI almacenados (models/irradiance.py), por lo que la caché sirve
+        # para cualquier orientación sin volver a llamar a Open-Meteo.
+        
+        # Clave espacial: celda de la rejilla de reanálisis (emplazamientos cercanos comparten caché)
+        cell_lat, cell_lon = grid_index.snap(lat, lon)
         
+        # Peticiones concurrentes idénticas comparten una sola carga (sin carreras en la ingesta)
+        df = weather_flight.do(
+            weather_flight_key(cell_lat, cell_lon, start_date, end_date),
+            partial(self._load_historical, cell_lat, cell_lon, start_date, end_date)
+        )
+        return self.add_plane_of_array(df, lat, lon, tilt, azimuth)
+
+    def _load_historical(self, cell_lat, cell_lon, start_date, end_date):
         year = int(start_date.split("-")[0]) 
-        lat_rounded = round(lat, 4)
-        lon_rounded = round(lon, 4)
         
-        # Solo cargar de BD si no necesitamos datos expertos solares (tilt=None)
-        if tilt is None and db.check_weather_exists(lat_rounded, lon_rounded, year):
-             print(f"Acierto en Caché: Cargando clima desde BD para {lat_rounded}, {lon_rounded}")
-             return db.load_weather_data(lat_rounded, lon_rounded, year)
+        cached_df, coverage = db.load_weather_range(cell_lat, cell_lon, year, year)
+        if coverage[year]["complete"]:
+             print(f"Acierto en Caché: Cargando clima desde BD para {cell_lat}, {cell_lon}")
+             return cached_df
+
+        df = self.request_openmeteo(cell_lat, cell_lon, start_date, end_date)
+        
+        # Save to Database for future use (GHI, DNI y DHI permiten recalcular POA para cualquier orientación)
+        db.save_weather_data(df, cell_lat, cell_lon)
+        grid_index.register(cell_lat, cell_lon)
+        return df
+
+    def fetch_weather_range(self, lat, lon, start_year, end_year, tilt=None, azimuth=None):
+        """
+        Obtiene el clima horario de varios años completos [start_year, end_year] como un único DataFrame.
+        Orden de consulta por año: caché en memoria -> almacén columnar en disco -> BD -> Open-Meteo.
+        - Los años ya presentes en BD se cargan en una sola consulta (también con tilt: POA se calcula localmente).
+        - Los años que faltan se agrupan en tramos contiguos y se piden a Open-Meteo en UNA llamada por tramo
+          (el archivo histórico acepta rangos multianuales), partiendo los tramos que superen
+          OPENMETEO_MAX_SPAN_YEARS.
+        - Si hay varios tramos se descargan en paralelo, de modo que la latencia en frío es ~1 viaje de red.
+        - Las llamadas concurrentes para la misma (celda, rango, variables) esperan a una única carga.
+        """
+        # Clave espacial: celda de la rejilla de reanálisis (emplazamientos cercanos comparten caché)
+        cell_lat, cell_lon = grid_index.snap(lat, lon)
+        start_year, end_year = int(start_year), int(end_year)
+        df = weather_flight.do(
+            weather_flight_key(cell_lat, cell_lon, start_year, end_year),
+            partial(self._load_cell_years, cell_lat, cell_lon, start_year, end_year)
+        )
+        return self.add_plane_of_array(df, lat, lon, tilt, azimuth)
+
+    def _load_cell_years(self, cell_lat, cell_lon, start_year, end_year):
+        """Niveles memoria -> almacén columnar -> BD -> Open-Meteo para una celda. Retorna el DataFrame sin POA."""
+        years = list(range(start_year, end_year + 1))
+        frames = self._load_local_years(cell_lat, cell_lon, years)
+        pending = [year for year in years if year not in frames]
+
+        # 3. Base de datos: una sola consulta para los años pendientes; la cobertura viene del mismo resultado
+        if pending:
+            cached_df, coverage = db.load_weather_range(cell_lat, cell_lon, pending[0], pending[-1])
+            complete = [year for year in pending if coverage[year]["complete"]]
+            if complete:
+                # Los años incompletos se descartan: se sustituyen por la descarga completa
+                for year, df_year in self._split_by_year(cached_df).items():
+                    if year in complete:
+                        frames[year] = df_year
+                        self._store_in_cache(cell_lat, cell_lon, year, df_year)
+            pending = [year for year in pending if year not in frames]
+
+        # 4. Open-Meteo para lo que falte
+        if pending:
+            print(f"Fallo de Caché: Descargando {pending} para {cell_lat}, {cell_lon}")
+            spans = self.split_into_spans(pending)
+
+            def fetch_span(span):
+                span_start, span_end = span
+                df_span = self.request_openmeteo(cell_lat, cell_lon, f"{span_start}-01-01", f"{span_end}-12-31")
+                db.save_weather_data(df_span, cell_lat, cell_lon)
+                return df_span
+
+            if len(spans) == 1:
+                span_frames = [fetch_span(spans[0])]
+            else:
+                workers = min(len(spans), settings.OPENMETEO_MAX_CONCURRENCY)
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    span_frames = list(executor.map(fetch_span, spans))
+            grid_index.register(cell_lat, cell_lon)
+
+            for df_span in span_frames:
+                for year, df_year in self._split_by_year(df_span).items():
+                    frames[year] = df_year
+                    self._store_in_cache(cell_lat, cell_lon, year, df_year)
 
+        dfs = [frames[year] for year in years if year in frames and not frames[year].empty]
+        if not dfs:
+            return pd.DataFrame()
+        if len(dfs) == 1:
+            return dfs[0]
+        # Unir años (memoria, BD y red) en una sola serie temporal ordenada
+        return pd.concat(dfs, ignore_index=True)
+
+    @staticmethod
+    def _load_local_years(cell_lat, cell_lon, years):
+        """
+        Niveles locales (memoria y almacén columnar) de una celda: {año: DataFrame} de los años encontrados.
+        Bloqueante (locks de caché y lectura de .npy): la ruta async lo ejecuta en un hilo.
+        """
+        frames = {}
+
+        # 1. Caché en memoria (arrays listos, sin BD ni remapeo)
+        for year in years:
+            key = WeatherCache.make_key(cell_lat, cell_lon, year, WEATHER_VARIABLES)
+            arrays = weather_cache.get(key, refresh=partial(WeatherConnector._reload_year_arrays, cell_lat, cell_lon, year))
+            if arrays is not None:
+                frames[year] = pd.DataFrame(arrays, copy=False)
+        pending = [year for year in years if year not in frames]
+
+        # 2. Almacén columnar local (arrays mapeados en memoria, compartidos entre procesos)
+        for year in pending:
+            arrays = columnar_store.read(cell_lat, cell_lon, year, WEATHER_VARIABLES)
+            if arrays is not None:
+                frames[year] = pd.DataFrame(arrays, copy=False)
+                weather_cache.put(WeatherCache.make_key(cell_lat, cell_lon, year, WEATHER_VARIABLES), arrays)
+        return frames
+
+    @staticmethod
+    def _split_by_year(df):
+        """
+        Divide un DataFrame horario ordenado en {año: DataFrame}.
+        BD devuelve TIMESTAMP sin zona; Open-Meteo devuelve UTC. Se unifica a UTC naive.
+        """
+        if df.empty:
+            return {}
+        dates = df["date"]
+        if getattr(dates.dt, "tz", None) is not None:
+            df = df.assign(date=dates.dt.tz_convert(None))
+        times = df["date"].to_numpy(dtype="datetime64[ns]")
+        years = times.astype("datetime64[Y]").astype(np.int64) + 1970
+        # Las fechas vienen ordenadas: los cortes entre años se localizan con searchsorted
+        unique_years = np.unique(years)
+        bounds = np.searchsorted(years, unique_years)
+        bounds = np.append(bounds, len(years))
+        return {
+            int(year): df.iloc[bounds[i]:bounds[i + 1]].reset_index(drop=True)
+            for i, year in enumerate(unique_years)
+        }
+
+    @staticmethod
+    def _store_in_cache(cell_lat, cell_lon, year, df_year):
+        """Propaga un año completo a los niveles rápidos: memoria y almacén columnar en disco."""
+        arrays = {col: df_year[col].to_numpy(copy=True) for col in ("date",) + WEATHER_VARIABLES if col in df_year}
+        if len(arrays) == len(WEATHER_VARIABLES) + 1:
+            columnar_store.write(cell_lat, cell_lon, year, arrays)
+        weather_cache.put(WeatherCache.make_key(cell_lat, cell_lon, year, WEATHER_VARIABLES), arrays)
+
+    @staticmethod
+    def _reload_year_arrays(cell_lat, cell_lon, year):
+        """Refresco en segundo plano de la caché en memoria desde BD (stale-while-revalidate)."""
+        df_year, coverage = db.load_weather_range(cell_lat, cell_lon, year, year)
+        if not coverage[year]["complete"]:
+            return None
+        return {col: df_year[col].to_numpy() for col in ("date",) + WEATHER_VARIABLES if col in df_year}
+
+    @staticmethod
+    def add_plane_of_array(df, lat, lon, tilt=None, azimuth=None):
+        """
+        Añade la columna 'radiation_poa' calculada localmente (posición solar + transposición Hay-Davies)
+        para la orientación pedida. Sin tilt, el DataFrame se devuelve sin cambios.
+        Convención de azimut del sistema: 180=Sur.
+        El DataFrame de entrada no se modifica (puede estar compartido entre peticiones coalescidas).
+        """
+        if tilt is None or df.empty:
+            return df
+        if azimuth is None:
+            azimuth = 180.0
+
+        dates = df["date"]
+        if getattr(dates.dt, "tz", None) is not None:
+            dates = dates.dt.tz_convert(None)
+
+        frame = IrradianceFrame(
+            dates.to_numpy(),
+            lat, lon,
+            ghi=df["radiation_ghi"].to_numpy(dtype=float),
+            dni=df["radiation_dni"].to_numpy(dtype=float) if "radiation_dni" in df else None,
+            dhi=df["radiation_dhi"].to_numpy(dtype=float) if "radiation_dhi" in df else None
+        )
+        df = df.copy(deep=False)
+        df["radiation_poa"] = frame.poa(float(tilt), float(azimuth))
+        return df
+
+    @staticmethod
+    def split_into_spans(years):
+        """
+        Agrupa una lista ordenada de años en tramos contiguos (inicio, fin),
+        limitando cada tramo a OPENMETEO_MAX_SPAN_YEARS años.
+        Compartido por las rutas síncrona y async y por el backfill (etl/backfill.py).
+        """
+        max_span = max(1, settings.OPENMETEO_MAX_SPAN_YEARS)
+        spans = []
+        span_start = prev = years[0]
+        for year in years[1:]:
+            if year != prev + 1 or (year - span_start) >= max_span:
+                spans.append((span_start, prev))
+                span_start = year
+            prev = year
+        spans.append((span_start, prev))
+        return spans
+
+    def request_openmeteo(self, lat, lon, start_date, end_date):
+        """
+        Llamada directa a Open-Meteo (sin consultar ni escribir en BD).
+        Retorna el DataFrame horario con nombres de columna internos.
+        """
         params = {
             "latitude": lat,
             "longitude": lon,
@@ -37,22 +267,6 @@ class WeatherConnector:
             "end_date": end_date,
             "hourly": ["temperature_2m", "precipitation", "wind_speed_10m", "wind_speed_100m", "shortwave_radiation", "direct_normal_irradiance", "diffuse_radiation", "surface_pressure"]
         }
-        
-        # Añadir parámetros POA si están disponibles para solar avanzado
-        if tilt is not None and azimuth is not None:
-             params["tilt"] = tilt
-             
-             # Conversión: El sistema usa 180=Sur (Estándar), OpenMeteo usa 0=Sur
-             # Fórmula: openmeteo_az = azimuth - 180
-             openmeteo_az = azimuth - 180
-             
-             # Normalizar al rango -180 a 180
-             if openmeteo_az < -180: openmeteo_az += 360
-             if openmeteo_az > 180: openmeteo_az -= 360
-             
-             params["azimuth"] = openmeteo_az
-             # Solicitar irradiancia en plano inclinado
-             params["hourly"].append("global_tilted_irradiance")
 
         responses = self.openmeteo.weather_api(self.url, params=params)
         response = responses[0]
@@ -77,11 +291,6 @@ class WeatherConnector:
              "diffuse_radiation": 6,
              "surface_pressure": 7
         }
-        
-        next_idx = 8
-        if "global_tilted_irradiance" in params["hourly"]:
-             variable_map["global_tilted_irradiance"] = next_idx
-             next_idx += 1
 
         # Extracción segura
         def get_var(name):
@@ -105,18 +314,10 @@ class WeatherConnector:
         hourly_data["wind_speed_100m"] = get_var("wind_speed_100m")
         hourly_data["radiation_ghi"] = get_var("shortwave_radiation")
         hourly_data["radiation_dni"] = get_var("direct_normal_irradiance")
+        hourly_data["radiation_dhi"] = get_var("diffuse_radiation")
         hourly_data["surface_pressure"] = get_var("surface_pressure")
         
-        if "global_tilted_irradiance" in variable_map:
-             hourly_data["radiation_poa"] = get_var("global_tilted_irradiance")
-        
-        df = pd.DataFrame(data=hourly_data)
-        
-        # Save to Database for future use
-        # (Only saves standard columns; explicit POA is not saved currently in schema)
-        db.save_weather_data(df, lat_rounded, lon_rounded)
-        
-        return df
+        return pd.DataFrame(data=hourly_data)
 
 if __name__ == "__main__":
     # Test
@@ -1,5 +1,7 @@
 from fastapi import FastAPI
-from routers import simulation, market, catalog
+from routers import simulation, market, catalog, metrics
+from config.database import async_db
+from etl.async_weather_connector import close_http_client
 
 # Servicio principal del motor de cálculo físico. Inicializa la API y registra las rutas.
 app = FastAPI(title="Motor de Cálculo Físico para Renovables", version="1.0")
@@ -8,6 +10,13 @@ app = FastAPI(title="Motor de Cálculo Físico para Renovables", version="1.0")
 app.include_router(simulation.router, prefix="/predict", tags=["Predicción"])
 app.include_router(market.router, prefix="/market", tags=["Mercado"])
 app.include_router(catalog.router, prefix="/catalog", tags=["Catálogo"])
+app.include_router(metrics.router, prefix="/metrics", tags=["Métricas"])
+
+@app.on_event("shutdown")
+async def shutdown():
+    # Cerrar recursos async compartidos del proceso (pool asyncpg y cliente HTTP)
+    await async_db.close()
+    await close_http_client()
 
 @app.get("/")
 def read_root():
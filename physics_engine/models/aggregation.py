@@ -0,0 +1,112 @@
+import numpy as np
+from functools import lru_cache
+
+# Etapa común de agregación de series horarias (generación de cualquier tecnología).
+# Un HourlyCalendar precalcula, una vez por rango de fechas, los índices hora -> mes natural y
+# mes natural -> mes del año; las agregaciones son reducciones NumPy (reduceat / bincount) sobre
+# esos índices, sin DataFrames ni resample. Admite series 1-D (T,) o lotes 2-D (k, T).
+# Las fechas son datetime64 en UTC (sin zona), ordenadas.
+
+HOUR = np.timedelta64(1, "h")
+
+
+class HourlyCalendar:
+    """
+    Índices de calendario de una serie horaria ordenada.
+    year_hours: horas de un año completo. None = calendario real (8760 u 8784 en bisiestos);
+    un entero (p.ej. 8760) para años de modelo de longitud fija (curvas de precio sintéticas).
+    """
+    def __init__(self, times, year_hours=None):
+        times = np.asarray(times, dtype="datetime64[h]")
+        if len(times) and np.any(times[1:] < times[:-1]):
+            raise ValueError("Las fechas de la serie horaria deben estar ordenadas")
+        self.hours = len(times)
+
+        # Meses naturales presentes (contiguos por estar ordenadas) y su mes del año (0=Ene)
+        month_keys = times.astype("datetime64[M]")
+        self.month_starts = np.flatnonzero(np.r_[True, month_keys[1:] != month_keys[:-1]]) if self.hours else np.array([], dtype=np.int64)
+        self.month_of_year = month_keys[self.month_starts].astype(np.int64) % 12
+        self.months_per_slot = np.bincount(self.month_of_year, minlength=12)
+
+        # Años: horas cubiertas / horas del año -> número de años exacto (también con bisiestos o años parciales)
+        year_keys = times.astype("datetime64[Y]")
+        self.years, hours_per_year = np.unique(year_keys.astype(np.int64) + 1970, return_counts=True)
+        if year_hours is None:
+            leap = (self.years % 4 == 0) & ((self.years % 100 != 0) | (self.years % 400 == 0))
+            full_year = np.where(leap, 8784, 8760)
+        else:
+            full_year = np.full(len(self.years), int(year_hours))
+        self.hours_per_year = hours_per_year
+        self.num_years = float(np.sum(hours_per_year / full_year))
+
+        for array in (self.month_starts, self.month_of_year, self.months_per_slot, self.years, self.hours_per_year):
+            array.flags.writeable = False
+
+    @property
+    def mean_year_hours(self):
+        """Horas de un año medio de la serie (base del factor de capacidad)."""
+        return self.hours / self.num_years if self.num_years > 0 else 0.0
+
+    def annual_mean(self, values):
+        """Total medio anual: suma / años exactos. (T,) -> escalar, (k, T) -> (k,)."""
+        values = np.asarray(values, dtype=float)
+        return values.sum(axis=-1) / self.num_years if self.num_years > 0 else np.zeros(values.shape[:-1])
+
+    def monthly_totals(self, values):
+        """Sumas por mes natural (meses presentes, en orden): (..., meses)."""
+        return np.add.reduceat(np.asarray(values, dtype=float), self.month_starts, axis=-1)
+
+    def monthly_mean(self, values):
+        """
+        Perfil del año representativo: media de las sumas mensuales por mes del año (Ene..Dic).
+        Retorna (..., 12); los meses sin datos quedan a 0 (ver months_present).
+        """
+        totals = self.monthly_totals(values)
+        counts = np.maximum(self.months_per_slot, 1)
+        if totals.ndim == 1:
+            return np.bincount(self.month_of_year, weights=totals, minlength=12) / counts
+        slot_matrix = np.zeros((len(self.month_of_year), 12))
+        slot_matrix[np.arange(len(self.month_of_year)), self.month_of_year] = 1.0
+        return (totals @ slot_matrix) / counts
+
+    @property
+    def months_present(self):
+        """Índices (0=Ene) de los meses del año con datos."""
+        return np.flatnonzero(self.months_per_slot > 0)
+
+
+@lru_cache(maxsize=32)
+def _calendar_for_range(start_hour, hours, year_hours):
+    times = np.datetime64(start_hour, "h") + np.arange(hours) * HOUR
+    return HourlyCalendar(times, year_hours)
+
+
+def hourly_calendar(times):
+    """
+    Calendario de una serie horaria. Las series regulares (sin huecos, el caso del clima)
+    se identifican por (inicio, longitud) y su calendario se reutiliza entre peticiones.
+    """
+    times = np.asarray(times, dtype="datetime64[h]")
+    if len(times) and np.all(np.diff(times) == HOUR):
+        return _calendar_for_range(int(times[0].astype(np.int64)), len(times), None)
+    return HourlyCalendar(times)
+
+
+@lru_cache(maxsize=32)
+def model_year_calendar(years, year_hours=8760):
+    """
+    Calendario de años de modelo de longitud fija (year_hours horas desde el 1 de enero de cada año),
+    como las curvas de precio de 8760 horas: cada año cuenta como un año completo, también si es bisiesto.
+    years: tupla de años.
+    """
+    starts = np.array([f"{int(y)}-01-01" for y in years], dtype="datetime64[h]")
+    times = (starts[:, None] + np.arange(year_hours) * HOUR).ravel()
+    return HourlyCalendar(times, year_hours)
+
+
+@lru_cache(maxsize=8)
+def month_end_labels(year):
+    """Fechas de fin de mes 'YYYY-MM-DD' del año (etiquetas del año representativo)."""
+    month_starts = np.datetime64(f"{int(year)}-01", "M") + np.arange(13)
+    ends = month_starts[1:].astype("datetime64[D]") - np.timedelta64(1, "D")
+    return tuple(str(d) for d in ends)
@@ -1,5 +1,4 @@
 import numpy as np
-import pandas as pd
 
 class BiomassOptimizer:
     def __init__(self, efficiency=0.25, fuel_cost_eur_ton=150, pci_kwh_kg=4.5, tech_params=None):
@@ -20,93 +19,95 @@ class BiomassOptimizer:
         # Nuevo parámetro para restricción de combustible
         self.max_fuel_kg_year = float(self.tech_params.get("max_fuel_ton", 0)) * 1000.0
 
-    def optimize_dispatch(self, price_series_eur_mwh, capacity_kw):
-        """
-        Determina cuándo operar basándose en coste marginal y disponibilidad de combustible.
-        Retorna: Serie de Generación de Potencia (kW).
-        """
-        # Asegurar que entrada es array numpy
-        price_series_eur_mwh = np.array(price_series_eur_mwh)
-
-        # Calcular Coste Marginal (EUR/MWh)
+    def marginal_cost_eur_mwh(self):
+        """Coste marginal del MWh eléctrico (EUR/MWh) a partir del coste y PCI del combustible."""
         # 1 MWh eléctrico necesita (1/eff) MWh térmico
         # 1 MWh térmico = 1000 kWh.
         # Combustible necesario (kg) = 1000 / PCI
         # Coste (EUR/MWh_térmico) = (1000 / PCI) * Coste_kg
         # Coste (EUR/MWh_eléctrico) = Coste_térmico / Eficiencia
-        
         fuel_needed_kg_per_kwh_thermal = 1.0 / self.pci
         cost_per_kwh_thermal = fuel_needed_kg_per_kwh_thermal * self.fuel_cost_eur_kg
         cost_per_mwh_thermal = cost_per_kwh_thermal * 1000.0
-        
-        marginal_cost_eur_mwh = cost_per_mwh_thermal / self.efficiency
-        
-        # Calcular consumo de combustible a plena carga por hora
+        return cost_per_mwh_thermal / self.efficiency
+
+    def fuel_consumption_kg_per_hour(self, capacity_kw):
         # Salida: capacity_kw (kWh por hora)
         # Entrada Térmica: capacity_kw / efficiency
         # Entrada Combustible (kg): (capacity_kw / efficiency) / pci
-        fuel_consumption_kg_per_hour = (capacity_kw / self.efficiency) / self.pci
+        return (capacity_kw / self.efficiency) / self.pci
 
-        # Calcular Beneficio Neto para cada hora si operara
-        # Beneficio = (Precio - CosteMarginal) * Capacidad
-        # Solo necesitamos comparar Precio vs Coste Marginal para saber la prioridad
-        profits = price_series_eur_mwh - marginal_cost_eur_mwh
-        
-        # Inicializar array de despacho con ceros
+    def max_operating_hours(self, capacity_kw):
+        """
+        Horas anuales a plena carga que permite el combustible disponible.
+        None = combustible ilimitado (legacy: "max_fuel_ton" ausente en tech_params).
+        Si "max_fuel_ton" está presente y es 0, no se puede operar ninguna hora.
+        """
+        if "max_fuel_ton" not in self.tech_params:
+            return None
+        if self.max_fuel_kg_year <= 0 or capacity_kw <= 0:
+            return 0
+        # Total horas posibles = Combustible Total / Combustible por Hora
+        return int(self.max_fuel_kg_year / self.fuel_consumption_kg_per_hour(capacity_kw))
+
+    def optimize_dispatch(self, price_series_eur_mwh, capacity_kw):
+        """
+        Determina cuándo operar basándose en coste marginal y disponibilidad de combustible.
+        Retorna: Serie de Generación de Potencia (kW).
+        """
+        # Asegurar que entrada es array numpy
+        price_series_eur_mwh = np.asarray(price_series_eur_mwh, dtype=float)
+
+        # Beneficio por MWh de cada hora si operara: solo hace falta comparar Precio vs Coste Marginal
+        profits = price_series_eur_mwh - self.marginal_cost_eur_mwh()
         dispatch = np.zeros_like(price_series_eur_mwh)
-        
-        # Si tenemos límite de combustible (y es positivo), usamos "Despacho de Energía Limitada"
-        if self.max_fuel_kg_year > 0:
-            # Queremos operar en las horas MÁS rentables
-            # Primero, filtrar horas mayormente rentables (Profit > 0)
-            # En realidad, si Profit < 0, no deberíamos operar de todos modos.
-            
-            # Crear dataframe para ordenar
-            df_dispatch = pd.DataFrame({
-                "profit": profits,
-                "original_index": np.arange(len(profits))
-            })
-            
-            # Filtrar solo horas rentables
-            df_dispatch = df_dispatch[df_dispatch["profit"] > 0]
-            
-            # Ordenar por beneficio descendente
-            df_dispatch = df_dispatch.sort_values(by="profit", ascending=False)
-            
-            # Calcular cuántas horas podemos operar
-            # Total horas posibles = Combustible Total / Combustible por Hora
-            max_hours = int(self.max_fuel_kg_year / fuel_consumption_kg_per_hour)
-            
-            # Seleccionar mejores horas
-            selected_indices = df_dispatch.head(max_hours)["original_index"].values
-            
-            # Establecer despacho
-            if len(selected_indices) > 0:
-                dispatch[selected_indices] = capacity_kw
-        else:
-            # Modo combustible infinito (comportamiento legacy: opera siempre que sea rentable)
-            # Decisión de diseño: Si "max_fuel_ton" no está en tech_params, asumimos infinito.
-            # Si "max_fuel_ton" está presente y es 0, la generación será 0.
-            pass # Lógica por defecto de operar si hay beneficio (ya calculado si profit > 0 se usara)
-            
-            # En modo "infinito", simplemente despachamos si Profit > 0
-            # Filtrar horas rentables
-            profitable_indices = np.where(profits > 0)[0]
-            if len(profitable_indices) > 0:
-                dispatch[profitable_indices] = capacity_kw
-            if "max_fuel_ton" not in self.tech_params:
-                 # Legacy / Infinite
-                 dispatch = np.where(
-                    price_series_eur_mwh > marginal_cost_eur_mwh,
-                    capacity_kw, 
-                    0.0 
-                )
-            else:
-                # Explicitly provided as 0 or some value
-                if self.max_fuel_kg_year <= 0:
-                    dispatch[:] = 0.0
-                else:
-                     # Already handled in 'if' block above, so this else is unreachable if logic is correct
-                     pass
-        
+        max_hours = self.max_operating_hours(capacity_kw)
+
+        if max_hours is None or max_hours >= len(profits):
+            # Sin límite efectivo de combustible: se opera siempre que sea rentable
+            dispatch[profits > 0] = capacity_kw
+        elif max_hours > 0:
+            # "Despacho de Energía Limitada": las max_hours horas MÁS rentables (con Profit > 0).
+            # Selección parcial O(n) en lugar de ordenar todas las horas.
+            best = np.argpartition(profits, len(profits) - max_hours)[len(profits) - max_hours:]
+            dispatch[best[profits[best] > 0]] = capacity_kw
+
         return dispatch
+
+    def dispatch_paths(self, price_paths_eur_mwh, capacity_kw):
+        """
+        Despacho de muchas trayectorias de precio a la vez (array trayectorias x horas, un año cada una).
+        Mismo criterio que optimize_dispatch, pero solo se necesitan los totales por trayectoria:
+        con combustible limitado basta el valor de las k horas más caras (np.partition por fila),
+        sin índices ni ordenación completa. Como el coste marginal es constante, ordenar por precio
+        equivale a ordenar por beneficio.
+        Retorna un dict de arrays (una entrada por trayectoria).
+        """
+        prices = np.asarray(price_paths_eur_mwh, dtype=float)
+        if prices.ndim == 1:
+            prices = prices[None, :]
+        num_paths, hours = prices.shape
+        marginal_cost = self.marginal_cost_eur_mwh()
+        max_hours = self.max_operating_hours(capacity_kw)
+
+        if max_hours is None or max_hours >= hours:
+            candidate_prices = prices
+        elif max_hours > 0:
+            candidate_prices = np.partition(prices, hours - max_hours, axis=1)[:, hours - max_hours:]
+        else:
+            candidate_prices = np.empty((num_paths, 0))
+
+        profits = candidate_prices - marginal_cost
+        running = profits > 0
+        operating_hours = running.sum(axis=1)
+        # Margen (EUR) = Σ (Precio - CosteMarginal) [EUR/MWh] * Capacidad [MW] en las horas operadas
+        margin_eur = np.where(running, profits, 0.0).sum(axis=1) * capacity_kw / 1000.0
+        revenue_eur = np.where(running, candidate_prices, 0.0).sum(axis=1) * capacity_kw / 1000.0
+
+        return {
+            "operating_hours": operating_hours,
+            "generation_kwh": operating_hours * float(capacity_kw),
+            "fuel_kg": operating_hours * self.fuel_consumption_kg_per_hour(capacity_kw),
+            "revenue_eur": revenue_eur,
+            "margin_eur": margin_eur
+        }
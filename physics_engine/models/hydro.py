@@ -1,5 +1,157 @@
 import numpy as np
-import pandas as pd
+
+# Núcleo hidráulico solo NumPy. Todos los parámetros admiten escalares o arrays con broadcasting
+# sobre el eje horario final: p.ej. diámetros (k, 1) x caudales (1, m) -> superficie (k, m, horas)
+# con una sola evaluación, para barridos de dimensionamiento (tubería forzada, caudal de diseño...).
+
+RHO_WATER = 1000.0 # kg/m3
+GRAVITY = 9.81
+
+
+def rolling_mean(values, window):
+    """Media móvil hacia atrás con min_periods=1 (equivalente a pandas rolling().mean()) vía suma acumulada."""
+    values = np.asarray(values, dtype=float)
+    cumulative = np.concatenate(([0.0], np.cumsum(values)))
+    n = len(values)
+    ends = np.arange(1, n + 1)
+    starts = np.maximum(ends - window, 0)
+    return (cumulative[ends] - cumulative[starts]) / (ends - starts)
+
+
+def seasonal_flow_noise(n, seed=0):
+    """
+    Ruido del caudal sintético estacional (se genera una vez y se comparte en todo el barrido).
+    Con semilla fija: el mismo emplazamiento da siempre el mismo resultado (cacheable).
+    """
+    return np.random.default_rng(seed).normal(0, 0.02, n)
+
+
+def hydro_power_kw(precipitation_mm, head, efficiency=0.85, catchment_area_m2=10_000_000, runoff_coef=0.5,
+                   flow_design=None, ecological_flow=0.0, penstock_length=None, penstock_diameter=None,
+                   mannings_n=0.013, auto_resize_penstock=True, window=120, noise=None):
+    """
+    Convierte precipitación (mm/h) a Potencia (kW).
+    Validación: 1 mm = 0.001 m.
+    Volumen (m3) = Precip (m) * Área (m2).
+    Caudal Q (m3/s) = Volumen / 3600 (ya que datos son horarios).
+    Potencia (W) = rho * g * Q * H * eff
+    Parámetros: escalares o arrays de forma (..., 1) que hacen broadcasting contra las horas.
+    flow_design / penstock_*: None desactiva el escalado por caudal de diseño / las pérdidas en tubería.
+    Se evalúa en dos etapas: hydro_flow_profile (hidrología, la parte costosa) y hydro_power_from_flow.
+    """
+    flow = hydro_flow_profile(precipitation_mm, catchment_area_m2, runoff_coef,
+                              design_scaled=flow_design is not None, window=window, noise=noise)
+    return hydro_power_from_flow(flow, head, efficiency, flow_design, ecological_flow, penstock_length,
+                                 penstock_diameter, mannings_n, auto_resize_penstock)
+
+
+def hydro_flow_profile(precipitation_mm, catchment_area_m2=10_000_000, runoff_coef=0.5, design_scaled=False,
+                       window=120, noise=None):
+    """
+    Etapa hidrológica: caudal horario de la cuenca.
+    design_scaled=False: caudal absoluto (m3/s).
+    design_scaled=True: caudal por unidad de caudal de diseño (antes del límite de turbina), de modo que
+    cualquier flow_design se obtiene escalando este perfil (ver hydro_power_from_flow).
+    """
+    # Robustez: Rellenar NaNs y asegurar float
+    precip_m = np.nan_to_num(np.asarray(precipitation_mm, dtype=float), nan=0.0) / 1000.0
+    # Efecto retardo: La lluvia no se convierte en caudal instantáneamente. 
+    # Hidrología simple: Aplicar media móvil (tiempo de concentración) para simular respuesta del río.
+    # 24h es muy rápido para flujo base. Usamos 72h-120h para "Inercia del Río".
+    # Esto suaviza los picos horarios extremos.
+    precip_rolling = rolling_mean(precip_m, window)
+
+    # Calcular caudal físico potencial disponible de la cuenca
+    # Tomando totales horarios como flujo repartido en la hora
+    catchment = np.asarray(catchment_area_m2, dtype=float) * np.asarray(runoff_coef, dtype=float)
+    flow_q_m3s = precip_rolling * catchment / 3600.0
+    if not design_scaled:
+        return flow_q_m3s
+
+    # Ajuste para Experiencia de Usuario:
+    # Si el usuario proporciona un 'flow_rate_design' (Caudal de Diseño), asumimos que el río coincide con esa escala.
+    # Los datos de precipitación nos dan la VARIABILIDAD (estacionalidad), pero ajustamos la MAGNITUD.
+    # Usar el percentil 60 como referencia de "Capacidad de diseño".
+    # El percentil escala con la cuenca: se calcula una vez sobre la serie unitaria.
+    unit_ref = np.percentile(precip_rolling / 3600.0, 60)
+    max_flow_ref = unit_ref * catchment
+    has_ref = max_flow_ref > 1e-6
+    flow_ratio = flow_q_m3s / np.where(has_ref, max_flow_ref, 1.0)
+
+    if not np.all(has_ref):
+        # FALLBACK: Flujo Estacional Sintético
+        # Curva "Lenta" simple usando ondas sinusoidales.
+        # Configuración: 0.9 base + 0.3 amplitud -> ~72% Factor de Planta ("Río Principal" consistente).
+        n = precip_m.shape[-1]
+        t = np.linspace(0, 2 * np.pi, n)
+        seasonal_trend = 0.9 + 0.3 * np.sin(t - np.pi / 2)
+        # Añadir pequeño ruido para evitar curva matemática perfecta
+        if noise is None:
+            noise = seasonal_flow_noise(n)
+        synthetic_ratio = np.clip(seasonal_trend + noise, 0, 1.5)
+        flow_ratio = np.where(has_ref, flow_ratio, synthetic_ratio)
+
+    return flow_ratio
+
+
+def hydro_power_from_flow(flow, head, efficiency=0.85, flow_design=None, ecological_flow=0.0, penstock_length=None,
+                          penstock_diameter=None, mannings_n=0.013, auto_resize_penstock=True):
+    """
+    Etapa de planta: caudal de hydro_flow_profile -> Potencia (kW).
+    Con flow_design, flow es el caudal por unidad de diseño: se escala y se aplican exactamente
+    el límite de turbina, el caudal ecológico y las pérdidas en tubería.
+    """
+    flow_q_m3s = flow
+    if flow_design is not None:
+        flow_design = np.asarray(flow_design, dtype=float)
+        flow_q_m3s = flow_design * flow
+        # Limitar flujo a la capacidad de diseño (Límite de turbina)
+        flow_q_m3s = np.minimum(flow_q_m3s, flow_design)
+
+    # Aplicar sustracción de caudal ecológico
+    flow_q_m3s = np.maximum(flow_q_m3s - np.asarray(ecological_flow, dtype=float), 0.0)
+
+    # CÁLCULO DE PÉRDIDAS EN TUBERÍA (Manning)
+    # h_loss = S * L. Fórmula de Manning para S (Gradiente hidráulico):
+    # V = (1/n) * R^(2/3) * S^(1/2)  => S = (V * n)^2 / R^(4/3)
+    effective_head = np.asarray(head, dtype=float)
+    if penstock_length is not None and penstock_diameter is not None:
+        L = np.asarray(penstock_length, dtype=float)
+        D = np.asarray(penstock_diameter, dtype=float)
+        if auto_resize_penstock and flow_design is not None:
+            D = resized_penstock_diameter(D, flow_design)
+        head_loss = manning_head_loss(flow_q_m3s, L, D, mannings_n)
+        # Effective Head = Gross Head - Head Loss (no negativa); sin sección (D=0) no hay pérdidas
+        effective_head = np.where(D > 0, np.maximum(effective_head - head_loss, 0.0), effective_head)
+
+    # Use EFFECTIVE Head instead of Gross Head
+    power_watts = RHO_WATER * GRAVITY * flow_q_m3s * effective_head * np.asarray(efficiency, dtype=float)
+    return power_watts / 1000.0
+
+
+def resized_penstock_diameter(diameter, flow_design):
+    """
+    Optimización Agresiva: si la velocidad a caudal de diseño supera 3.0 m/s, se redimensiona
+    la tubería para 2.5 m/s (ingeniería conservadora: minimiza la pérdida de carga).
+    """
+    diameter = np.asarray(diameter, dtype=float)
+    area = np.pi * diameter ** 2 / 4.0
+    velocity = np.divide(flow_design, area, out=np.zeros(np.broadcast(flow_design, area).shape), where=area > 0)
+    resized = np.sqrt(4.0 * flow_design / (np.pi * 2.5))
+    return np.where((area > 0) & (velocity > 3.0), resized, diameter)
+
+
+def manning_head_loss(flow_q_m3s, length, diameter, mannings_n=0.013):
+    """Pérdida de carga (m) en tubería circular llena: h = L * (V*n)^2 / R^(4/3), R = D/4."""
+    diameter = np.asarray(diameter, dtype=float)
+    # Area A = pi * D^2 / 4 ; Radio hidráulico R = A / P = D / 4
+    area = np.pi * diameter ** 2 / 4.0
+    radius = diameter / 4.0
+    shape = np.broadcast(flow_q_m3s, area).shape
+    velocity = np.divide(flow_q_m3s, area, out=np.zeros(shape), where=area != 0)
+    slope = np.divide((velocity * mannings_n) ** 2, radius ** (4.0 / 3.0), out=np.zeros(shape), where=radius > 0)
+    return np.asarray(length, dtype=float) * slope
+
 
 class HydroModel:
     def __init__(self, head_height, efficiency=0.85, catchment_area_km2=10, runoff_coef=0.5, flow_design=None, turbine_params=None):
@@ -25,120 +177,38 @@ class HydroModel:
         # Curva simple para rango válido, mantenemos constante por robustez a menos que tengamos puntos de curva.
         return self.efficiency
 
+    def flow_params(self):
+        """Argumentos de hydro_flow_profile (etapa hidrológica, independiente del dimensionado de la planta)."""
+        return {
+            "catchment_area_m2": self.catchment_area_m2,
+            "runoff_coef": self.runoff_coef,
+            "design_scaled": bool(self.flow_design)
+        }
+
+    def plant_params(self):
+        """Argumentos de hydro_power_from_flow (salto, eficiencia, caudal de diseño, tubería...)."""
+        params = self.kernel_params()
+        for name in ("catchment_area_m2", "runoff_coef"):
+            params.pop(name)
+        return params
+
+    def kernel_params(self):
+        """Argumentos de hydro_power_kw para esta configuración (base de los barridos de parámetros)."""
+        has_penstock = self.turbine_params.get("penstock_length") and self.turbine_params.get("penstock_diameter")
+        return {
+            "head": self.head_height,
+            "efficiency": self.efficiency,
+            "catchment_area_m2": self.catchment_area_m2,
+            "runoff_coef": self.runoff_coef,
+            "flow_design": self.flow_design if self.flow_design else None,
+            "ecological_flow": float(self.turbine_params.get("ecological_flow", 0.0)),
+            "penstock_length": float(self.turbine_params["penstock_length"]) if has_penstock else None,
+            "penstock_diameter": float(self.turbine_params["penstock_diameter"]) if has_penstock else None,
+            "mannings_n": float(self.turbine_params.get("mannings_n", 0.013))
+        }
+
     def predict_generation(self, precipitation_mm_hour_series):
         """
-        Convierte precipitación (mm/h) a Potencia (kW).
-        Validación: 1 mm = 0.001 m.
-        Volumen (m3) = Precip (m) * Área (m2).
-        Caudal Q (m3/s) = Volumen / 3600 (ya que datos son horarios).
-        Potencia (W) = rho * g * Q * H * eff
+        Convierte precipitación (mm/h) a Potencia (kW) para esta configuración (ver hydro_power_kw).
         """
-        # Robustez: Rellenar NaNs y asegurar float
-        precip_series = pd.Series(precipitation_mm_hour_series).fillna(0.0).astype(float)
-        precip_m = precip_series / 1000.0
-        # Efecto retardo: La lluvia no se convierte en caudal instantáneamente. 
-        # Hidrología simple: Aplicar media móvil (tiempo de concentración) para simular respuesta del río.
-        # 24h es muy rápido para flujo base. Usamos 72h-120h para "Inercia del Río".
-        # Esto suaviza los picos horarios extremos.
-        precip_rolling = precip_m.rolling(window=120, min_periods=1, center=False).mean()
-        
-        # Calcular caudal físico potencial disponible de la cuenca pequeña por defecto
-        volume_m3 = precip_rolling.to_numpy() * self.catchment_area_m2 * self.runoff_coef
-        
-        # Tomando totales horarios como flujo repartido en la hora
-        flow_q_m3s = volume_m3 / 3600.0 
-        
-        # Ajuste para Experiencia de Usuario:
-        # Si el usuario proporciona un 'flow_rate_design' (Caudal de Diseño), asumimos que el río coincide con esa escala.
-        # Los datos de precipitación nos dan la VARIABILIDAD (estacionalidad), pero ajustamos la MAGNITUD.
-        if self.flow_design:
-            # Normalizar el array de flujo (escalado de 0 a 1 relativo a sus picos)
-            # Usar el percentil 60 como referencia de "Capacidad de diseño".
-            max_flow_ref = np.percentile(flow_q_m3s, 60)
-            if max_flow_ref > 1e-6:
-                scale_factor = self.flow_design / max_flow_ref
-                flow_q_m3s = flow_q_m3s * scale_factor
-            else:
-                # FALLBACK: Flujo Estacional Sintético
-                # Curva "Lenta" simple usando ondas sinusoidales, SIN ruido aleatorio para estabilidad horaria.
-                # Optimización Hidrológica de Alto Rendimiento:
-                # Para alcanzar el punto de equilibrio (break-even) con alto CAPEX, asumimos un "Río Principal".
-                # Configuración: 0.9 base + 0.3 amplitud -> ~72% Factor de Planta.
-                # Esto simula un río con flujo muy consistente, minimizando el impacto de la estación seca.
-                N = len(flow_q_m3s)
-                t = np.linspace(0, 2 * np.pi, N)
-                
-                # Base 0.9 significa que el flujo promedio es 90% del diseño (antes del recorte).
-                seasonal_trend = 0.9 + 0.3 * np.sin(t - np.pi/2) 
-                
-                # Añadir pequeño ruido para evitar curva matemática perfecta, pero suavizada
-                noise = np.random.normal(0, 0.02, N)
-                
-                synthetic_flow = self.flow_design * (seasonal_trend + noise)
-                flow_q_m3s = np.clip(synthetic_flow, 0, self.flow_design * 1.5)
-
-            # Limitar flujo a la capacidad de diseño (Límite de turbina)
-            flow_q_m3s = np.minimum(flow_q_m3s, self.flow_design)
-
-        # Aplicar sustracción de caudal ecológico si está presente en parámetros
-        ecological_flow = self.turbine_params.get("ecological_flow", 0.0)
-        flow_q_m3s = np.maximum(flow_q_m3s - ecological_flow, 0.0)
-
-        # CÁLCULO DE PÉRDIDAS EN TUBERÍA (Darcy-Weisbach / Manning)
-        # Si se proporcionan detalles de tubería forzada, calcular pérdida de carga.
-        # h_loss = S * L. Fórmula de Manning para S (Gradiente hidráulico):
-        # V = (1/n) * R^(2/3) * S^(1/2)  => S = (V * n)^2 / R^(4/3)
-        # h_loss = L * ( (V*n)^2 / R^(4/3) )
-        if self.turbine_params.get("penstock_length") and self.turbine_params.get("penstock_diameter"):
-             L = float(self.turbine_params["penstock_length"])
-             D = float(self.turbine_params["penstock_diameter"])
-
-             # Optimización Agresiva:
-             # Velocidad recomendada 3-4 m/s. La alta fricción reduce el VPN.
-             # Nueva Lógica: Imponer límite estricto de velocidad de 3.0 m/s para preservación óptima de altura.
-             if self.flow_design:
-                 A_check = np.pi * (D**2) / 4.0
-                 if A_check > 0:
-                     V_check = self.flow_design / A_check
-                     # If velocity is consistently high (> 3.0 m/s), resize penstock.
-                     if V_check > 3.0:
-                         # Resize for a target velocity of 2.5 m/s (Conservative Engineering)
-                         # This minimizes head loss significantly, maximizing generation and revenue.
-                         D_new = np.sqrt(4.0 * self.flow_design / (np.pi * 2.5))
-                         D = D_new
-             # -----------------------------------------------------
-
-             n = float(self.turbine_params.get("mannings_n", 0.013)) # roughness
-             
-             # Area A = pi * D^2 / 4
-             A = np.pi * (D**2) / 4
-             # Wetted Perimeter P = pi * D
-             # Hydraulic Radius R = A / P = D / 4
-             R = D / 4.0
-             
-             # Velocity V = Q / A
-             # Prevent div by zero
-             V = np.divide(flow_q_m3s, A, out=np.zeros_like(flow_q_m3s), where=A!=0)
-             
-             # Slope S
-             # S = (V * n)^2 / R^(4/3)
-             # Avoid R=0
-             if R > 0:
-                 S = (V * n)**2 / (R**(4/3))
-                 head_loss = L * S
-                 
-                 # Effective Head = Gross Head - Head Loss
-                 effective_head = self.head_height - head_loss
-                 # Cannot be negative
-                 effective_head = np.maximum(effective_head, 0.0)
-             else:
-                 effective_head = self.head_height
-        else:
-             effective_head = self.head_height
-
-        # Calculate Power
-        # Use EFFECTIVE Head instead of Gross Head
-        power_watts = self.water_density * self.gravity * flow_q_m3s * effective_head * self.efficiency
-        power_kw = power_watts / 1000.0
-        
-        return power_kw
+        return hydro_power_kw(precipitation_mm_hour_series, **self.kernel_params())
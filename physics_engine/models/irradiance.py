@@ -0,0 +1,142 @@
+import numpy as np
+
+# Motor local de irradiancia en el plano del panel (POA).
+# Permite calcular la radiación sobre cualquier inclinación/azimut a partir de GHI/DNI/DHI horarios
+# almacenados en BD, sin pedir 'global_tilted_irradiance' a Open-Meteo.
+# Convención de azimut: 0=Norte, 90=Este, 180=Sur, 270=Oeste (igual que el resto del sistema).
+# Todas las funciones aceptan arrays y hacen broadcasting: tilt/azimuth pueden ser escalares
+# o arrays columna (k, 1) para evaluar k orientaciones a la vez sobre series de n horas -> (k, n).
+
+SOLAR_CONSTANT = 1367.0 # W/m2
+
+
+def _day_angle(times):
+    """Ángulo diario (rad) y hora UTC decimal para un array datetime64 (UTC, sin zona)."""
+    times = np.asarray(times, dtype='datetime64[s]')
+    day_of_year = (times.astype('datetime64[D]') - times.astype('datetime64[Y]')).astype(np.int64) + 1
+    seconds_of_day = (times - times.astype('datetime64[D]')).astype(np.int64)
+    hour = seconds_of_day / 3600.0
+    gamma = 2 * np.pi / 365.0 * (day_of_year - 1 + (hour - 12) / 24.0)
+    return gamma, hour
+
+
+def extraterrestrial_radiation(times):
+    """Irradiancia extraterrestre normal (W/m2) con corrección por excentricidad orbital (Spencer)."""
+    gamma, _ = _day_angle(times)
+    return SOLAR_CONSTANT * (1.00011 + 0.034221 * np.cos(gamma) + 0.00128 * np.sin(gamma)
+                             + 0.000719 * np.cos(2 * gamma) + 0.000077 * np.sin(2 * gamma))
+
+
+def solar_position(times, latitude, longitude):
+    """
+    Posición solar vectorizada (algoritmo NOAA simplificado, error < 0.5 grados).
+    times: array datetime64 en UTC (sin zona horaria).
+    Retorna (zenith_deg, azimuth_deg) con azimut medido desde el Norte en sentido horario.
+    """
+    gamma, hour = _day_angle(times)
+
+    # Ecuación del tiempo (minutos) y declinación solar (rad)
+    eqtime = 229.18 * (0.000075 + 0.001868 * np.cos(gamma) - 0.032077 * np.sin(gamma)
+                       - 0.014615 * np.cos(2 * gamma) - 0.040849 * np.sin(2 * gamma))
+    decl = (0.006918 - 0.399912 * np.cos(gamma) + 0.070257 * np.sin(gamma)
+            - 0.006758 * np.cos(2 * gamma) + 0.000907 * np.sin(2 * gamma)
+            - 0.002697 * np.cos(3 * gamma) + 0.00148 * np.sin(3 * gamma))
+
+    # Tiempo solar verdadero (minutos) y ángulo horario (rad)
+    true_solar_time = hour * 60.0 + eqtime + 4.0 * longitude
+    hour_angle = np.radians(true_solar_time / 4.0 - 180.0)
+
+    lat_rad = np.radians(latitude)
+    cos_zenith = np.sin(lat_rad) * np.sin(decl) + np.cos(lat_rad) * np.cos(decl) * np.cos(hour_angle)
+    zenith = np.degrees(np.arccos(np.clip(cos_zenith, -1.0, 1.0)))
+
+    # Azimut desde el Sur (atan2) desplazado 180 grados para medirlo desde el Norte
+    azimuth = np.degrees(np.arctan2(
+        np.sin(hour_angle),
+        np.cos(hour_angle) * np.sin(lat_rad) - np.tan(decl) * np.cos(lat_rad)
+    )) + 180.0
+
+    return zenith, azimuth
+
+
+def erbs_decomposition(ghi, zenith, dni_extra):
+    """
+    Separa GHI en DNI y DHI con la correlación de Erbs (índice de claridad kt).
+    Se usa para filas antiguas en BD que solo guardan GHI.
+    Retorna (dni, dhi) en W/m2.
+    """
+    ghi = np.nan_to_num(np.asarray(ghi, dtype=np.float64), nan=0.0)
+    cos_zenith = np.cos(np.radians(zenith))
+    # Por debajo de ~86 grados de elevación no descomponemos (ruido numérico al amanecer/anochecer)
+    valid = cos_zenith > 0.065
+    safe_cos = np.where(valid, cos_zenith, 1.0)
+
+    kt = np.where(valid, ghi / (dni_extra * safe_cos), 0.0)
+    kt = np.clip(kt, 0.0, 1.0)
+
+    diffuse_fraction = np.where(
+        kt <= 0.22, 1.0 - 0.09 * kt,
+        np.where(kt <= 0.80,
+                 0.9511 - 0.1604 * kt + 4.388 * kt**2 - 16.638 * kt**3 + 12.336 * kt**4,
+                 0.165)
+    )
+
+    dhi = ghi * diffuse_fraction
+    dni = np.where(valid, (ghi - dhi) / safe_cos, 0.0)
+    return np.maximum(dni, 0.0), np.where(valid, dhi, ghi)
+
+
+def plane_of_array(ghi, dni, dhi, zenith, sun_azimuth, dni_extra, tilt, surface_azimuth, albedo=0.2):
+    """
+    Transposición Hay-Davies de GHI/DNI/DHI al plano del panel.
+    tilt, surface_azimuth en grados (escalares o arrays columna para varias orientaciones).
+    Retorna la irradiancia POA total en W/m2.
+    """
+    tilt_rad = np.radians(tilt)
+    zenith_rad = np.radians(zenith)
+
+    cos_zenith = np.cos(zenith_rad)
+    cos_aoi = (cos_zenith * np.cos(tilt_rad)
+               + np.sin(zenith_rad) * np.sin(tilt_rad) * np.cos(np.radians(sun_azimuth - surface_azimuth)))
+    cos_aoi = np.maximum(cos_aoi, 0.0)
+
+    # Componente directa sobre el plano
+    beam = dni * cos_aoi
+
+    # Difusa del cielo (Hay-Davies): fracción circunsolar según índice de anisotropía
+    anisotropy = np.clip(dni / dni_extra, 0.0, 1.0)
+    rb = cos_aoi / np.maximum(cos_zenith, 0.01745) # Límite en 89 grados para evitar divergencias
+    sky_diffuse = dhi * (anisotropy * rb + (1 - anisotropy) * (1 + np.cos(tilt_rad)) / 2.0)
+
+    # Reflejada por el suelo (albedo isotrópico)
+    ground = ghi * albedo * (1 - np.cos(tilt_rad)) / 2.0
+
+    poa = beam + sky_diffuse + ground
+    return np.maximum(np.nan_to_num(poa, nan=0.0), 0.0)
+
+
+class IrradianceFrame:
+    """
+    Precalcula todo lo que no depende de la orientación (posición solar, DNI/DHI completados)
+    para una serie horaria, de modo que cada orientación adicional solo cuesta la transposición.
+    """
+    def __init__(self, times, latitude, longitude, ghi, dni=None, dhi=None, period_minutes=60):
+        times = np.asarray(times, dtype='datetime64[s]')
+        # Los datos horarios de Open-Meteo son promedios de la hora ANTERIOR: usamos el punto medio
+        mid_times = times - np.timedelta64(period_minutes // 2, 'm')
+
+        self.zenith, self.sun_azimuth = solar_position(mid_times, latitude, longitude)
+        self.dni_extra = extraterrestrial_radiation(mid_times)
+        self.ghi = np.nan_to_num(np.asarray(ghi, dtype=np.float64), nan=0.0)
+
+        # Completar DNI/DHI donde falten (filas antiguas en BD) con la descomposición de Erbs
+        est_dni, est_dhi = erbs_decomposition(self.ghi, self.zenith, self.dni_extra)
+        dni = est_dni if dni is None else np.where(np.isnan(dni), est_dni, dni)
+        dhi = est_dhi if dhi is None else np.where(np.isnan(dhi), est_dhi, dhi)
+        self.dni = np.asarray(dni, dtype=np.float64)
+        self.dhi = np.asarray(dhi, dtype=np.float64)
+
+    def poa(self, tilt, azimuth, albedo=0.2):
+        """Irradiancia en el plano para una (o varias, vía broadcasting) orientaciones."""
+        return plane_of_array(self.ghi, self.dni, self.dhi, self.zenith, self.sun_azimuth,
+                              self.dni_extra, tilt, azimuth, albedo)
@@ -1,38 +1,104 @@
 import numpy as np
-import pandas as pd
+from functools import lru_cache
+
+# Año al que se refiere la tendencia: la tendencia (EUR/MWh por hora) se acumula desde aquí
+TREND_REFERENCE_YEAR = 2023
+# Horas por bloque de la recurrencia AR(1) de generate_price_paths (tamaño de la matriz de retardos)
+AR1_BLOCK_HOURS = 32
+
+@lru_cache(maxsize=64)
+def _deterministic_curve(base_price, trend, year, hours=8760):
+    """
+    Componentes sin azar de la curva horaria (base + estacional + diario + tendencia).
+    Se calculan una vez por (base_price, trend, year) y se comparten en solo lectura.
+    """
+    t = np.arange(hours)
+
+    # Componente Estacional (Más alto en Invierno/Verano, más bajo en Primavera/Otoño)
+    # Coseno con periodo de un año
+    seasonal = 10 * np.cos(2 * np.pi * t / 8760)
+
+    # Componente Diario (Picos de curva de pato: Mañana 8-10, Noche 19-22)
+    day_hour = t % 24
+    daily = 15 * np.sin(2 * np.pi * (day_hour - 8)/24) + 10 * np.sin(2 * np.pi * (day_hour - 20)/24)
+
+    # Tendencia (continúa de un año al siguiente)
+    trend_component = trend * (t + (year - TREND_REFERENCE_YEAR) * hours)
+
+    curve = base_price + seasonal + daily + trend_component
+    curve.setflags(write=False)
+    return curve
+
+def random_seed():
+    """Semilla nueva (entero de 32 bits) para peticiones sin semilla: se devuelve al cliente para reproducir."""
+    return int(np.random.SeedSequence().entropy % (2 ** 32))
 
 class MarketModel:
-    def __init__(self, base_price=50.0, volatility=0.2, trend=0.0):
+    HOURS = 8760
+
+    def __init__(self, base_price=50.0, volatility=0.2, trend=0.0, seed=None):
+        """
+        seed: semilla explícita (entero >= 0) del ruido. Con semilla, cada año tiene su propio
+        ruido reproducible (mismo seed y año -> misma curva); sin semilla el ruido cambia en cada llamada.
+        """
         self.base_price = base_price
         self.volatility = volatility
-        self.trend = trend 
+        self.trend = trend
+        self.seed = seed
+
+    def deterministic_curve(self, year=TREND_REFERENCE_YEAR):
+        """Curva sin ruido del año (array de solo lectura compartido, cacheado)."""
+        return _deterministic_curve(float(self.base_price), float(self.trend), int(year), self.HOURS)
+
+    def _rng(self, year):
+        if self.seed is None:
+            return np.random.default_rng()
+        return np.random.default_rng([int(self.seed), int(year)])
 
-    def generate_annual_price_curve(self, year=2023):
+    def generate_annual_price_curve(self, year=TREND_REFERENCE_YEAR):
         """
         Genera una curva de precios horarios sintética pero realista para un año (8760 horas).
         Utiliza un perfil diario base + efecto estacional + volatilidad aleatoria.
         Esto sirve como un método de respaldo avanzado para proyecciones cuando se desconocen los datos reales futuros.
+        Retorna un array NumPy (EUR/MWh).
         """
-        hours = 8760
-        t = np.arange(hours)
-        
-        # Componente Estacional (Más alto en Invierno/Verano, más bajo en Primavera/Otoño)
-        # Coseno con periodo de un año
-        seasonal = 10 * np.cos(2 * np.pi * t / 8760)
-        
-        # Componente Diario (Picos de curva de pato: Mañana 8-10, Noche 19-22)
-        day_hour = t % 24
-        daily = 15 * np.sin(2 * np.pi * (day_hour - 8)/24) + 10 * np.sin(2 * np.pi * (day_hour - 20)/24)
-        
-        # Tendencia
-        trend_component = self.trend * t
-        
-        # Volatilidad (Paseo Aleatorio o Ruido Blanco)
-        noise = np.random.normal(0, self.base_price * self.volatility, hours)
-        
-        prices = self.base_price + seasonal + daily + trend_component + noise
-        
+        # Volatilidad (Ruido Blanco)
+        prices = self._rng(year).normal(0, self.base_price * self.volatility, self.HOURS)
+        prices += self.deterministic_curve(year)
+
         # Recortar precios negativos si no permitidos (aunque existen en mercados UE, raros en sim simple)
-        prices = prices.clip(min=0)
-        
-        return prices.tolist()
+        np.maximum(prices, 0.0, out=prices)
+        return prices
+
+    def generate_price_paths(self, num_paths, year=TREND_REFERENCE_YEAR, autocorrelation=0.9):
+        """
+        Genera num_paths curvas horarias en un único array 2-D (trayectorias x horas) para Monte Carlo.
+        El ruido es AR(1): e[t] = phi * e[t-1] + sqrt(1 - phi^2) * sigma * z[t], de modo que la
+        desviación típica estacionaria sigue siendo base_price * volatility (como el ruido blanco
+        de generate_annual_price_curve) pero los precios altos/bajos se agrupan en rachas de horas.
+        Con la misma semilla se obtienen exactamente las mismas trayectorias.
+        """
+        hours = self.HOURS
+        phi = float(np.clip(autocorrelation, 0.0, 0.999))
+        sigma = self.base_price * self.volatility
+
+        # Ruido en disposición (horas x trayectorias). La recurrencia e[t] = phi * e[t-1] + u[t] se
+        # resuelve por bloques de horas: dentro de un bloque e = L @ u + phi^(i+1) * e_anterior, con
+        # L[i, j] = phi^(i-j) (j <= i). Son ~270 productos de matrices en lugar de 8760 pasos en Python,
+        # y el coste por trayectoria extra es solo aritmética BLAS.
+        noise = self._rng(year).standard_normal((hours, num_paths))
+        noise[0] *= sigma
+        noise[1:] *= np.sqrt(1.0 - phi ** 2) * sigma
+        lags = np.arange(AR1_BLOCK_HOURS)
+        lag_matrix = lags[:, None] - lags[None, :]
+        kernel = np.where(lag_matrix >= 0, phi ** np.maximum(lag_matrix, 0), 0.0)
+        carry = phi ** (lags + 1.0)
+        for start in range(1, hours, AR1_BLOCK_HOURS):
+            end = min(start + AR1_BLOCK_HOURS, hours)
+            n = end - start
+            noise[start:end] = kernel[:n, :n] @ noise[start:end] + carry[:n, None] * noise[start - 1]
+
+        prices = np.empty((num_paths, hours))
+        np.add(self.deterministic_curve(year), noise.T, out=prices)
+        np.maximum(prices, 0.0, out=prices)
+        return prices
@@ -0,0 +1,116 @@
+import numpy as np
+from models.irradiance import plane_of_array
+
+# Búsqueda de la orientación óptima (inclinación/azimut) de un campo solar.
+# La POA se calcula localmente (models/irradiance.py) sobre el clima multianual ya cacheado,
+# por lo que cada orientación evaluada solo cuesta la transposición + SolarModel, sin red.
+# Convención de azimut: 0=Norte, 90=Este, 180=Sur, 270=Oeste.
+
+
+class OrientationOptimizer:
+    """
+    Evalúa la generación anual AC para muchas orientaciones a la vez y busca el máximo:
+    1. Rejilla gruesa (superficie de producción) sobre el rango permitido.
+    2. Refinamiento local alrededor del mejor punto (búsqueda por patrón con paso decreciente).
+    Restricciones: inclinación/azimut fijos (p.ej. cubiertas) y rangos acotados.
+    """
+    def __init__(self, irradiance_frame, temperature, model, capacity_kw, num_years, batch_size=32):
+        # Solo las horas con sol aportan producción: se descartan las nocturnas (resultado idéntico)
+        daylight = irradiance_frame.ghi > 0
+        self.temperature = np.asarray(temperature, dtype=float)[daylight]
+        self.model = model
+        self.capacity_kw = float(capacity_kw)
+        self.num_years = float(num_years)
+        self.batch_size = int(batch_size)
+        self.evaluations = 0
+
+        self._ghi = irradiance_frame.ghi[daylight]
+        self._dni = irradiance_frame.dni[daylight]
+        self._dhi = irradiance_frame.dhi[daylight]
+        self._zenith = irradiance_frame.zenith[daylight]
+        self._sun_azimuth = irradiance_frame.sun_azimuth[daylight]
+        self._dni_extra = irradiance_frame.dni_extra[daylight]
+
+    def annual_yield(self, tilts, azimuths):
+        """Generación anual media (kWh) para cada par (tilt, azimuth). Arrays 1-D de igual longitud."""
+        tilts = np.asarray(tilts, dtype=float)
+        azimuths = np.asarray(azimuths, dtype=float)
+        result = np.empty(len(tilts))
+        # Por lotes para acotar la memoria (orientaciones x horas de sol)
+        for start in range(0, len(tilts), self.batch_size):
+            stop = start + self.batch_size
+            poa = plane_of_array(self._ghi, self._dni, self._dhi, self._zenith, self._sun_azimuth,
+                                 self._dni_extra, tilts[start:stop, None], azimuths[start:stop, None])
+            generation = self.model.predict_generation(poa, self.temperature, self.capacity_kw)
+            result[start:stop] = generation.sum(axis=1) / self.num_years
+        self.evaluations += len(tilts)
+        return result
+
+    @staticmethod
+    def _axis(value_min, value_max, step):
+        if value_max <= value_min:
+            return np.array([value_min], dtype=float)
+        count = int(np.floor((value_max - value_min) / step + 1e-9)) + 1
+        values = value_min + step * np.arange(count)
+        if values[-1] < value_max - 1e-9:
+            values = np.append(values, value_max)
+        return values
+
+    def optimize(self, tilt_range=(0.0, 90.0), azimuth_range=None, fixed_tilt=None, fixed_azimuth=None,
+                 coarse_tilt_step=10.0, coarse_azimuth_step=20.0, tolerance=0.5):
+        """
+        azimuth_range: (min, max) en grados o None para el círculo completo (con continuidad 360 -> 0).
+        Con min > max el rango cruza el Norte (p.ej. (300, 60) = 300..360..60).
+        Retorna (óptimo, superficie) con la superficie evaluada en la rejilla gruesa.
+        """
+        full_circle = azimuth_range is None and fixed_azimuth is None
+        tilt_min, tilt_max = (fixed_tilt, fixed_tilt) if fixed_tilt is not None else tilt_range
+        if fixed_azimuth is not None:
+            az_min = az_max = float(fixed_azimuth) % 360.0
+        elif full_circle:
+            az_min, az_max = 0.0, 360.0 - coarse_azimuth_step
+        else:
+            az_min, az_max = (float(a) for a in azimuth_range)
+            if az_min > az_max:
+                # Rango que cruza el Norte: se busca en coordenadas desenrolladas (az_max + 360)
+                az_max += 360.0
+
+        # 1. Rejilla gruesa: una sola pasada vectorizada
+        tilt_axis = self._axis(float(tilt_min), float(tilt_max), coarse_tilt_step)
+        azimuth_axis = self._axis(float(az_min), float(az_max), coarse_azimuth_step)
+        grid_tilt, grid_azimuth = np.meshgrid(tilt_axis, azimuth_axis, indexing="ij")
+        # Se evalúa siempre con el azimut reducido a [0, 360)
+        surface = self.annual_yield(grid_tilt.ravel(), np.mod(grid_azimuth.ravel(), 360.0)).reshape(grid_tilt.shape)
+
+        best = np.unravel_index(np.argmax(surface), surface.shape)
+        best_tilt, best_azimuth = tilt_axis[best[0]], azimuth_axis[best[1]]
+        best_yield = surface[best]
+
+        # 2. Refinamiento local: vecinos 3x3 con paso decreciente hasta la tolerancia
+        tilt_step = coarse_tilt_step / 2.0 if len(tilt_axis) > 1 else 0.0
+        azimuth_step = coarse_azimuth_step / 2.0 if len(azimuth_axis) > 1 else 0.0
+        while tilt_step >= tolerance or azimuth_step >= tolerance:
+            # Un eje que ya alcanzó la tolerancia deja de moverse
+            dt_step = tilt_step if tilt_step >= tolerance else 0.0
+            da_step = azimuth_step if azimuth_step >= tolerance else 0.0
+            offsets = [(dt, da) for dt in dict.fromkeys((-dt_step, 0.0, dt_step))
+                       for da in dict.fromkeys((-da_step, 0.0, da_step)) if (dt, da) != (0.0, 0.0)]
+            candidate_tilt = np.clip(best_tilt + np.array([o[0] for o in offsets]), tilt_min, tilt_max)
+            candidate_azimuth = best_azimuth + np.array([o[1] for o in offsets])
+            if full_circle:
+                candidate_azimuth = np.mod(candidate_azimuth, 360.0)
+            else:
+                candidate_azimuth = np.clip(candidate_azimuth, az_min, az_max)
+
+            yields = self.annual_yield(candidate_tilt, np.mod(candidate_azimuth, 360.0))
+            i = int(np.argmax(yields))
+            if yields[i] > best_yield:
+                best_tilt, best_azimuth, best_yield = candidate_tilt[i], candidate_azimuth[i], yields[i]
+            else:
+                # Sin mejora en este radio: reducir el paso
+                tilt_step /= 2.0
+                azimuth_step /= 2.0
+
+        optimum = {"tilt": float(best_tilt), "azimuth": float(best_azimuth % 360.0), "annual_generation_kwh": float(best_yield)}
+        grid = {"tilts": tilt_axis.tolist(), "azimuths": np.mod(azimuth_axis, 360.0).tolist(), "annual_generation_kwh": surface.tolist()}
+        return optimum, grid
@@ -0,0 +1,30 @@
+import numpy as np
+
+# Proyección a la vida útil del proyecto con degradación anual geométrica:
+# el año i (0 = primer año) produce base * (1 - degradación)^i.
+# La proyección mensual es un producto exterior (años x meses); la horaria se genera
+# año a año sobre un único buffer para servirla en streaming con memoria constante.
+
+
+def degradation_factors(years, degradation_annual):
+    """Factor de producción de cada año de vida útil: (1 - d)^i, i = 0..years-1."""
+    return (1.0 - float(degradation_annual)) ** np.arange(int(years))
+
+
+def monthly_projection(base_monthly_profile, years, degradation_annual):
+    """Perfil mensual representativo (m,) -> proyección plana (years * m,) año tras año."""
+    base = np.asarray(base_monthly_profile, dtype=float)
+    return np.outer(degradation_factors(years, degradation_annual), base).ravel()
+
+
+def iter_hourly_projection(base_year_hourly, years, degradation_annual):
+    """
+    Genera (año, factor, serie horaria degradada del año) para cada año de vida útil.
+    La serie se escribe siempre sobre el mismo buffer: el consumidor debe usarla (codificarla)
+    antes de pedir el siguiente año. Memoria constante: un año de horas.
+    """
+    base = np.asarray(base_year_hourly, dtype=float)
+    buffer = np.empty_like(base)
+    for year, factor in enumerate(degradation_factors(years, degradation_annual)):
+        np.multiply(base, factor, out=buffer)
+        yield year, float(factor), buffer
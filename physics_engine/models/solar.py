@@ -17,6 +17,16 @@ class SolarModel:
         radiation_series: Serie de Irradiancia Global Inclinada (GTI) o aprox GHI en W/m2.
         temperature_series: Temperatura ambiente en C.
         capacity_kw: Capacidad instalada DC en kW.
+        Admite broadcasting: con parámetros del modelo y capacity_kw como arrays columna (k, 1) y
+        radiation_series (k, T) o (T,), evalúa k configuraciones a la vez y retorna (k, T).
+        """
+        unit_dc = self.unit_dc_profile(radiation_series, temperature_series, albedo)
+        return self.ac_from_unit_dc(unit_dc, capacity_kw)
+
+    def unit_dc_profile(self, radiation_series, temperature_series, albedo=0.2):
+        """
+        Potencia DC por kW instalado (kW/kWp), antes del cut-in y de las pérdidas.
+        No depende de la capacidad: se puede cachear y reescalar con ac_from_unit_dc.
         """
         # Aproximación NOCT (Temperatura Nominal de Operación de la Célula)
         # Estándar: NOCT = 45 C usualmente. Modificado a 43 C para paneles modernos.
@@ -32,21 +42,24 @@ class SolarModel:
         
         temp_factor = (1 + self.temp_coef * (t_cell - self.temp_stc))
         
-        # Limitar la generación a valores positivos
         # Chequeo para Bifacialidad
-        bifacial_gain = 0.0
-        if self.bifaciality > 0:
-             rear_fraction = 0.1 
-             bifacial_gain = self.bifaciality * albedo * rear_fraction
+        bifaciality = np.asarray(self.bifaciality, dtype=float)
+        rear_fraction = 0.1 
+        bifacial_gain = np.where(bifaciality > 0, bifaciality * albedo * rear_fraction, 0.0)
              
-        p_dc_kw = capacity_kw * (radiation_series / self.g_stc) * temp_factor * (1 + bifacial_gain)
+        return (radiation_series / self.g_stc) * temp_factor * (1 + bifacial_gain)
+
+    def ac_from_unit_dc(self, unit_dc, capacity_kw):
+        """Escala el perfil unitario DC a capacity_kw y aplica el cut-in del inversor y las pérdidas (kW AC)."""
+        p_dc_kw = capacity_kw * unit_dc
         
-        # Potencia de corte del inversor (Cut-in)
+        # Potencia de corte del inversor (Cut-in): umbral sobre la potencia ya escalada
         cut_in_power = 0.01 * capacity_kw
         p_ac_kw = np.where(p_dc_kw > cut_in_power, 
                            p_dc_kw * (1 - self.system_loss) * self.inverter_eff, 
                            0.0)
         
+        # Limitar la generación a valores positivos
         p_ac_kw = np.clip(p_ac_kw, 0, None)
         
         return p_ac_kw
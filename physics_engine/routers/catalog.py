@@ -1,6 +1,7 @@
 from fastapi import APIRouter
 import json
 import os
+from models.wind import compile_turbine_catalog
 
 router = APIRouter()
 
@@ -15,6 +16,9 @@ def load_json(name):
     except FileNotFoundError:
         return []
 
+# Curvas de potencia de turbinas precompiladas a NumPy al arrancar (ranking de catálogo)
+TURBINE_CATALOG = compile_turbine_catalog(load_json("turbines.json"))
+
 @router.get("/{technology}")
 def get_catalog(technology: str):
     """
@@ -1,9 +1,13 @@
 from fastapi import APIRouter, HTTPException
+from routers.negotiation import NegotiatedRoute
 from pydantic import BaseModel, Field
 from typing import Optional
-from models.market import MarketModel
+from models.market import MarketModel, random_seed
+from config.settings import settings
+from config.database import async_db
 
-router = APIRouter()
+# JSON por defecto; Arrow IPC o float32 según la cabecera Accept (routers/negotiation.py)
+router = APIRouter(route_class=NegotiatedRoute)
 
 class MarketPriceRequest(BaseModel):
     """Solicitud para generar precios de mercado eléctrico"""
@@ -12,14 +16,25 @@ class MarketPriceRequest(BaseModel):
     capacity_kw: float = Field(..., description="Capacidad del proyecto en kW")
     project_type: str = Field(..., description="Tipo de proyecto (solar, wind, hydro, biomass)")
     initial_price: Optional[float] = Field(50.0, description="Precio base inicial en €/MWh")
+    year: Optional[int] = Field(None, description="Año de la curva (por defecto BASE_YEAR)")
+    seed: Optional[int] = Field(None, ge=0, description="Semilla del ruido; sin semilla se elige una y se devuelve")
+    source: Optional[str] = Field(None, description="Fuente en prices_hourly ('OMIE', 'PREDICTION'...); sin datos se usa la curva sintética")
+    save_as: Optional[str] = Field(None, description="Guarda la curva sintética generada en prices_hourly con esta fuente")
 
 class MarketPriceResponse(BaseModel):
     """Respuesta con precios de mercado generados"""
     prices_eur_mwh: list[float]
     base_price: float
     volatility: float
+    year: Optional[int] = None
+    seed: Optional[int] = None # Semilla de la curva sintética (None si viene de BD)
+    source: str = "synthetic"
 
-@router.post("/prices", response_model=MarketPriceResponse)
+# Sin caché de resultados: con `source` la curva se lee de prices_hourly en cada petición,
+# de modo que los precios recién ingestados se sirven inmediatamente.
+# Sin response_model (como en /predict/*): el esquema solo se documenta y el dict con el array NumPy
+# lo codifica la negociación de contenido, sin validar ni re-serializar las 8760 horas.
+@router.post("/prices", responses={200: {"model": MarketPriceResponse}})
 async def get_market_prices(request: MarketPriceRequest):
     """
     Genera curva de precios de mercado eléctrico horaria para un año completo (8760 horas).
@@ -30,6 +45,8 @@ async def get_market_prices(request: MarketPriceRequest):
     - Volatilidad realista del mercado
     
     Esto proporciona estimaciones de ingresos más precisas que un precio fijo.
+    Con la misma semilla (y año) la curva es idéntica; con `source` se lee una curva real o
+    guardada previamente de prices_hourly.
     """
     try:
         # Configuramos el modelo con el precio base especificado
@@ -38,20 +55,44 @@ async def get_market_prices(request: MarketPriceRequest):
         # Volatilidad estándar del mercado eléctrico español (~20%)
         volatility = 0.2
         
-        # Generamos la curva de precios anual
+        year = request.year if request.year is not None else settings.BASE_YEAR
+
+        # Curva persistida (real o generada antes) si se pide y está completa en BD
+        if request.source:
+            stored = await async_db.load_price_curve(year, request.source)
+            if stored is not None:
+                return {
+                    "prices_eur_mwh": stored,
+                    "base_price": base_price,
+                    "volatility": volatility,
+                    "year": year,
+                    "seed": None,
+                    "source": request.source
+                }
+
+        # Generamos la curva de precios anual (semilla explícita para que sea reproducible)
+        seed = request.seed if request.seed is not None else random_seed()
         market_model = MarketModel(
             base_price=base_price,
             volatility=volatility,
-            trend=0.0  # Sin tendencia por defecto
+            trend=0.0,  # Sin tendencia por defecto
+            seed=seed
         )
         
-        prices = market_model.generate_annual_price_curve()
+        prices = market_model.generate_annual_price_curve(year)
+
+        if request.save_as:
+            await async_db.save_price_curve(prices, year, request.save_as)
         
-        return MarketPriceResponse(
-            prices_eur_mwh=prices,
-            base_price=base_price,
-            volatility=volatility
-        )
+        # Dict con el array NumPy: la codificación (JSON/Arrow/float32) la decide la negociación de contenido
+        return {
+            "prices_eur_mwh": prices,
+            "base_price": base_price,
+            "volatility": volatility,
+            "year": year,
+            "seed": seed,
+            "source": "synthetic"
+        }
         
     except Exception as e:
         raise HTTPException(
@@ -0,0 +1,50 @@
+from fastapi import APIRouter
+from etl.weather_cache import weather_cache
+from etl.columnar_store import columnar_store
+from etl.single_flight import weather_flight
+from routers.result_cache import result_cache
+from routers.unit_profiles import unit_profile_cache, unit_profile_flight
+from config.database import db, async_db
+from config.instrumentation import db_metrics, async_db_metrics
+
+router = APIRouter()
+
+@router.get("/weather-cache")
+def get_weather_cache_stats():
+    """
+    Estado de la caché de clima en memoria: entradas, bytes usados,
+    aciertos (frescos y obsoletos), fallos, desalojos y refrescos en segundo plano.
+    """
+    return weather_cache.stats()
+
+@router.get("/weather-store")
+def get_weather_store_stats():
+    """Aciertos, fallos y desalojos del almacén columnar de clima en disco."""
+    return columnar_store.stats()
+
+@router.get("/db-pool")
+def get_db_pool_stats():
+    """
+    Estado de los pools de conexiones y sus histogramas:
+    - pool_wait alto con consultas rápidas -> inanición del pool (ampliar DB_POOL_SIZE/DB_MAX_OVERFLOW).
+    - consultas lentas con pool_wait bajo -> el coste está en la propia base de datos.
+    """
+    return {
+        "sync": {"pool": db.pool_stats(), **db_metrics.snapshot()},
+        "async": {"pool": async_db.pool_stats(), **async_db_metrics.snapshot()}
+    }
+
+@router.get("/weather-inflight")
+def get_weather_inflight_stats():
+    """Cargas de clima en curso y peticiones concurrentes coalescidas sobre ellas (single-flight)."""
+    return weather_flight.stats()
+
+@router.get("/result-cache")
+def get_result_cache_stats():
+    """Caché de resultados de /predict/*: entradas, bytes, aciertos (memoria/disco), fallos y desalojos."""
+    return result_cache.stats()
+
+@router.get("/unit-profiles")
+def get_unit_profile_stats():
+    """Caché de perfiles por kW instalado: entradas, bytes, aciertos, fallos, desalojos y cálculos coalescidos."""
+    return {**unit_profile_cache.stats(), "flight": unit_profile_flight.stats()}
@@ -0,0 +1,281 @@
+import functools
+import inspect
+import json
+import struct
+from contextvars import ContextVar
+import numpy as np
+from fastapi import Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.routing import APIRoute
+from pydantic import BaseModel
+from pydantic_core import to_json
+from routers.result_cache import CachedResult
+
+try:
+    import pyarrow as pa
+except ImportError: # En requirements.txt; sin pyarrow solo se ofrecen JSON y float32 (Arrow -> 406)
+    pa = None
+
+# Negociación de contenido para los resultados con series horarias (/predict/*, /market/*).
+# Los endpoints devuelven dicts con arrays NumPy; según la cabecera Accept se codifican como:
+# - application/json (por defecto): mismos campos que siempre, arrays -> listas.
+# - application/vnd.apache.arrow.stream: Arrow IPC, una fila con una columna por campo
+#   (arrays -> list<float32>, dicts -> struct). Requiere pyarrow.
+# - application/x-float32-columns: formato binario propio, sin dependencias (ver encode_float32).
+JSON_MEDIA_TYPE = "application/json"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+FLOAT32_MEDIA_TYPE = "application/x-float32-columns"
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+_accept = ContextVar("accept", default="")
+
+
+def preferred_format(accept):
+    """
+    Formato elegido ("json", "arrow" o "float32") según la cabecera Accept (con valores q).
+    None si solo se acepta Arrow y pyarrow no está instalado (la ruta responde 406).
+    """
+    ranked = []
+    for position, part in enumerate(accept.split(",")):
+        media_type, _, params = part.partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            ranked.append((-quality, position, media_type.strip().lower()))
+
+    arrow_requested = False
+    for _, _, media_type in sorted(ranked):
+        if media_type == ARROW_MEDIA_TYPE:
+            if pa is not None:
+                return "arrow"
+            arrow_requested = True # Sin pyarrow: se prueba el siguiente tipo aceptado
+            continue
+        if media_type == FLOAT32_MEDIA_TYPE:
+            return "float32"
+        if media_type in (JSON_MEDIA_TYPE, "application/*", "*/*"):
+            return "json"
+    return None if arrow_requested else "json"
+
+
+def to_jsonable(value):
+    """Arrays y escalares NumPy -> tipos Python (tolist es mucho más rápido que float(x) por elemento)."""
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, dict):
+        return {k: to_jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_jsonable(v) for v in value]
+    return value
+
+
+def encode_float32(payload):
+    """
+    Formato binario compacto:
+        [uint32 LE: longitud N de la cabecera][N bytes: cabecera JSON UTF-8][relleno a 4 bytes][datos float32 LE]
+    La cabecera es la respuesta con cada array NumPy sustituido por {"__array__": {"offset": o, "shape": [...]}},
+    donde offset cuenta elementos float32 desde el inicio de los datos. En JS:
+        new Float32Array(buffer, dataStart + offset * 4, length)
+    """
+    buffers = []
+    offset = 0
+
+    def extract(value):
+        nonlocal offset
+        if isinstance(value, np.ndarray):
+            data = np.ascontiguousarray(value, dtype="<f4")
+            buffers.append(data.tobytes())
+            placeholder = {"__array__": {"offset": offset, "shape": list(data.shape)}}
+            offset += data.size
+            return placeholder
+        if isinstance(value, np.generic):
+            return value.item()
+        if isinstance(value, dict):
+            return {k: extract(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [extract(v) for v in value]
+        return value
+
+    return b"".join([_float32_header(extract(payload)), *buffers])
+
+
+def _float32_header(header):
+    # [uint32 LE: longitud][cabecera JSON][relleno a 4 bytes]
+    header = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    padding = b" " * (-(4 + len(header)) % 4) # espacios: la cabecera sigue siendo JSON válido
+    return struct.pack("<I", len(header) + len(padding)) + header + padding
+
+
+def _arrow_value(value):
+    # Arrays -> float32 (2-D o más: listas anidadas); el resto lo infiere pyarrow
+    if isinstance(value, np.ndarray):
+        data = value.astype(np.float32, copy=False)
+        return data if data.ndim == 1 else [_arrow_value(row) for row in data]
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, dict):
+        return {k: _arrow_value(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_arrow_value(v) for v in value]
+    return value
+
+
+def encode_arrow(payload):
+    """Arrow IPC (stream): una fila, una columna por campo de la respuesta."""
+    columns = {}
+    for name, value in payload.items():
+        value = _arrow_value(value)
+        if isinstance(value, np.ndarray):
+            # Campo array de primer nivel: lista de una fila sobre el buffer float32, sin inferencia elemento a elemento
+            columns[name] = pa.ListArray.from_arrays(pa.array([0, len(value)], pa.int32()), pa.array(value))
+            continue
+        try:
+            columns[name] = pa.array([value])
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            # Estructuras que pyarrow no puede tipar (p.ej. dicts vacíos o heterogéneos): JSON en texto
+            columns[name] = pa.array([json.dumps(to_jsonable(value))])
+    batch = pa.RecordBatch.from_pydict(columns)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+
+def _render_json(payload):
+    data = to_jsonable(payload)
+    try:
+        # pydantic_core serializa los floats en Rust (~10x más rápido que json.dumps con 8760 horas);
+        # NaN/inf -> null, como la serialización de response_model
+        return to_json(data, inf_nan_mode="null")
+    except TypeError: # pydantic-core sin inf_nan_mode: serialización JSON por defecto de FastAPI
+        return JSONResponse(content=data).body
+
+
+ENCODERS = {
+    "json": (_render_json, JSON_MEDIA_TYPE),
+    "arrow": (encode_arrow, ARROW_MEDIA_TYPE),
+    "float32": (encode_float32, FLOAT32_MEDIA_TYPE)
+}
+
+
+def negotiate(result):
+    """Codifica el resultado de un endpoint según el Accept de la petición en curso."""
+    if isinstance(result, Response):
+        return result
+    fmt = preferred_format(_accept.get())
+    if isinstance(result, CachedResult):
+        # Resultado cacheado: el cuerpo de cada formato se codifica una vez y se reutiliza
+        encode, media_type = ENCODERS[fmt]
+        return Response(content=result.encoding(fmt, encode), media_type=media_type)
+    if fmt == "json":
+        # Cuerpo renderizado aquí: FastAPI no vuelve a recorrer las series con jsonable_encoder
+        # (tipos que no se saben serializar siguen la ruta por defecto de FastAPI)
+        try:
+            return Response(content=_render_json(result), media_type=JSON_MEDIA_TYPE)
+        except ValueError:
+            return to_jsonable(result)
+    payload = result.model_dump() if isinstance(result, BaseModel) else result
+    if fmt == "arrow":
+        return Response(content=encode_arrow(payload), media_type=ARROW_MEDIA_TYPE)
+    return Response(content=encode_float32(payload), media_type=FLOAT32_MEDIA_TYPE)
+
+
+def stream_rows(header, field, rows, shape):
+    """
+    Respuesta en streaming de una serie 2-D (filas x columnas) producida fila a fila, sin materializarla.
+    rows: iterable de (metadatos de la fila: dict, array 1-D de shape[1] valores); cada fila se codifica
+    y se envía antes de pedir la siguiente, así que el array puede reutilizarse entre filas.
+    Formato según el Accept de la petición en curso:
+    - float32: mismo formato que encode_float32; field es {"__array__": {"offset": 0, "shape": shape}}
+      en la cabecera y los datos llegan fila a fila.
+    - arrow: Arrow IPC stream, un lote por fila (metadatos + field como list<float32>),
+      header como JSON en los metadatos del esquema.
+    - json (por defecto): NDJSON, una primera línea con header y una línea por fila {**metadatos, field: [...]}.
+    """
+    fmt = preferred_format(_accept.get())
+    if fmt == "float32":
+        return StreamingResponse(_float32_stream(header, field, rows, shape), media_type=FLOAT32_MEDIA_TYPE)
+    if fmt == "arrow":
+        return StreamingResponse(_arrow_stream(header, field, rows), media_type=ARROW_MEDIA_TYPE)
+    return StreamingResponse(_ndjson_stream(header, field, rows), media_type=NDJSON_MEDIA_TYPE)
+
+
+def _float32_stream(header, field, rows, shape):
+    yield _float32_header({**to_jsonable(header), field: {"__array__": {"offset": 0, "shape": list(shape)}}})
+    for _, values in rows:
+        yield np.ascontiguousarray(values, dtype="<f4").tobytes()
+
+
+def _ndjson_stream(header, field, rows):
+    yield json.dumps(to_jsonable(header), separators=(",", ":")).encode("utf-8") + b"\n"
+    for meta, values in rows:
+        yield json.dumps({**to_jsonable(meta), field: values.tolist()}, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+def _arrow_stream(header, field, rows):
+    schema = None
+    for meta, values in rows:
+        data = np.asarray(values, dtype=np.float32)
+        columns = [pa.array([value]) for value in to_jsonable(meta).values()]
+        columns.append(pa.ListArray.from_arrays(pa.array([0, len(data)], pa.int32()), pa.array(data)))
+        if schema is None:
+            # Esquema del primer lote (los metadatos de fila son siempre los mismos campos)
+            names = [*meta, field]
+            schema = pa.schema([pa.field(name, column.type) for name, column in zip(names, columns)],
+                               metadata={"header": json.dumps(to_jsonable(header))})
+            yield schema.serialize().to_pybytes()
+        yield pa.RecordBatch.from_arrays(columns, schema=schema).serialize().to_pybytes()
+    if schema is None:
+        schema = pa.schema([], metadata={"header": json.dumps(to_jsonable(header))})
+        yield schema.serialize().to_pybytes()
+    yield b"\xff\xff\xff\xff\x00\x00\x00\x00" # fin de stream IPC
+
+
+def _negotiated(endpoint):
+    # Mantiene la firma (inspect sigue __wrapped__) y el carácter síncrono/async del endpoint
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            return negotiate(await endpoint(*args, **kwargs))
+    else:
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            return negotiate(endpoint(*args, **kwargs))
+    return wrapper
+
+
+class NegotiatedRoute(APIRoute):
+    """
+    Ruta con negociación de contenido: APIRouter(route_class=NegotiatedRoute).
+    La cabecera Accept se publica en un ContextVar (que se propaga al threadpool de los endpoints
+    síncronos) y el resultado se codifica antes de la serialización JSON de FastAPI.
+    """
+    def __init__(self, path, endpoint, **kwargs):
+        super().__init__(path, _negotiated(endpoint), **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def route_handler(request):
+            accept = request.headers.get("accept", "")
+            if preferred_format(accept) is None:
+                # Se pidió Arrow sin alternativa aceptable y el servidor no tiene pyarrow
+                return JSONResponse(status_code=406, headers={"Vary": "Accept"}, content={
+                    "detail": f"{ARROW_MEDIA_TYPE} no disponible en este servidor; acepte {JSON_MEDIA_TYPE} o {FLOAT32_MEDIA_TYPE}"
+                })
+            token = _accept.set(accept)
+            try:
+                response = await handler(request)
+            finally:
+                _accept.reset(token)
+            response.headers["Vary"] = "Accept"
+            return response
+
+        return route_handler
@@ -0,0 +1,409 @@
+import functools
+import hashlib
+import inspect
+import json
+import os
+import threading
+import time
+import uuid
+import zipfile
+from collections import OrderedDict
+from contextvars import ContextVar
+import numpy as np
+from fastapi import Response
+from pydantic import BaseModel
+from config.settings import settings
+from etl.single_flight import SingleFlight
+
+# Código y datos de los que depende un resultado de /predict/*: si cambian, cambia la huella y
+# las entradas anteriores (también las de disco) dejan de ser alcanzables.
+_PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FINGERPRINT_SOURCES = (
+    ("models", ".py"), ("etl", ".py"), ("routers/simulation.py", ".py"), ("routers/unit_profiles.py", ".py"),
+    ("data/catalogs", ".json")
+)
+
+# Marca de la petición en curso: un cálculo con datos degradados (p.ej. clima de respaldo de un
+# solo año) la activa y el resultado se sirve sin guardarse. Es una lista compartida por copia de
+# contexto, así que también la ven el threadpool y las tareas lanzadas desde el endpoint.
+_skip_store = ContextVar("result_cache_skip_store", default=None)
+
+
+def skip_result_cache():
+    """El resultado de la petición en curso no debe cachearse (ni en memoria ni en disco)."""
+    marker = _skip_store.get()
+    if marker is not None:
+        marker.append(True)
+
+
+def model_fingerprint():
+    """Huella (sha256 abreviado) del código de los modelos, catálogos y ajustes que afectan a los resultados."""
+    digest = hashlib.sha256()
+    for source, extension in FINGERPRINT_SOURCES:
+        path = os.path.join(_PACKAGE_DIR, source)
+        if os.path.isdir(path):
+            files = sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith(extension))
+        else:
+            files = [path] if os.path.isfile(path) else []
+        for file_path in files:
+            digest.update(os.path.relpath(file_path, _PACKAGE_DIR).encode("utf-8"))
+            with open(file_path, "rb") as f:
+                digest.update(f.read())
+    digest.update(json.dumps({
+        "base_year": settings.BASE_YEAR,
+        "grid_resolution": settings.WEATHER_GRID_RESOLUTION,
+        "price_seed": settings.DEFAULT_PRICE_SEED
+    }, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def _canonical(value):
+    # Forma canónica para el hash: claves ordenadas (en json.dumps); los enteros se conservan exactos
+    # (semillas > 2^53) y los float enteros pasan a int para que 30 y 30.0 den la misma clave
+    if isinstance(value, BaseModel):
+        return _canonical(value.model_dump())
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if isinstance(value, bool) or value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        value = float(value)
+        return int(value) if value.is_integer() else value
+    return str(value)
+
+
+def _detach(value):
+    """Copia independiente y de solo lectura del resultado (las vistas no retienen el array completo)."""
+    if isinstance(value, np.ndarray):
+        array = value.copy() if value.base is not None or value.flags.writeable else value
+        array.flags.writeable = False
+        return array
+    if isinstance(value, dict):
+        return {k: _detach(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_detach(v) for v in value]
+    return value
+
+
+def _nbytes(value):
+    # Tamaño aproximado en memoria: arrays exactos, el resto estimado
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sum(_nbytes(k) + _nbytes(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(_nbytes(v) for v in value) + 8 * len(value)
+    if isinstance(value, str):
+        return len(value)
+    return 16
+
+
+def _to_disk(value, arrays):
+    # Estructura JSON del resultado con cada array sustituido por {"__array__": nombre en el .npz}
+    if isinstance(value, np.ndarray):
+        if value.dtype.hasobject:
+            raise TypeError("Arrays de objetos no se guardan en disco")
+        name = f"a{len(arrays)}"
+        arrays[name] = value
+        return {"__array__": name}
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, dict):
+        if not all(isinstance(k, str) for k in value):
+            raise TypeError("Solo se guardan en disco dicts con claves str")
+        return {k: _to_disk(v, arrays) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_disk(v, arrays) for v in value]
+    return value
+
+
+def _from_disk(value, arrays):
+    if isinstance(value, dict):
+        if set(value) == {"__array__"}:
+            array = arrays[value["__array__"]]
+            array.flags.writeable = False
+            return array
+        return {k: _from_disk(v, arrays) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_from_disk(v, arrays) for v in value]
+    return value
+
+
+class CachedResult:
+    """Resultado cacheado de un endpoint y sus codificaciones ya renderizadas (json/arrow/float32)."""
+    __slots__ = ("key", "result", "encodings", "nbytes", "_cache")
+
+    def __init__(self, key, result, cache):
+        self.key = key
+        self.result = result
+        self.encodings = {}
+        self.nbytes = _nbytes(result)
+        self._cache = cache
+
+    def encoding(self, fmt, encode):
+        """Cuerpo de la respuesta en el formato fmt; se codifica una sola vez por entrada."""
+        body = self.encodings.get(fmt)
+        if body is None:
+            body = encode(self.result)
+            self.encodings[fmt] = body
+            self._cache._grow(self, len(body))
+        return body
+
+
+class ResultCache:
+    """
+    Caché direccionada por contenido de los resultados de /predict/*.
+    - Clave: sha256 de (endpoint, petición canónica, huella de modelos/versión).
+    - Nivel en memoria: LRU limitado por bytes (resultado + cuerpos ya codificados) con TTL.
+    - Nivel en disco opcional (RESULT_CACHE_DIR): un .npz por clave (arrays + estructura en JSON, sin pickle), escritura atómica y desalojo LRU por mtime.
+    - Peticiones idénticas concurrentes se coalescen (single-flight): solo una ejecuta la simulación.
+    """
+    def __init__(self, max_bytes, ttl_seconds, disk_dir=None, disk_max_bytes=0):
+        self.max_bytes = int(max_bytes)
+        self.ttl_seconds = float(ttl_seconds)
+        self.disk_dir = disk_dir or None
+        self.disk_max_bytes = int(disk_max_bytes)
+        self.fingerprint = model_fingerprint()
+
+        self._entries = OrderedDict() # key -> (CachedResult, stored_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._flight = SingleFlight()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+
+    def make_key(self, name, requests):
+        canonical = json.dumps({
+            "endpoint": name,
+            "requests": [_canonical(r) for r in requests],
+            "fingerprint": self.fingerprint
+        }, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """CachedResult o None (memoria y, si está activo, disco)."""
+        now = time.monotonic()
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None:
+                entry, stored_at = item
+                if now - stored_at <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry
+                self._remove(key)
+
+        result = self._read_disk(key)
+        if result is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.disk_hits += 1
+        return self._store(key, result)
+
+    def put(self, key, result):
+        """Guarda el resultado (dict con arrays NumPy) en memoria y disco. Retorna el CachedResult."""
+        entry = self._store(key, _detach(result))
+        self._write_disk(key, entry.result)
+        return entry
+
+    def cached(self, name, when=None):
+        """
+        Decorador de endpoint: busca en caché por las peticiones (BaseModel) recibidas antes de simular.
+        when(*peticiones) -> bool permite excluir peticiones no deterministas (p.ej. sin semilla).
+        """
+        def decorator(endpoint):
+            def lookup_key(args, kwargs):
+                requests = [v for v in (*args, *kwargs.values()) if isinstance(v, BaseModel)]
+                if when is not None and not when(*requests):
+                    return None
+                return self.make_key(name, requests)
+
+            def remember(key, result, marker):
+                # Respuestas ya construidas (p.ej. errores devueltos como Response) y resultados
+                # marcados con skip_result_cache() no se cachean
+                if isinstance(result, Response) or marker:
+                    return result
+                return self.put(key, result)
+
+            if inspect.iscoroutinefunction(endpoint):
+                @functools.wraps(endpoint)
+                async def wrapper(*args, **kwargs):
+                    key = lookup_key(args, kwargs)
+                    if key is None:
+                        return await endpoint(*args, **kwargs)
+                    entry = self.get(key)
+                    if entry is not None:
+                        return entry
+
+                    async def compute():
+                        marker = []
+                        token = _skip_store.set(marker)
+                        try:
+                            result = await endpoint(*args, **kwargs)
+                        finally:
+                            _skip_store.reset(token)
+                        return remember(key, result, marker)
+                    return await self._flight.do_async(key, compute)
+            else:
+                @functools.wraps(endpoint)
+                def wrapper(*args, **kwargs):
+                    key = lookup_key(args, kwargs)
+                    if key is None:
+                        return endpoint(*args, **kwargs)
+                    entry = self.get(key)
+                    if entry is not None:
+                        return entry
+
+                    def compute():
+                        marker = []
+                        token = _skip_store.set(marker)
+                        try:
+                            result = endpoint(*args, **kwargs)
+                        finally:
+                            _skip_store.reset(token)
+                        return remember(key, result, marker)
+                    return self._flight.do(key, compute)
+            return wrapper
+        return decorator
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "fingerprint": self.fingerprint,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "disk_enabled": self.disk_dir is not None,
+                "disk_evictions": self.disk_evictions,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "in_flight": self._flight.stats()["in_flight"]
+            }
+
+    def _store(self, key, result):
+        entry = CachedResult(key, result, self)
+        if entry.nbytes > self.max_bytes:
+            return entry # Demasiado grande para la memoria: se sirve sin guardarse
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (entry, time.monotonic())
+            self._bytes += entry.nbytes
+            self._evict()
+        return entry
+
+    def _grow(self, entry, nbytes):
+        # Un cuerpo codificado nuevo cuenta para el presupuesto de la entrada
+        with self._lock:
+            entry.nbytes += nbytes
+            item = self._entries.get(entry.key)
+            if item is not None and item[0] is entry:
+                self._bytes += nbytes
+                self._evict()
+
+    def _evict(self):
+        # Desalojar las entradas menos usadas hasta respetar el presupuesto (con el lock tomado)
+        while self._bytes > self.max_bytes and self._entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key):
+        entry, _ = self._entries.pop(key)
+        self._bytes -= entry.nbytes
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], f"{key}.npz")
+
+    def _read_disk(self, key):
+        if self.disk_dir is None:
+            return None
+        path = self._disk_path(key)
+        try:
+            # allow_pickle=False: un fichero manipulado en RESULT_CACHE_DIR no puede ejecutar código
+            with np.load(path, allow_pickle=False) as data:
+                meta = json.loads(str(data["__meta__"]))
+                expired = time.time() - meta["stored_at"] > self.ttl_seconds
+                arrays = {} if expired else {name: data[name] for name in data.files if name != "__meta__"}
+            if expired:
+                os.remove(path)
+                return None
+            result = _from_disk(meta["result"], arrays)
+            # Marcar como usado recientemente para el desalojo LRU
+            os.utime(path)
+            return result
+        except (FileNotFoundError, EOFError, ValueError, KeyError, TypeError, OSError, zipfile.BadZipFile):
+            return None
+
+    def _write_disk(self, key, result):
+        if self.disk_dir is None:
+            return
+        path = self._disk_path(key)
+        tmp_path = f"{path}.tmp-{uuid.uuid4().hex}"
+        try:
+            arrays = {}
+            meta = json.dumps({"stored_at": time.time(), "result": _to_disk(result, arrays)})
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                np.savez(f, __meta__=np.array(meta), **arrays)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            # TypeError/ValueError: resultado no representable sin pickle (se sirve solo desde memoria)
+            print(f"Error escribiendo caché de resultados en disco ({key}): {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self._enforce_disk_cap()
+
+    def _enforce_disk_cap(self):
+        with self._disk_lock:
+            entries = []
+            total = 0
+            for shard in os.scandir(self.disk_dir):
+                if not shard.is_dir():
+                    continue
+                for item in os.scandir(shard.path):
+                    if item.is_file() and item.name.endswith(".npz"):
+                        stat = item.stat()
+                        entries.append((stat.st_mtime, stat.st_size, item.path))
+                        total += stat.st_size
+
+            # Desalojar los resultados menos usados recientemente hasta respetar el límite
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.disk_max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                self.disk_evictions += 1
+
+
+result_cache = ResultCache(
+    max_bytes=settings.RESULT_CACHE_MAX_BYTES,
+    ttl_seconds=settings.RESULT_CACHE_TTL_SECONDS,
+    disk_dir=settings.RESULT_CACHE_DIR,
+    disk_max_bytes=settings.RESULT_CACHE_DISK_MAX_BYTES
+)
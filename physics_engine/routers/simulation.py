@@ -1,16 +1,32 @@
 from fastapi import APIRouter, HTTPException
+from routers.negotiation import NegotiatedRoute, stream_rows
+from routers.result_cache import result_cache, skip_result_cache
+from routers.unit_profiles import load_unit_profile
+import asyncio
+from functools import partial
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
+from typing import Dict, List, Optional
 import pandas as pd
 import numpy as np
 from models.solar import SolarModel
 from models.wind import WindModel
-from models.hydro import HydroModel
+from models.hydro import HydroModel, hydro_power_kw, hydro_flow_profile, hydro_power_from_flow, seasonal_flow_noise
 from models.biomass import BiomassOptimizer
-from models.market import MarketModel
-from etl.weather_connector import WeatherConnector
+from models.market import MarketModel, random_seed
+from etl.weather_connector import WeatherConnector, WEATHER_FALLBACK_ATTR
+from etl.async_weather_connector import AsyncWeatherConnector
+from etl.grid_index import grid_index
+from models.irradiance import IrradianceFrame
+from models.aggregation import HourlyCalendar, hourly_calendar, model_year_calendar, month_end_labels
+from models.projection import monthly_projection, iter_hourly_projection
+from models.orientation import OrientationOptimizer
 from config.settings import settings
+from config.database import async_db, resource_summary_from_frame
+from routers.catalog import TURBINE_CATALOG
 
-router = APIRouter()
+# Resultados en JSON (por defecto), Arrow IPC o float32 según la cabecera Accept (routers/negotiation.py)
+router = APIRouter(route_class=NegotiatedRoute)
 
 class SimulationRequest(BaseModel):
     project_type: str
@@ -20,375 +36,946 @@ class SimulationRequest(BaseModel):
     parameters: dict = {}
     financial_params: dict = {} # Permite pasar estructuras de deuda para solicitudes genéricas, aunque usualmente se procesan en Node
 
+class SolarScenario(BaseModel):
+    name: Optional[str] = None
+    capacity_kw: Optional[float] = None # Por defecto, la capacidad de la petición
+    parameters: dict = {} # Sobrescribe los parámetros base (panel_type, tilt, azimuth, system_loss...)
+
+class SolarBatchRequest(BaseModel):
+    latitude: float
+    longitude: float
+    capacity_kw: float
+    parameters: dict = {} # Parámetros base comunes a todos los escenarios
+    scenarios: List[SolarScenario]
+    include_hourly: bool = False
+
+class TurbineRankingRequest(BaseModel):
+    latitude: float
+    longitude: float
+    turbine_ids: Optional[List[str]] = None # Subconjunto del catálogo; por defecto todas
+    capacity_kw: Optional[float] = None # Capacidad del parque; por defecto una unidad (rated_power_kw)
+    hub_height: Optional[float] = None # Fuerza una altura común; por defecto la de cada turbina
+    roughness: float = 0.03
+    rank_by: str = "capacity_factor" # "capacity_factor" o "aep"
+
+class HydroSweepRequest(BaseModel):
+    latitude: float
+    longitude: float
+    parameters: dict = {} # Configuración base (mismos parámetros que /predict/hydro)
+    axes: Dict[str, List[float]] # 1 o 2 parámetros barridos -> valores, p.ej. penstock_diameter x flow_rate_design
+    auto_resize_penstock: bool = False # True reproduce el redimensionado automático de /predict/hydro
+
+class BiomassMonteCarloRequest(BaseModel):
+    capacity_kw: float
+    parameters: dict = {} # Mismos parámetros que /predict/biomass (efficiency, fuel_cost, pci, max_fuel_ton...)
+    financial_params: dict = {} # initial_electricity_price como precio base
+    num_paths: int = 1000
+    seed: Optional[int] = None # Entero >= 0; sin semilla se elige una y se devuelve para poder reproducir el resultado
+    price_volatility: float = 0.2
+    price_autocorrelation: float = 0.9 # AR(1) horario del ruido de precios
+
+class OrientationRequest(BaseModel):
+    latitude: float
+    longitude: float
+    capacity_kw: float = 1.0
+    parameters: dict = {} # Parámetros del panel (panel_type, system_loss, inverter_eff...)
+    fixed_tilt: Optional[float] = None
+    fixed_azimuth: Optional[float] = None # p.ej. cubiertas: solo se optimiza la inclinación
+    tilt_min: float = 0.0
+    tilt_max: float = 90.0
+    azimuth_min: Optional[float] = None # Sin rango: círculo completo; min > max cruza el Norte (p.ej. 300 -> 60)
+    azimuth_max: Optional[float] = None
+    coarse_tilt_step: float = 10.0
+    coarse_azimuth_step: float = 20.0
+    tolerance_deg: float = 0.5
+
+class PortfolioRequest(BaseModel):
+    projects: List[SimulationRequest] # Proyectos de cualquier tecnología (mismo formato que /predict/<tecnología>)
+    include_project_hourly: bool = False # Perfil horario de muestra de cada proyecto (el agregado se incluye siempre)
+
+async def get_resource_summary(lat, lon, year):
+    """
+    Resumen anual del recurso de la celda de (lat, lon): una fila del agregado continuo weather_annual.
+    Si la celda/año aún no está en BD (o incompleto), se obtiene la serie horaria (que la ingesta y
+    deja el agregado al día para la siguiente consulta) y se resume en memoria.
+    """
+    cell_lat, cell_lon = await asyncio.to_thread(grid_index.snap, lat, lon)
+    summary = await async_db.load_resource_summary(cell_lat, cell_lon, year)
+    if summary is not None and summary["complete"]:
+        return summary
+
+    df = await AsyncWeatherConnector().fetch_weather_range(lat, lon, year, year)
+    if df.empty:
+        return None
+    return resource_summary_from_frame(df)
+
 @router.get("/solar-potential")
 async def get_solar_potential(lat: float, lon: float):
     try:
-        connector = WeatherConnector()
-        # Obtener 1 año representativo (BASE_YEAR)
-        year = settings.BASE_YEAR
-        df = connector.fetch_historical_weather(lat, lon, f"{year}-01-01", f"{year}-12-31")
+        # 1 año representativo (BASE_YEAR): suma anual de GHI (Wh/m2) / 1000 -> kWh/m2 (HSP - Horas Sol Pico)
+        summary = await get_resource_summary(lat, lon, settings.BASE_YEAR)
         
-        if df.empty:
+        if summary is None or summary["hours"] == 0:
             return {"peak_sun_hours": 1500.0} # Valor por defecto
-            
-        # Suma anual (W/m2) -> /1000 -> kWh/m2 (HSP - Horas Sol Pico)
-        # Nota: df usa resolución horaria
-        # Verificar nombre de columna (varía si se obtiene 'radiation_ghi' en vivo o 'radiation' en histórico antiguo)
-        col_name = 'radiation_ghi' if 'radiation_ghi' in df.columns else 'radiation'
-        
-        if col_name not in df.columns:
-            # Si no se encuentra columna de radiación
-            print(f"Advertencia: No se encontró columna de radiación. Columnas: {df.columns}")
-            return {"peak_sun_hours": 1500.0}
-
-        ghi_sum = df[col_name].sum() 
-        peak_hours = ghi_sum / 1000.0
         
-        return {"peak_sun_hours": round(peak_hours, 1)}
+        return {"peak_sun_hours": round(summary["peak_sun_hours"], 1)}
     except Exception as e:
         print(f"Error obteniendo potencial solar: {e}")
         return {"peak_sun_hours": 1500.0}
 
+@router.get("/wind-potential")
+async def get_wind_potential(lat: float, lon: float):
+    """Velocidad media anual del viento (10 m y 100 m) del año representativo, desde el mismo agregado."""
+    try:
+        summary = await get_resource_summary(lat, lon, settings.BASE_YEAR)
+        if summary is None or summary["wind_speed_100m_mean"] is None:
+            raise HTTPException(status_code=404, detail="Sin datos de viento para la ubicación")
+        
+        return {
+            "wind_speed_10m_mean": round(summary["wind_speed_10m_mean"], 2),
+            "wind_speed_100m_mean": round(summary["wind_speed_100m_mean"], 2)
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error obteniendo potencial eólico: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 def get_weather_data(lat, lon, tilt=None, azimuth=None):
     connector = WeatherConnector()
     # MEJORA DE ROBUSTEZ: "Conjunto de datos multianual"
     # En lugar de simular solo 1 año (que podría ser atípico), simulamos los últimos 3 años
     # y promediamos los resultados. Esto proporciona una proyección mucho más estable y realista.
+    # El rango completo se pide en una sola llamada (o en tramos paralelos si hay caché parcial).
+    start_year = settings.BASE_YEAR - 2 # ej. 2021..2023
+    end_year = settings.BASE_YEAR
     
-    years_to_simulate = [settings.BASE_YEAR - 2, settings.BASE_YEAR - 1, settings.BASE_YEAR] # ej. 2021, 2022, 2023
-    dfs = []
-    
-    for year in years_to_simulate:
-        start = f"{year}-01-01"
-        end = f"{year}-12-31"
-        try:
-            df_year = connector.fetch_historical_weather(lat, lon, start, end, tilt, azimuth)
-            if not df_year.empty:
-                dfs.append(df_year)
-        except Exception as e:
-            print(f"Advertencia: No se pudo obtener clima para {year}: {e}")
-            
-    if not dfs:
-        # Alternativa de año base único si el bucle falla completamente
-        return connector.fetch_historical_weather(lat, lon, f"{settings.BASE_YEAR}-01-01", f"{settings.BASE_YEAR}-12-31", tilt, azimuth)
+    try:
+        df = connector.fetch_weather_range(lat, lon, start_year, end_year, tilt, azimuth)
+        if not df.empty:
+            return df
+    except Exception as e:
+        print(f"Advertencia: No se pudo obtener clima para {start_year}-{end_year}: {e}")
         
-    # Concatenar todos los años en una serie temporal larga
-    return pd.concat(dfs, ignore_index=True)
+    # Ni el resultado de /predict/* (memoria y disco) ni el perfil unitario se guardan
+    skip_result_cache()
+    return _fallback_weather(connector, lat, lon, tilt, azimuth)
 
-def create_long_term_monthly_projection(base_monthly_profile: pd.Series, years: int = 20, degradation_annual: float = 0.005) -> list:
+def _fallback_weather(connector, lat, lon, tilt=None, azimuth=None):
+    """
+    Alternativa de año base único si el rango falla completamente.
+    Se marca como degradada para no cachear nada derivado de ella (routers/unit_profiles.py, result_cache.py)
+    """
+    df = connector.fetch_historical_weather(lat, lon, f"{settings.BASE_YEAR}-01-01", f"{settings.BASE_YEAR}-12-31", tilt, azimuth)
+    df = df.copy(deep=False)
+    df.attrs[WEATHER_FALLBACK_ATTR] = True
+    return df
+
+async def get_weather_data_async(lat, lon, tilt=None, azimuth=None):
+    """
+    Versión no bloqueante de get_weather_data para los endpoints async:
+    la espera de BD (asyncpg) y de Open-Meteo (httpx) no ocupa el bucle de eventos ni el threadpool.
+    """
+    start_year = settings.BASE_YEAR - 2
+    end_year = settings.BASE_YEAR
+    try:
+        df = await AsyncWeatherConnector().fetch_weather_range(lat, lon, start_year, end_year, tilt, azimuth)
+        if not df.empty:
+            return df
+    except Exception as e:
+        print(f"Advertencia: No se pudo obtener clima (async) para {start_year}-{end_year}: {e}")
+
+    # Alternativa: solo el año base único (el rango ya se intentó en todos los niveles) en el threadpool
+    skip_result_cache()
+    return await run_in_threadpool(_fallback_weather, WeatherConnector(), lat, lon, tilt, azimuth)
+
+def create_long_term_monthly_projection(base_monthly_profile: np.ndarray, years: int = 20, degradation_annual: float = 0.005) -> np.ndarray:
     """
     Proyecta la generación mensual a lo largo de 20+ años considerando la degradación.
-    base_monthly_profile: Serie de 12 meses (Año Representativo).
-    Retorna una lista plana de [años * 12] valores.
+    base_monthly_profile: array de 12 meses (Año Representativo).
+    Retorna un array plano de [años * 12] valores (producto exterior factores x perfil).
     """
-    base_values = base_monthly_profile.values
-    if len(base_values) != 12:
-        # Si se pasa una serie temporal > 12 meses, se asume perfil representativo ya procesado.
-        pass
-        
-    projection = []
-    
-    for year in range(years):
-        # Aplicar factor de degradación
-        factor = (1 - degradation_annual) ** year
-        yearly_values = base_values * factor
-        projection.extend(yearly_values.tolist())
+    return monthly_projection(base_monthly_profile, years, float(degradation_annual))
+
+def _solar_orientation(params):
+    """Parámetros Expertos: Inclinación (Tilt) y Azimut, con conversión a float para prevenir errores de tipo."""
+    try:
+        tilt = float(params.get("tilt", 30))
+    except (ValueError, TypeError):
+        tilt = 30.0
         
-    return projection
+    try:
+        azimuth = float(params.get("azimuth", 0))
+    except (ValueError, TypeError):
+        azimuth = 0.0
+    return tilt, azimuth
+
+# --- Lógica de Tipo de Panel ---
+# Mapear panel_type a coeficientes físicos si no se proveen explícitamente
+# Coeficientes de Temp por defecto (%/C) -> Fracción/C
+# Mono: -0.35%, Poly: -0.45%, Capa Fina: -0.20%
+SOLAR_PANEL_SPECS = {
+    "monocrystalline": {"temp_coef": -0.0035, "bifaciality": 0.0},
+    "polycrystalline": {"temp_coef": -0.0045, "bifaciality": 0.0},
+    "thinfilm": {"temp_coef": -0.0020, "bifaciality": 0.0},
+    "bifacial": {"temp_coef": -0.0035, "bifaciality": 0.70}, # Factor bifacial 70%
+    "custom": {"temp_coef": -0.0035, "bifaciality": 0.0}
+}
+
+def _solar_model_params(params):
+    """Parámetros físicos de SolarModel a partir de los parámetros de la petición (con defectos por tipo de panel)."""
+    panel_type = str(params.get("panel_type", "monocrystalline")).lower()
+    # Obtener valores por defecto para este tipo
+    specs = SOLAR_PANEL_SPECS.get(panel_type, SOLAR_PANEL_SPECS["monocrystalline"])
+
+    # Usar valor provisto si existe, sino usar defecto del tipo
+    return {
+        "system_loss": float(params.get("system_loss", 0.14)),
+        "inverter_eff": float(params.get("inverter_eff", 0.96)),
+        "temp_coef": float(params.get("temp_coef", specs["temp_coef"])),
+        "bifaciality": float(params.get("bifaciality", specs["bifaciality"]))
+    }
 
 @router.post("/solar")
-def predict_solar(request: SimulationRequest):
+@result_cache.cached("/solar")
+async def predict_solar(request: SimulationRequest):
     try:
-        params = request.parameters
-        # Parámetros Expertos: Inclinación (Tilt) y Azimut
-        # Aseguramos conversión a float para prevenir errores de tipo
-        try:
-            tilt = float(params.get("tilt", 30))
-        except (ValueError, TypeError):
-            tilt = 30.0
-            
-        try:
-            azimuth = float(params.get("azimuth", 0))
-        except (ValueError, TypeError):
-            azimuth = 0.0
-            
-        df_weather = get_weather_data(request.latitude, request.longitude, tilt=tilt, azimuth=azimuth)
-        
-        # Usar Radiación en el Plano del Array (POA) si disponible (Modo Experto), sino GHI
-        if "radiation_poa" in df_weather.columns:
-             radiation = df_weather["radiation_poa"].to_numpy()
-             # Manejo de posibles fallos de API donde POA es None
-             if radiation[0] is None or np.isnan(radiation).all():
-                 print("Advertencia: Radiación POA nula, usando GHI como alternativa")
-                 radiation = df_weather["radiation_ghi"].to_numpy()
-        else:
+        generation = await _solar_generation(request, _site_weather(request))
+        # El post-proceso es CPU: se ejecuta en el threadpool, no en el bucle de eventos
+        return await run_in_threadpool(_summary_from_calendar, request, *generation)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Solar Prediction Error: {str(e)}")
+
+def _site_weather(request: SimulationRequest):
+    """Carga de clima del proyecto para los perfiles unitarios: (tilt, azimuth) -> DataFrame."""
+    return partial(get_weather_data_async, request.latitude, request.longitude)
+
+async def _solar_generation(request: SimulationRequest, load_weather):
+    """(calendario, generación horaria kW, degradación anual) del proyecto solar."""
+    params = request.parameters
+    tilt, azimuth = _solar_orientation(params)
+    model = SolarModel(**_solar_model_params(params))
+    # Perfil por kWp del sitio/orientación/panel: pérdidas, inversor y capacidad se aplican después
+    physical_params = {"tilt": tilt, "azimuth": azimuth, "temp_coef": model.temp_coef, "bifaciality": model.bifaciality}
+    profile = await load_unit_profile(
+        "solar", request.latitude, request.longitude, physical_params,
+        lambda: load_weather(tilt=tilt, azimuth=azimuth),
+        partial(_solar_unit_profile, model)
+    )
+
+    # La degradación solar típica es 0.5% por año
+    degradation_raw = params.get("degradation_rate", 0.5)
+    # Verificación: si el usuario envía porcentaje (ej. 0.5) o fracción (0.005)
+    # Heurística: si > 0.05 (5%), asumimos porcentaje. 0.5% es estándar.
+    # Entrada estándar en frontend es "0.5" para 0.5%.
+    # Dividimos por 100.
+    degradation = float(degradation_raw) / 100.0
+
+    # Escalar el perfil unitario y reaplicar el cut-in (1% de la capacidad) y las pérdidas
+    generation_kw = await run_in_threadpool(model.ac_from_unit_dc, profile["unit"], request.capacity_kw)
+    return hourly_calendar(profile["date"]), generation_kw, degradation
+
+def _solar_unit_profile(model: SolarModel, df_weather: pd.DataFrame):
+    # Usar Radiación en el Plano del Array (POA) si disponible (Modo Experto), sino GHI
+    if "radiation_poa" in df_weather.columns:
+         radiation = df_weather["radiation_poa"].to_numpy()
+         # Manejo de posibles fallos de API donde POA es None
+         if radiation[0] is None or np.isnan(radiation).all():
+             print("Advertencia: Radiación POA nula, usando GHI como alternativa")
              radiation = df_weather["radiation_ghi"].to_numpy()
-             
-        temperature = df_weather["temperature"].to_numpy()
+    else:
+         radiation = df_weather["radiation_ghi"].to_numpy()
 
-        # La degradación solar típica es 0.5% por año
-        degradation_raw = params.get("degradation_rate", 0.5)
-        # Verificación: si el usuario envía porcentaje (ej. 0.5) o fracción (0.005)
-        # Heurística: si > 0.05 (5%), asumimos porcentaje. 0.5% es estándar.
-        # Entrada estándar en frontend es "0.5" para 0.5%.
-        # Dividimos por 100.
-        degradation = float(degradation_raw) / 100.0
-
-        # --- Lógica de Tipo de Panel ---
-        # Mapear string panel_type a coeficientes físicos si no se proveen explícitamente
-        panel_type = params.get("panel_type", "monocrystalline").lower()
-        
-        # Coeficientes de Temp por defecto (%/C) -> Fracción/C
-        # Mono: -0.35%, Poly: -0.45%, Capa Fina: -0.20%
-        type_specs = {
-            "monocrystalline": {"temp_coef": -0.0035, "bifaciality": 0.0},
-            "polycrystalline": {"temp_coef": -0.0045, "bifaciality": 0.0},
-            "thinfilm": {"temp_coef": -0.0020, "bifaciality": 0.0},
-            "bifacial": {"temp_coef": -0.0035, "bifaciality": 0.70}, # Factor bifacial 70%
-            "custom": {"temp_coef": -0.0035, "bifaciality": 0.0}
-        }
-        
-        # Obtener valores por defecto para este tipo
-        specs = type_specs.get(panel_type, type_specs["monocrystalline"])
-        
-        # Usar valor provisto si existe, sino usar defecto del tipo
-        temp_coef = params.get("temp_coef", specs["temp_coef"])
-        bifaciality = params.get("bifaciality", specs["bifaciality"])
-
-        model = SolarModel(
-            system_loss=params.get("system_loss", 0.14),
-            inverter_eff=params.get("inverter_eff", 0.96),
-            temp_coef=temp_coef,
-            bifaciality=bifaciality
-        )
-        
-        generation_kw = model.predict_generation(radiation, temperature, request.capacity_kw)
-        
-        # --- Lógica de Promediado Multi-Anual ---
-        df_weather["generation_kw"] = generation_kw
-        
-        # 1. Total generado a través de todos los años obtenidos
-        total_gen_all_years = generation_kw.sum()
-        
-        # 2. Número de años simulados (aprox)
-        num_years = len(df_weather) / 8760.0
-        
-        # 3. Generación Anual Promedio
-        avg_annual_gen = total_gen_all_years / num_years
-        
-        # 4. Perfil Mensual Representativo (Promedio Ene, Promedio Feb...)
-        # Re-muestreo a sumas mensuales primero
-        monthly_series = df_weather.set_index("date").resample("ME")["generation_kw"].sum()
-        
-        # Agrupar por índice de mes (ENE=1, FEB=2...) para obtener producción mensual promedio
-        # Esto crea una serie de 12 valores: [AvgEne, AvgFeb, ...]
-        avg_monthly_profile = monthly_series.groupby(monthly_series.index.month).mean()
-        
-        # Reconstruir un diccionario de "Año Representativo" para el frontend
-        # El frontend espera lógica de fechas. Usualmente solo "Ene, Feb".
-        # Pero las claves de `monthly.to_dict()` son Timestamps.
-        # Para mantener compatibilidad, mapeamos 1..12 a fechas ficticias del Año 0 o AÑO_BASE
-        
-        # Mejor: Retornar los 20 años proyectados basados en este perfil PROMEDIO.
-        # Necesitamos que `create_long_term_monthly_projection` acepte este perfil de 12 meses.
-        
-        project_lifetime = int(request.financial_params.get("project_lifetime", 25))
-        long_term_projection = create_long_term_monthly_projection(avg_monthly_profile, years=project_lifetime, degradation_annual=degradation)
+    temperature = df_weather["temperature"].to_numpy()
+    return _weather_times(df_weather), model.unit_dc_profile(radiation, temperature)
 
-        # Para "monthly_generation_kwh", retornamos el año representativo (12 meses)
-        # mapeado a las fechas del Año Base para que la gráfica del frontend se vea normal (Ene-Dic)
-        base_dates = pd.date_range(start=f"{settings.BASE_YEAR}-01-01", periods=12, freq="ME")
-        monthly_dict = dict(zip(base_dates, avg_monthly_profile.values))
-        
-        # ¿Horario? Retornar 3 años de datos horarios es pesado (26k puntos).
-        # ¿Deberíamos retornar solo el primer año? ¿O el promedio 8760?
-        # Promediar 8760 es difícil (años bisiestos, etc).
-        # Retornemos el ÚLTIMO año (más reciente) como el "Perfil Horario de Muestra" para mantenerlo ligero
-        # pero preciso a tendencias recientes.
-        last_8760 = generation_kw[-8760:].tolist()
+def _summary_from_calendar(request: SimulationRequest, calendar: HourlyCalendar, generation_kw, degradation):
+    """Resultado común de /predict/solar, /wind, /hydro y /biomass a partir de la serie horaria multianual."""
+    # --- Lógica de Promediado Multi-Anual ---
+    # Generación anual promedio sobre el número exacto de años (bisiestos y años parciales incluidos)
+    avg_annual_gen = calendar.annual_mean(generation_kw)
 
-        return {
-            "total_annual_generation_kwh": float(avg_annual_gen),
-            "monthly_generation_kwh": {k.strftime('%Y-%m-%d'): float(v) for k, v in monthly_dict.items()}, 
-            "hourly_generation_kwh": [float(x) for x in last_8760],
-            "long_term_monthly_generation_kwh": [float(x) for x in long_term_projection]
+    # Perfil Mensual Representativo (Promedio Ene, Promedio Feb...): sumas por mes natural
+    # y media por mes del año, solo de los meses con datos
+    months = calendar.months_present
+    avg_monthly_profile = calendar.monthly_mean(generation_kw)[months]
+
+    # Retornar los 20 años proyectados basados en este perfil PROMEDIO.
+    project_lifetime = int(request.financial_params.get("project_lifetime", 25))
+    long_term_projection = create_long_term_monthly_projection(avg_monthly_profile, years=project_lifetime, degradation_annual=degradation)
+
+    # Retornar 3 años de datos horarios es pesado (26k puntos): se devuelve el ÚLTIMO año
+    # (más reciente) como "Perfil Horario de Muestra", ligero pero fiel a tendencias recientes.
+    last_8760 = generation_kw[-8760:]
+
+    return {
+        "total_annual_generation_kwh": float(avg_annual_gen),
+        "monthly_generation_kwh": _representative_year(months, avg_monthly_profile),
+        "hourly_generation_kwh": last_8760,
+        "long_term_monthly_generation_kwh": long_term_projection
+    }
+
+def _representative_year(months, values):
+    """
+    Año representativo {fecha de fin de mes del AÑO_BASE: valor} para que la gráfica
+    del frontend se vea normal (Ene-Dic). months: índices 0..11 de los valores.
+    """
+    labels = month_end_labels(settings.BASE_YEAR)
+    return {labels[m]: float(v) for m, v in zip(months, values)}
+
+@router.post("/solar/batch")
+@result_cache.cached("/solar/batch")
+async def predict_solar_batch(request: SolarBatchRequest):
+    """
+    Evalúa N variantes de diseño solar sobre el mismo emplazamiento en una sola pasada:
+    el clima se carga una vez, la POA se calcula una vez por orientación distinta y
+    SolarModel se evalúa como un broadcast 2-D (escenarios x horas).
+    """
+    if not request.scenarios:
+        raise HTTPException(status_code=400, detail="Debe indicar al menos un escenario")
+    if len(request.scenarios) > settings.SOLAR_BATCH_MAX_SCENARIOS:
+        raise HTTPException(status_code=400, detail=f"Máximo {settings.SOLAR_BATCH_MAX_SCENARIOS} escenarios por petición")
+    try:
+        # Sin orientación: la POA de cada escenario se calcula localmente a partir de GHI/DNI/DHI
+        df_weather = await get_weather_data_async(request.latitude, request.longitude)
+        return await run_in_threadpool(_simulate_solar_batch, request, df_weather)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Solar Batch Prediction Error: {str(e)}")
+
+def _simulate_solar_batch(request: SolarBatchRequest, df_weather: pd.DataFrame):
+    scenario_params = [{**request.parameters, **scenario.parameters} for scenario in request.scenarios]
+
+    # 1. POA una vez por orientación distinta: (orientaciones, horas)
+    orientations = [_solar_orientation(params) for params in scenario_params]
+    unique_orientations = list(dict.fromkeys(orientations))
+    orientation_index = {orientation: i for i, orientation in enumerate(unique_orientations)}
+
+    times = _weather_times(df_weather)
+    frame = _irradiance_frame(df_weather, request.latitude, request.longitude)
+    tilts = np.array([o[0] for o in unique_orientations])[:, None]
+    azimuths = np.array([o[1] for o in unique_orientations])[:, None]
+    poa = frame.poa(tilts, azimuths)
+    radiation = poa[[orientation_index[o] for o in orientations]] # (escenarios, horas)
+
+    # 2. Modelo con parámetros como arrays columna (escenarios, 1)
+    model_params = [_solar_model_params(params) for params in scenario_params]
+    model = SolarModel(**{
+        name: np.array([p[name] for p in model_params])[:, None]
+        for name in ("system_loss", "inverter_eff", "temp_coef", "bifaciality")
+    })
+    capacities = np.array([
+        scenario.capacity_kw if scenario.capacity_kw is not None else request.capacity_kw
+        for scenario in request.scenarios
+    ], dtype=float)
+    temperature = df_weather["temperature"].to_numpy(dtype=float)
+    generation_kw = model.predict_generation(radiation, temperature, capacities[:, None])
+
+    # 3. Agregados por escenario (mismas definiciones que /predict/solar)
+    calendar = hourly_calendar(times)
+    avg_annual_gen = calendar.annual_mean(generation_kw)
+    avg_monthly_profile = calendar.monthly_mean(generation_kw)
+    months = calendar.months_present
+
+    results = []
+    for i, scenario in enumerate(request.scenarios):
+        tilt, azimuth = orientations[i]
+        result = {
+            "name": scenario.name or f"scenario_{i + 1}",
+            "capacity_kw": float(capacities[i]),
+            "tilt": tilt,
+            "azimuth": azimuth,
+            "total_annual_generation_kwh": float(avg_annual_gen[i]),
+            "specific_yield_kwh_kwp": float(avg_annual_gen[i] / capacities[i]) if capacities[i] > 0 else 0.0,
+            "monthly_generation_kwh": _representative_year(months, avg_monthly_profile[i, months])
         }
+        if request.include_hourly:
+            # Mismo criterio que /predict/solar: el último año como perfil horario de muestra
+            result["hourly_generation_kwh"] = generation_kw[i, -8760:]
+        results.append(result)
+
+    return {
+        "scenarios": results,
+        "orientations_evaluated": len(unique_orientations)
+    }
+
+def _weather_times(df_weather: pd.DataFrame):
+    dates = df_weather["date"]
+    if getattr(dates.dt, "tz", None) is not None:
+        dates = dates.dt.tz_convert(None)
+    return dates.to_numpy(dtype="datetime64[ns]")
+
+def _irradiance_frame(df_weather: pd.DataFrame, lat, lon):
+    """IrradianceFrame (posición solar, DNI/DHI completados) del clima cargado, independiente de la orientación."""
+    return IrradianceFrame(
+        _weather_times(df_weather), lat, lon,
+        ghi=df_weather["radiation_ghi"].to_numpy(dtype=float),
+        dni=df_weather["radiation_dni"].to_numpy(dtype=float) if "radiation_dni" in df_weather else None,
+        dhi=df_weather["radiation_dhi"].to_numpy(dtype=float) if "radiation_dhi" in df_weather else None
+    )
+
+@router.post("/solar/optimize-orientation")
+@result_cache.cached("/solar/optimize-orientation")
+async def optimize_solar_orientation(request: OrientationRequest):
+    """
+    Orientación (inclinación/azimut) que maximiza la generación anual del emplazamiento.
+    Rejilla gruesa + refinamiento local sobre el clima multianual cacheado: tras la primera carga
+    de clima no hay tráfico de red. Retorna el óptimo y la superficie de producción de la rejilla.
+    """
+    if request.tilt_min > request.tilt_max:
+        raise HTTPException(status_code=400, detail="tilt_min debe ser <= tilt_max")
+    if (request.azimuth_min is None) != (request.azimuth_max is None):
+        raise HTTPException(status_code=400, detail="Indique azimuth_min y azimuth_max juntos")
+    if min(request.coarse_tilt_step, request.coarse_azimuth_step, request.tolerance_deg) <= 0:
+        raise HTTPException(status_code=400, detail="Los pasos y la tolerancia deben ser positivos")
+    try:
+        df_weather = await get_weather_data_async(request.latitude, request.longitude)
+        return await run_in_threadpool(_optimize_orientation, request, df_weather)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Solar Prediction Error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Orientation Optimization Error: {str(e)}")
+
+def _optimize_orientation(request: OrientationRequest, df_weather: pd.DataFrame):
+    optimizer = OrientationOptimizer(
+        _irradiance_frame(df_weather, request.latitude, request.longitude),
+        df_weather["temperature"].to_numpy(dtype=float),
+        SolarModel(**_solar_model_params(request.parameters)),
+        request.capacity_kw,
+        num_years=hourly_calendar(_weather_times(df_weather)).num_years
+    )
+    azimuth_range = None
+    if request.azimuth_min is not None:
+        azimuth_range = (request.azimuth_min, request.azimuth_max)
+
+    optimum, surface = optimizer.optimize(
+        tilt_range=(request.tilt_min, request.tilt_max),
+        azimuth_range=azimuth_range,
+        fixed_tilt=request.fixed_tilt,
+        fixed_azimuth=request.fixed_azimuth,
+        coarse_tilt_step=request.coarse_tilt_step,
+        coarse_azimuth_step=request.coarse_azimuth_step,
+        tolerance=request.tolerance_deg
+    )
+    capacity = request.capacity_kw
+    optimum["specific_yield_kwh_kwp"] = optimum["annual_generation_kwh"] / capacity if capacity > 0 else 0.0
+    return {
+        "optimal": optimum,
+        "surface": surface,
+        "evaluations": optimizer.evaluations
+    }
 
 @router.post("/wind")
-def predict_wind(request: SimulationRequest):
+@result_cache.cached("/wind")
+async def predict_wind(request: SimulationRequest):
     try:
-        df_weather = get_weather_data(request.latitude, request.longitude)
-        
-        # Nota: df_weather es ahora un DataFrame de 3 años
-        
-        wind_speed_10m = df_weather["wind_speed_10m"].to_numpy()
-        temperature = None
-        pressure = None
-        
-        if "temperature" in df_weather.columns:
-            temperature = df_weather["temperature"].to_numpy()
-        
-        if "surface_pressure" in df_weather.columns:
-            pressure = df_weather["surface_pressure"].to_numpy()
+        generation = await _wind_generation(request, _site_weather(request))
+        return await run_in_threadpool(_summary_from_calendar, request, *generation)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Wind Prediction Error: {str(e)}")
 
-        params = request.parameters
-        
-        degradation = params.get("degradation_rate", 0.01)
-        
-        model = WindModel(
-            hub_height=params.get("hub_height", 80),
-            rough_length=params.get("roughness", 0.03)
-        )
-
-        generation_kw = model.predict_generation(
-             wind_speed_10m_series=wind_speed_10m, 
-             capacity_kw=request.capacity_kw,
-             temperature_c=temperature,
-             pressure_hpa=pressure,
-             specific_curve=params.get("power_curve", None) 
-        )
-        
-        # --- Multi-Year Logic ---
-        df_weather["generation_kw"] = generation_kw
-        total_gen = generation_kw.sum()
-        num_years = len(df_weather) / 8760.0
-        avg_annual = total_gen / num_years
-        
-        monthly_series = df_weather.set_index("date").resample("ME")["generation_kw"].sum()
-        avg_monthly = monthly_series.groupby(monthly_series.index.month).mean()
-        
-        project_lifetime = int(request.financial_params.get("project_lifetime", 25))
-        long_term_projection = create_long_term_monthly_projection(avg_monthly, years=project_lifetime, degradation_annual=degradation)
+async def _wind_generation(request: SimulationRequest, load_weather):
+    """(calendario, generación horaria kW, degradación anual) del parque eólico."""
+    params = request.parameters
+    model = WindModel(
+        hub_height=params.get("hub_height", 80),
+        rough_length=params.get("roughness", 0.03)
+    )
+    specific_curve = params.get("power_curve", None)
+    # Perfil por kW del parque: la generación es lineal en la capacidad
+    physical_params = {"hub_height": model.hub_height, "roughness": model.rough_length, "power_curve": specific_curve}
+    profile = await load_unit_profile(
+        "wind", request.latitude, request.longitude, physical_params,
+        load_weather,
+        partial(_wind_unit_profile, model, specific_curve)
+    )
+    degradation = params.get("degradation_rate", 0.01)
+    return hourly_calendar(profile["date"]), request.capacity_kw * profile["unit"], degradation
 
-        base_dates = pd.date_range(start=f"{settings.BASE_YEAR}-01-01", periods=12, freq="ME")
-        monthly_dict = dict(zip(base_dates, avg_monthly.values))
-        last_8760 = generation_kw[-8760:].tolist()
+def _wind_unit_profile(model: WindModel, specific_curve, df_weather: pd.DataFrame):
+    # Nota: df_weather es ahora un DataFrame de 3 años
+    wind_speed_10m = df_weather["wind_speed_10m"].to_numpy()
+    temperature = None
+    pressure = None
 
-        return {
-            "total_annual_generation_kwh": float(avg_annual),
-            "monthly_generation_kwh": {k.strftime('%Y-%m-%d'): float(v) for k, v in monthly_dict.items()},
-            "hourly_generation_kwh": [float(x) for x in last_8760],
-            "long_term_monthly_generation_kwh": [float(x) for x in long_term_projection]
-        }
+    if "temperature" in df_weather.columns:
+        temperature = df_weather["temperature"].to_numpy()
+
+    if "surface_pressure" in df_weather.columns:
+        pressure = df_weather["surface_pressure"].to_numpy()
+
+    unit = model.unit_generation_profile(
+         wind_speed_10m_series=wind_speed_10m,
+         temperature_c=temperature,
+         pressure_hpa=pressure,
+         specific_curve=specific_curve
+    )
+    return _weather_times(df_weather), unit
+
+@router.post("/wind/catalog-ranking")
+@result_cache.cached("/wind/catalog-ranking")
+async def rank_wind_turbines(request: TurbineRankingRequest):
+    """
+    Evalúa todas (o un subconjunto de) las turbinas del catálogo en un emplazamiento y las ordena.
+    Clima cargado una vez, curvas precompiladas al arrancar y viento a la altura de buje
+    calculado una sola vez por altura distinta.
+    """
+    if request.rank_by not in ("capacity_factor", "aep"):
+        raise HTTPException(status_code=400, detail="rank_by debe ser 'capacity_factor' o 'aep'")
+    turbines = TURBINE_CATALOG
+    if request.turbine_ids is not None:
+        wanted = set(request.turbine_ids)
+        turbines = [t for t in TURBINE_CATALOG if t["id"] in wanted]
+    if not turbines:
+        raise HTTPException(status_code=404, detail="Ninguna turbina del catálogo coincide con la selección")
+    try:
+        df_weather = await get_weather_data_async(request.latitude, request.longitude)
+        return await run_in_threadpool(_rank_wind_turbines, request, turbines, df_weather)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Wind Prediction Error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Turbine Ranking Error: {str(e)}")
+
+def _rank_wind_turbines(request: TurbineRankingRequest, turbines: list, df_weather: pd.DataFrame):
+    wind_speed_10m = df_weather["wind_speed_10m"].to_numpy(dtype=float)
+    temperature = df_weather["temperature"].to_numpy(dtype=float) if "temperature" in df_weather else None
+    pressure = df_weather["surface_pressure"].to_numpy(dtype=float) if "surface_pressure" in df_weather else None
+
+    # Corrección por densidad y factor de realismo: comunes a todas las turbinas
+    site_factor = WindModel().density_correction(temperature, pressure) * WindModel.REALISM_FACTOR
+
+    # Viento a la altura de buje: una vez por altura distinta
+    hub_heights = [float(request.hub_height or t.get("hub_height_m", 80)) for t in turbines]
+    hub_wind = {
+        height: WindModel(hub_height=height, rough_length=request.roughness).extrapolate_wind_speed(wind_speed_10m)
+        for height in dict.fromkeys(hub_heights)
+    }
+
+    # Generación (turbinas, horas): curva normalizada a su máximo y escalada a la capacidad (como /predict/wind)
+    capacities = np.empty(len(turbines))
+    generation_kw = np.empty((len(turbines), len(wind_speed_10m)))
+    for i, (turbine, height) in enumerate(zip(turbines, hub_heights)):
+        speeds, powers = turbine["curve_speeds"], turbine["curve_powers"]
+        capacities[i] = request.capacity_kw if request.capacity_kw is not None else float(turbine.get("rated_power_kw", powers.max()))
+        curve_max = powers.max()
+        scale = capacities[i] / curve_max if curve_max > 0 else 0.0
+        generation_kw[i] = np.interp(hub_wind[height], speeds, powers, left=0, right=0) * scale
+    generation_kw *= site_factor
+
+    calendar = hourly_calendar(_weather_times(df_weather))
+    aep = calendar.annual_mean(generation_kw)
+    capacity_factor = np.divide(aep, capacities * calendar.mean_year_hours, out=np.zeros_like(aep), where=capacities > 0)
+    monthly_profiles = calendar.monthly_mean(generation_kw)
+    months = calendar.months_present
+
+    ranking = aep if request.rank_by == "aep" else capacity_factor
+    results = []
+    for rank, i in enumerate(np.argsort(-ranking, kind="stable"), start=1):
+        turbine = turbines[i]
+        results.append({
+            "rank": rank,
+            "id": turbine["id"],
+            "name": turbine.get("name"),
+            "manufacturer": turbine.get("manufacturer"),
+            "rated_power_kw": turbine.get("rated_power_kw"),
+            "hub_height_m": hub_heights[i],
+            "capacity_kw": float(capacities[i]),
+            "aep_kwh": float(aep[i]),
+            "capacity_factor": float(capacity_factor[i]),
+            "monthly_generation_kwh": _representative_year(months, monthly_profiles[i, months])
+        })
+    return {"rank_by": request.rank_by, "turbines": results}
 
 @router.post("/hydro")
-def predict_hydro(request: SimulationRequest):
+@result_cache.cached("/hydro")
+async def predict_hydro(request: SimulationRequest):
     try:
-        df_weather = get_weather_data(request.latitude, request.longitude)
-        precipitation = df_weather["precipitation"].to_numpy()
-        
-        params = request.parameters
-        degradation = params.get("degradation_rate", 0.002)
-        
-        head = params.get("gross_head", params.get("head_height", 10))
-        
-        model = HydroModel(
-            head_height=head,
-            efficiency=params.get("turbine_efficiency", params.get("efficiency", 0.90)),
-            catchment_area_km2=params.get("catchment_area_km2", 10),
-            runoff_coef=params.get("runoff_coef", 0.5),
-            flow_design=params.get("flow_rate_design", None),
-            turbine_params=params 
-        )
-
-        generation_kw = model.predict_generation(precipitation)
-        
-        # --- Multi-Year Logic ---
-        df_weather["generation_kw"] = generation_kw
-        total_gen = generation_kw.sum()
-        num_years = len(df_weather) / 8760.0
-        avg_annual = total_gen / num_years
-        
-        monthly_series = df_weather.set_index("date").resample("ME")["generation_kw"].sum()
-        avg_monthly = monthly_series.groupby(monthly_series.index.month).mean()
+        generation = await _hydro_generation(request, _site_weather(request))
+        return await run_in_threadpool(_summary_from_calendar, request, *generation)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Hydro Prediction Error: {str(e)}")
 
-        project_lifetime = int(request.financial_params.get("project_lifetime", 25))
-        long_term_projection = create_long_term_monthly_projection(avg_monthly, years=project_lifetime, degradation_annual=degradation)
-        
-        base_dates = pd.date_range(start=f"{settings.BASE_YEAR}-01-01", periods=12, freq="ME")
-        monthly_dict = dict(zip(base_dates, avg_monthly.values))
-        last_8760 = generation_kw[-8760:].tolist()
+async def _hydro_generation(request: SimulationRequest, load_weather):
+    """(calendario, generación horaria kW, degradación anual) de la central hidráulica."""
+    model = _hydro_model(request.parameters)
+    # La etapa hidrológica (media móvil, percentil) se cachea; el dimensionado de la planta
+    # (caudal de diseño, caudal ecológico, tubería, salto) se reaplica en cada petición
+    profile = await load_unit_profile(
+        "hydro", request.latitude, request.longitude, model.flow_params(),
+        load_weather,
+        partial(_hydro_flow_profile, model)
+    )
+    generation_kw = await run_in_threadpool(partial(hydro_power_from_flow, profile["unit"], **model.plant_params()))
+    degradation = request.parameters.get("degradation_rate", 0.002)
+    return hourly_calendar(profile["date"]), generation_kw, degradation
 
-        return {
-            "total_annual_generation_kwh": float(avg_annual),
-            "monthly_generation_kwh": {k.strftime('%Y-%m-%d'): float(v) for k, v in monthly_dict.items()},
-            "hourly_generation_kwh": [float(x) for x in last_8760],
-            "long_term_monthly_generation_kwh": [float(x) for x in long_term_projection]
-        }
+def _hydro_flow_profile(model: HydroModel, df_weather: pd.DataFrame):
+    precipitation = df_weather["precipitation"].to_numpy()
+    return _weather_times(df_weather), hydro_flow_profile(precipitation, **model.flow_params())
+
+def _hydro_model(params):
+    head = params.get("gross_head", params.get("head_height", 10))
+
+    return HydroModel(
+        head_height=head,
+        efficiency=params.get("turbine_efficiency", params.get("efficiency", 0.90)),
+        catchment_area_km2=params.get("catchment_area_km2", 10),
+        runoff_coef=params.get("runoff_coef", 0.5),
+        flow_design=params.get("flow_rate_design", None),
+        turbine_params=params 
+    )
+
+# Parámetros que admiten barrido en /predict/hydro/sweep -> (argumento de hydro_power_kw, factor de unidades)
+HYDRO_SWEEP_PARAMETERS = {
+    "penstock_diameter": ("penstock_diameter", 1.0),
+    "penstock_length": ("penstock_length", 1.0),
+    "flow_rate_design": ("flow_design", 1.0),
+    "gross_head": ("head", 1.0),
+    "turbine_efficiency": ("efficiency", 1.0),
+    "catchment_area_km2": ("catchment_area_m2", 1_000_000.0),
+    "runoff_coef": ("runoff_coef", 1.0),
+    "ecological_flow": ("ecological_flow", 1.0),
+    "mannings_n": ("mannings_n", 1.0),
+}
+
+@router.post("/hydro/sweep")
+@result_cache.cached("/hydro/sweep")
+async def sweep_hydro(request: HydroSweepRequest):
+    """
+    Superficie de generación hidráulica sobre una rejilla de 1 o 2 parámetros
+    (p.ej. diámetro de tubería forzada x caudal de diseño) en una sola petición:
+    el clima se carga una vez y el núcleo NumPy se evalúa con broadcasting sobre la rejilla.
+    """
+    names = list(request.axes)
+    if not 1 <= len(names) <= 2:
+        raise HTTPException(status_code=400, detail="Indique 1 o 2 parámetros a barrer en 'axes'")
+    unknown = [name for name in names if name not in HYDRO_SWEEP_PARAMETERS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Parámetros sin barrido: {unknown}. Válidos: {list(HYDRO_SWEEP_PARAMETERS)}")
+    if any(len(request.axes[name]) == 0 for name in names):
+        raise HTTPException(status_code=400, detail="Cada eje debe tener al menos un valor")
+    if int(np.prod([len(request.axes[name]) for name in names])) > settings.HYDRO_SWEEP_MAX_POINTS:
+        raise HTTPException(status_code=400, detail=f"Máximo {settings.HYDRO_SWEEP_MAX_POINTS} puntos por barrido")
+    # Las pérdidas en tubería necesitan longitud y diámetro (en la base o en los ejes)
+    penstock_keys = ("penstock_length", "penstock_diameter")
+    if any(key in names for key in penstock_keys):
+        missing = [key for key in penstock_keys if key not in names and not request.parameters.get(key)]
+        if missing:
+            raise HTTPException(status_code=400, detail=f"El barrido de tubería forzada requiere {missing} en 'parameters'")
+    try:
+        df_weather = await get_weather_data_async(request.latitude, request.longitude)
+        return await run_in_threadpool(_sweep_hydro, request, df_weather)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Hydro Prediction Error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Hydro Sweep Error: {str(e)}")
+
+def _sweep_hydro(request: HydroSweepRequest, df_weather: pd.DataFrame):
+    precipitation = df_weather["precipitation"].to_numpy(dtype=float)
+    calendar = hourly_calendar(_weather_times(df_weather))
+
+    base = _hydro_model(request.parameters).kernel_params()
+    base["auto_resize_penstock"] = request.auto_resize_penstock
+    # Mismo ruido del caudal sintético (si se usa) en todos los puntos de la rejilla
+    base["noise"] = seasonal_flow_noise(len(precipitation))
+
+    names = list(request.axes)
+    axes = []
+    for name in names:
+        argument, unit = HYDRO_SWEEP_PARAMETERS[name]
+        axes.append((argument, np.asarray(request.axes[name], dtype=float) * unit))
+
+    # La última dimensión barrida se evalúa como array columna (broadcast contra las horas);
+    # la primera (si hay dos) se recorre fila a fila para acotar la memoria (puntos x horas).
+    last_argument, last_values = axes[-1]
+    rows = [{}] if len(axes) == 1 else [{axes[0][0]: value} for value in axes[0][1]]
+    annual = np.empty((len(rows), len(last_values)))
+    peak = np.empty_like(annual)
+    for i, row in enumerate(rows):
+        power_kw = hydro_power_kw(precipitation, **{**base, **row, last_argument: last_values[:, None]})
+        annual[i] = calendar.annual_mean(power_kw)
+        peak[i] = power_kw.max(axis=-1)
+
+    capacity_factor = np.divide(annual, peak * calendar.mean_year_hours, out=np.zeros_like(annual), where=peak > 0)
+    shape = tuple(len(request.axes[name]) for name in names)
+    best = np.unravel_index(np.argmax(annual), annual.shape)
+    best_point = {names[-1]: request.axes[names[-1]][best[1]]}
+    if len(names) == 2:
+        best_point = {names[0]: request.axes[names[0]][best[0]], **best_point}
+
+    return {
+        "axes": {name: request.axes[name] for name in names},
+        "annual_generation_kwh": annual.reshape(shape),
+        "peak_power_kw": peak.reshape(shape),
+        "capacity_factor": capacity_factor.reshape(shape),
+        "max_generation": {**best_point, "annual_generation_kwh": float(annual[best])}
+    }
+
+def _uses_stored_prices(request: SimulationRequest):
+    """True si el despacho depende del contenido de prices_hourly (price_source), que la clave de caché no recoge."""
+    return bool(request.parameters.get("price_source"))
 
 @router.post("/biomass")
-def predict_biomass(request: SimulationRequest):
+# Con price_source el despacho depende de prices_hourly: no se cachea para no servir curvas ya reemplazadas
+@result_cache.cached("/biomass", when=lambda request: not _uses_stored_prices(request))
+async def predict_biomass(request: SimulationRequest):
     # La biomasa depende de precios de mercado para su despacho.
     # Instanciamos el modelo de precios localmente con los parámetros recibidos.
     try:
-        years_to_simulate = [settings.BASE_YEAR - 2, settings.BASE_YEAR - 1, settings.BASE_YEAR]
-        
-        # Obtener precio base de la solicitud o por defecto
-        base_price = request.financial_params.get("initial_electricity_price", 50.0)
-        market_model = MarketModel(base_price=float(base_price))
-        
-        params = request.parameters
-        degradation = params.get("degradation_rate", 0.005)
+        generation = await _biomass_generation(request)
+        return await run_in_threadpool(_summary_from_calendar, request, *generation)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error en predicción de Biomasa: {str(e)}")
 
-        # Generar curva de precios anual y simular año por año para respetar límites de combustible
-        gen_list = []
-        prices_list = []
-        
-        model = BiomassOptimizer(
-            efficiency=params.get("efficiency", 0.25),
-            fuel_cost_eur_ton=params.get("fuel_cost", 150),
-            pci_kwh_kg=params.get("pci", 4.5),
-            tech_params=params 
-        )
-
-        for _ in years_to_simulate:
-            annual_prices = market_model.generate_annual_price_curve()
-            prices_list.extend(annual_prices)
-            
-            # Despacho para este año específico
-            annual_gen = model.optimize_dispatch(annual_prices, request.capacity_kw)
-            gen_list.extend(annual_gen)
-            
-        prices = np.array(prices_list)
-        generation_kw = np.array(gen_list)
-        
-        # Crear fechas para todo el rango multi-anual
-        full_dates = []
-        for year in years_to_simulate:
-            full_dates.extend(pd.date_range(start=f"{year}-01-01", end=f"{year}-12-31 23:00", freq="H").tolist())
-        
-        # Asegurar coincidencia de longitud (años bisiestos vs listas sintéticas de 8760)
-        min_len = min(len(full_dates), len(generation_kw))
-        df = pd.DataFrame({"date": full_dates[:min_len], "generation_kw": generation_kw[:min_len]})
-        
-        # --- Lógica Multi-Anual ---
-        total_gen = generation_kw.sum()
-        num_years = len(years_to_simulate)
-        avg_annual = total_gen / num_years
-        
-        monthly_series = df.set_index("date").resample("ME")["generation_kw"].sum()
-        avg_monthly = monthly_series.groupby(monthly_series.index.month).mean()
-        
-        project_lifetime = int(request.financial_params.get("project_lifetime", 25))
-        long_term_projection = create_long_term_monthly_projection(avg_monthly, years=project_lifetime, degradation_annual=degradation)
+async def _biomass_generation(request: SimulationRequest, load_weather=None):
+    """(calendario, generación horaria kW, degradación anual) del despacho de biomasa."""
+    # La biomasa no usa clima: misma firma que el resto de tecnologías para el despacho por tipo
+    years_to_simulate = (settings.BASE_YEAR - 2, settings.BASE_YEAR - 1, settings.BASE_YEAR)
+    # price_source: curvas de prices_hourly (si están completas); se leen con asyncpg, sin ocupar el threadpool
+    price_source = request.parameters.get("price_source")
+    stored = [await async_db.load_price_curve(year, price_source) if price_source else None
+              for year in years_to_simulate]
+    return await run_in_threadpool(_biomass_dispatch, request, years_to_simulate, stored)
 
-        base_dates = pd.date_range(start=f"{settings.BASE_YEAR}-01-01", periods=12, freq="ME")
-        monthly_dict = dict(zip(base_dates, avg_monthly.values))
-        last_8760 = generation_kw[-8760:].tolist()
+def _biomass_dispatch(request: SimulationRequest, years_to_simulate, stored_prices):
+    """Despacho año a año (CPU); los años sin curva almacenada usan la curva sintética del modelo de mercado."""
+    # Obtener precio base de la solicitud o por defecto
+    base_price = request.financial_params.get("initial_electricity_price", 50.0)
+    params = request.parameters
+    # price_seed: semilla de las curvas sintéticas (por defecto fija: resultado reproducible y cacheable)
+    market_model = MarketModel(base_price=float(base_price), seed=params.get("price_seed", settings.DEFAULT_PRICE_SEED))
 
-        return {
-            "total_annual_generation_kwh": float(avg_annual),
-            "monthly_generation_kwh": {k.strftime('%Y-%m-%d'): float(v) for k, v in monthly_dict.items()},
-            "hourly_generation_kwh": [float(x) for x in last_8760],
-            "long_term_monthly_generation_kwh": [float(x) for x in long_term_projection]
+    degradation = params.get("degradation_rate", 0.005)
+
+    model = BiomassOptimizer(
+        efficiency=params.get("efficiency", 0.25),
+        fuel_cost_eur_ton=params.get("fuel_cost", 150),
+        pci_kwh_kg=params.get("pci", 4.5),
+        tech_params=params 
+    )
+
+    # Generar curva de precios anual y simular año por año para respetar límites de combustible
+    annual_generation = []
+    for year, prices in zip(years_to_simulate, stored_prices):
+        if prices is None:
+            prices = market_model.generate_annual_price_curve(year)
+
+        # Despacho para este año específico
+        annual_generation.append(model.optimize_dispatch(prices, request.capacity_kw))
+
+    generation_kw = np.concatenate(annual_generation)
+
+    # Cada curva anual (8760 h) cubre el año de modelo completo: calendario de años de longitud fija
+    calendar = model_year_calendar(tuple(years_to_simulate), market_model.HOURS)
+    return calendar, generation_kw, degradation
+
+# Generación horaria por tecnología: (request, load_weather) -> (calendario, generación kW, degradación)
+PROJECT_GENERATION = {
+    "solar": _solar_generation,
+    "wind": _wind_generation,
+    "hydro": _hydro_generation,
+    "biomass": _biomass_generation
+}
+
+@router.post("/lifetime-hourly")
+async def stream_lifetime_hourly(request: SimulationRequest):
+    """
+    Generación horaria de toda la vida útil (project_lifetime años x 8760 h) con degradación anual,
+    en streaming año a año: NDJSON por defecto, o binario float32 / Arrow IPC según Accept.
+    La base es el último año simulado (el mismo perfil horario de /predict/<tecnología>);
+    el servidor solo mantiene un año en memoria, sea cual sea la vida útil.
+    """
+    generate = PROJECT_GENERATION.get(request.project_type.lower())
+    if generate is None:
+        raise HTTPException(status_code=400, detail=f"project_type debe ser uno de {list(PROJECT_GENERATION)}")
+    project_lifetime = int(request.financial_params.get("project_lifetime", 25))
+    if not 1 <= project_lifetime <= settings.PROJECTION_MAX_YEARS:
+        raise HTTPException(status_code=400, detail=f"project_lifetime debe estar entre 1 y {settings.PROJECTION_MAX_YEARS}")
+    try:
+        _, generation_kw, degradation = await generate(request, _site_weather(request))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Lifetime Projection Error: {str(e)}")
+
+    base_year = generation_kw[-8760:]
+    degradation = float(degradation)
+    header = {
+        "project_type": request.project_type.lower(),
+        "capacity_kw": request.capacity_kw,
+        "years": project_lifetime,
+        "hours_per_year": len(base_year),
+        "degradation_annual": degradation
+    }
+    rows = (
+        ({"year_index": year, "degradation_factor": factor}, values)
+        for year, factor, values in iter_hourly_projection(base_year, project_lifetime, degradation)
+    )
+    return stream_rows(header, "hourly_generation_kwh", rows, (project_lifetime, len(base_year)))
+
+@router.post("/portfolio")
+@result_cache.cached("/portfolio", when=lambda request: not any(
+    p.project_type.lower() == "biomass" and _uses_stored_prices(p) for p in request.projects
+))
+async def predict_portfolio(request: PortfolioRequest):
+    """
+    Simula una cartera de proyectos (cualquier mezcla de tecnologías) compartiendo el clima:
+    los proyectos se agrupan por celda de la rejilla de clima y cada celda se carga como mucho
+    una vez (y solo si algún perfil unitario no está ya en caché). Retorna el resultado de cada
+    proyecto (mismos campos que /predict/<tecnología>) y el agregado de la cartera.
+    """
+    if not request.projects:
+        raise HTTPException(status_code=400, detail="Debe indicar al menos un proyecto")
+    if len(request.projects) > settings.PORTFOLIO_MAX_PROJECTS:
+        raise HTTPException(status_code=400, detail=f"Máximo {settings.PORTFOLIO_MAX_PROJECTS} proyectos por cartera")
+    unknown = sorted({p.project_type for p in request.projects if p.project_type.lower() not in PROJECT_GENERATION})
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"project_type no soportado: {unknown}. Válidos: {list(PROJECT_GENERATION)}")
+    try:
+        # Agrupar por celda de clima (la biomasa no usa clima)
+        weather_projects = [p for p in request.projects if p.project_type.lower() != "biomass"]
+        cell_keys = await asyncio.to_thread(lambda: [grid_index.snap(p.latitude, p.longitude) for p in weather_projects])
+        cells = {}
+        project_cells = {}
+        for project, key in zip(weather_projects, cell_keys):
+            if key not in cells:
+                # Cargar con el centro ajustado de la celda (no con el primer proyecto) para leer
+                # y escribir las mismas entradas de caché/BD que un /predict individual
+                cells[key] = _CellWeather(*key)
+            project_cells[id(project)] = cells[key]
+
+        async def simulate(project):
+            cell = project_cells.get(id(project))
+            load_weather = cell.for_project(project) if cell is not None else None
+            return await PROJECT_GENERATION[project.project_type.lower()](project, load_weather)
+
+        generations = await asyncio.gather(*(simulate(p) for p in request.projects))
+        result = await run_in_threadpool(_portfolio_summary, request, generations)
+        result["weather_cells"] = len(cells)
+        result["weather_loads"] = sum(cell.loads for cell in cells.values())
+        return result
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Portfolio Prediction Error: {str(e)}")
+
+class _CellWeather:
+    """
+    Clima de una celda de la rejilla compartido por todos sus proyectos: se carga (sin orientación)
+    con las coordenadas ajustadas de la celda la primera vez que un proyecto lo necesita y la POA se añade por proyecto con sus propias coordenadas.
+    """
+    def __init__(self, lat, lon):
+        self.lat = lat
+        self.lon = lon
+        self.loads = 0
+        self._task = None
+
+    async def frame(self):
+        if self._task is None:
+            self.loads += 1
+            self._task = asyncio.ensure_future(get_weather_data_async(self.lat, self.lon))
+        return await self._task
+
+    def for_project(self, project: SimulationRequest):
+        """Carga de clima con la firma de _site_weather: (tilt, azimuth) -> DataFrame del proyecto."""
+        async def load(tilt=None, azimuth=None):
+            df = await self.frame()
+            if tilt is None:
+                return df
+            return await asyncio.to_thread(WeatherConnector.add_plane_of_array, df, project.latitude, project.longitude, tilt, azimuth)
+        return load
+
+def _portfolio_summary(request: PortfolioRequest, generations):
+    projects = []
+    by_type = {}
+    capacity = 0.0
+    annual = 0.0
+    monthly = np.zeros(12)
+    hourly = np.zeros(8760)
+    long_term = np.zeros(0)
+    labels = month_end_labels(settings.BASE_YEAR)
+    months_present = np.zeros(12, dtype=bool)
+
+    for index, (project, (calendar, generation_kw, degradation)) in enumerate(zip(request.projects, generations)):
+        summary = _summary_from_calendar(project, calendar, generation_kw, degradation)
+        project_type = project.project_type.lower()
+
+        # Agregados de la cartera: totales anuales, año representativo, perfil horario de muestra
+        # (alineado al final, como el de cada proyecto) y proyección a largo plazo (hasta la vida útil más larga)
+        capacity += project.capacity_kw
+        annual += summary["total_annual_generation_kwh"]
+        months = calendar.months_present
+        monthly[months] += calendar.monthly_mean(generation_kw)[months]
+        months_present[months] = True
+        sample = summary["hourly_generation_kwh"]
+        hourly[len(hourly) - len(sample):] += sample
+        projection = summary["long_term_monthly_generation_kwh"]
+        if len(projection) > len(long_term):
+            long_term = np.concatenate([long_term, np.zeros(len(projection) - len(long_term))])
+        long_term[:len(projection)] += projection
+
+        totals = by_type.setdefault(project_type, {"projects": 0, "capacity_kw": 0.0, "total_annual_generation_kwh": 0.0})
+        totals["projects"] += 1
+        totals["capacity_kw"] += project.capacity_kw
+        totals["total_annual_generation_kwh"] += summary["total_annual_generation_kwh"]
+
+        if not request.include_project_hourly:
+            del summary["hourly_generation_kwh"]
+        projects.append({"index": index, "project_type": project_type, "capacity_kw": project.capacity_kw, **summary})
+
+    return {
+        "projects": projects,
+        "portfolio": {
+            "projects": len(projects),
+            "capacity_kw": capacity,
+            "total_annual_generation_kwh": annual,
+            "monthly_generation_kwh": {labels[m]: float(monthly[m]) for m in np.flatnonzero(months_present)},
+            "hourly_generation_kwh": hourly,
+            "long_term_monthly_generation_kwh": long_term,
+            "by_project_type": by_type
         }
+    }
+
+@router.post("/biomass/monte-carlo")
+# Sin semilla la petición pide trayectorias nuevas: solo se cachean las que fijan seed
+@result_cache.cached("/biomass/monte-carlo", when=lambda request: request.seed is not None)
+async def predict_biomass_monte_carlo(request: BiomassMonteCarloRequest):
+    """
+    Incertidumbre de la biomasa frente al precio: N trayectorias de precio anuales (semilla reproducible,
+    ruido autocorrelado) despachadas todas a la vez. Retorna P10/P50/P90 de generación y margen,
+    con P90 = valor superado en el 90% de las trayectorias (convención de producible).
+    """
+    if not 1 <= request.num_paths <= settings.BIOMASS_MAX_PRICE_PATHS:
+        raise HTTPException(status_code=400, detail=f"num_paths debe estar entre 1 y {settings.BIOMASS_MAX_PRICE_PATHS}")
+    if request.seed is not None and request.seed < 0:
+        raise HTTPException(status_code=400, detail="seed debe ser un entero >= 0")
+    if not 0.0 <= request.price_autocorrelation < 1.0:
+        raise HTTPException(status_code=400, detail="price_autocorrelation debe estar en [0, 1)")
+    try:
+        return await run_in_threadpool(_simulate_biomass_monte_carlo, request)
     except Exception as e:
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Error en predicción de Biomasa: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error en Monte Carlo de Biomasa: {str(e)}")
+
+def _exceedance_percentiles(values):
+    # P90 es el valor superado en el 90% de los casos -> percentil 10 de la distribución
+    p90, p50, p10 = np.percentile(values, [10, 50, 90])
+    return {"p10": float(p10), "p50": float(p50), "p90": float(p90), "mean": float(np.mean(values))}
+
+def _simulate_biomass_monte_carlo(request: BiomassMonteCarloRequest):
+    seed = request.seed if request.seed is not None else random_seed()
+    base_price = request.financial_params.get("initial_electricity_price", 50.0)
+    market_model = MarketModel(base_price=float(base_price), volatility=request.price_volatility, seed=seed)
+    price_paths = market_model.generate_price_paths(request.num_paths, year=settings.BASE_YEAR,
+                                                    autocorrelation=request.price_autocorrelation)
+
+    params = request.parameters
+    model = BiomassOptimizer(
+        efficiency=params.get("efficiency", 0.25),
+        fuel_cost_eur_ton=params.get("fuel_cost", 150),
+        pci_kwh_kg=params.get("pci", 4.5),
+        tech_params=params
+    )
+    result = model.dispatch_paths(price_paths, request.capacity_kw)
+    capacity_factor = result["generation_kwh"] / (request.capacity_kw * price_paths.shape[1]) if request.capacity_kw > 0 else np.zeros(request.num_paths)
+
+    return {
+        "num_paths": request.num_paths,
+        "seed": seed,
+        "marginal_cost_eur_mwh": float(model.marginal_cost_eur_mwh()),
+        "max_operating_hours": model.max_operating_hours(request.capacity_kw),
+        "annual_generation_kwh": _exceedance_percentiles(result["generation_kwh"]),
+        "annual_margin_eur": _exceedance_percentiles(result["margin_eur"]),
+        "annual_revenue_eur": _exceedance_percentiles(result["revenue_eur"]),
+        "operating_hours": _exceedance_percentiles(result["operating_hours"]),
+        "capacity_factor": _exceedance_percentiles(capacity_factor),
+        "mean_price_eur_mwh": _exceedance_percentiles(price_paths.mean(axis=1))
+    }
@@ -0,0 +1,56 @@
+import json
+from fastapi.concurrency import run_in_threadpool
+from etl.weather_cache import WeatherCache
+from etl.single_flight import SingleFlight
+from etl.weather_connector import WEATHER_FALLBACK_ATTR
+from routers.result_cache import skip_result_cache
+from config.settings import settings
+
+# Perfiles horarios independientes de la capacidad (por kW instalado) de /predict/solar, /wind y /hydro.
+# Clave: (tecnología, emplazamiento, años de clima, parámetros físicos). Un cambio de capacidad (o de
+# pérdidas/eficiencias aplicadas a la salida) se responde escalando el perfil cacheado y reaplicando
+# exactamente los umbrales del modelo, sin volver a cargar clima ni a evaluar la física.
+# Reutiliza la LRU por bytes de la caché de clima (sin ventana de obsolescencia: no hay refresco).
+unit_profile_cache = WeatherCache(
+    max_bytes=settings.UNIT_PROFILE_CACHE_MAX_BYTES,
+    ttl_seconds=settings.UNIT_PROFILE_CACHE_TTL_SECONDS,
+    stale_seconds=0
+)
+# Peticiones concurrentes del mismo perfil (p.ej. varias capacidades a la vez) lo calculan una sola vez
+unit_profile_flight = SingleFlight()
+
+
+def unit_profile_key(technology, lat, lon, physical_params):
+    """Clave del perfil: las coordenadas del sitio (no de la celda) porque la POA depende de ellas."""
+    params = json.dumps(physical_params, sort_keys=True, separators=(",", ":"), default=str)
+    return (technology, round(float(lat), 4), round(float(lon), 4),
+            settings.BASE_YEAR - 2, settings.BASE_YEAR, params)
+
+
+async def load_unit_profile(technology, lat, lon, physical_params, load_weather, build):
+    """
+    Perfil unitario del sitio: dict {"date": datetime64[ns], "unit": array, "weather_fallback": bool} de solo lectura.
+    load_weather: corrutina sin argumentos que devuelve el DataFrame de clima (solo en caso de fallo de caché).
+    build(df_weather) -> (fechas, perfil): cálculo físico, se ejecuta en el threadpool.
+    """
+    key = unit_profile_key(technology, lat, lon, physical_params)
+    profile = unit_profile_cache.get(key)
+    if profile is not None:
+        return profile
+
+    async def compute():
+        df_weather = await load_weather()
+        times, unit = await run_in_threadpool(build, df_weather)
+        fallback = bool(df_weather.attrs.get(WEATHER_FALLBACK_ATTR))
+        arrays = {"date": times, "unit": unit, "weather_fallback": fallback}
+        # Clima degradado (año base único): no se cachea, así la siguiente petición vuelve a
+        # intentar el rango multianual en lugar de servir el perfil de un solo año durante el TTL
+        if not fallback:
+            unit_profile_cache.put(key, arrays)
+        return arrays
+
+    profile = await unit_profile_flight.do_async(key, compute)
+    if profile["weather_fallback"]:
+        # También para las peticiones coalescidas sobre el cálculo de otra (no cargaron clima)
+        skip_result_cache()
+    return profile
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Los módulos del motor se importan como en main.py (config, etl, models, routers en la raíz de physics_engine)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
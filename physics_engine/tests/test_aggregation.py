@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+from models.aggregation import HourlyCalendar, hourly_calendar, model_year_calendar, month_end_labels
+
+
+def hours(start, end):
+    return pd.date_range(start, end, freq="h", inclusive="left").to_numpy()
+
+
+@pytest.mark.parametrize("year, expected_hours", [(2019, 8760), (2020, 8784), (2000, 8784), (2100, 8760)])
+def test_full_calendar_year_counts_as_one_year(year, expected_hours):
+    calendar = HourlyCalendar(hours(f"{year}-01-01", f"{year + 1}-01-01"))
+    assert calendar.hours == expected_hours
+    assert calendar.num_years == pytest.approx(1.0)
+    assert calendar.mean_year_hours == pytest.approx(expected_hours)
+
+
+def test_multi_year_range_with_leap_year():
+    calendar = HourlyCalendar(hours("2019-01-01", "2022-01-01"))
+    assert calendar.num_years == pytest.approx(3.0)
+    assert calendar.years.tolist() == [2019, 2020, 2021]
+    assert calendar.hours_per_year.tolist() == [8760, 8784, 8760]
+    values = np.ones(calendar.hours)
+    assert calendar.annual_mean(values) == pytest.approx((8760 + 8784 + 8760) / 3)
+
+
+def test_partial_leap_year_counts_its_fraction():
+    calendar = HourlyCalendar(hours("2020-01-01", "2020-07-01"))
+    assert calendar.num_years == pytest.approx(calendar.hours / 8784)
+    assert calendar.months_present.tolist() == list(range(6))
+
+
+def test_monthly_aggregation_matches_pandas():
+    times = hours("2019-06-01", "2021-04-01") # incluye febrero bisiesto de 2020
+    values = np.random.default_rng(0).random(len(times))
+    series = pd.Series(values, index=times)
+    calendar = HourlyCalendar(times)
+
+    monthly = series.resample("MS").sum()
+    np.testing.assert_allclose(calendar.monthly_totals(values), monthly.to_numpy())
+
+    expected = monthly.groupby(monthly.index.month).mean().reindex(range(1, 13)).to_numpy()
+    np.testing.assert_allclose(calendar.monthly_mean(values), expected)
+
+
+def test_batched_series_match_single_series():
+    times = hours("2020-01-01", "2021-01-01")
+    batch = np.random.default_rng(1).random((3, len(times)))
+    calendar = hourly_calendar(times)
+    np.testing.assert_allclose(calendar.monthly_mean(batch), np.stack([calendar.monthly_mean(row) for row in batch]))
+    np.testing.assert_allclose(calendar.annual_mean(batch), batch.sum(axis=1))
+
+
+def test_regular_series_reuse_the_same_calendar():
+    times = hours("2021-01-01", "2024-01-01")
+    assert hourly_calendar(times) is hourly_calendar(times.copy())
+
+
+def test_series_with_gaps_and_unsorted_input():
+    times = np.concatenate([hours("2020-01-01", "2020-02-01"), hours("2020-03-01", "2020-04-01")])
+    calendar = hourly_calendar(times)
+    assert calendar.months_present.tolist() == [0, 2]
+    with pytest.raises(ValueError):
+        HourlyCalendar(times[::-1])
+
+
+def test_model_year_calendar_treats_leap_years_as_fixed_length():
+    calendar = model_year_calendar((2020, 2021))
+    assert calendar.hours == 2 * 8760
+    assert calendar.num_years == pytest.approx(2.0)
+
+
+def test_month_end_labels_leap_february():
+    labels = month_end_labels(2024)
+    assert labels[1] == "2024-02-29" and labels[-1] == "2024-12-31" and len(labels) == 12
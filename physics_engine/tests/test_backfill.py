@@ -0,0 +1,34 @@
+import json
+from etl import backfill
+from etl.backfill import BackfillState, plan_backfill
+
+CELL = (40.4, -3.7)
+
+
+def coverage(hours_by_year):
+    return lambda start_year, end_year: {CELL: dict(hours_by_year)}
+
+
+def test_widening_the_range_only_plans_the_new_years(tmp_path, monkeypatch):
+    state = BackfillState(str(tmp_path / "state.json"))
+    monkeypatch.setattr(backfill.db, "load_weather_coverage", coverage({}))
+    assert plan_backfill([CELL], 2021, 2023, state) == [(CELL, [2021, 2022, 2023])]
+    state.mark_done(CELL, [2021, 2022, 2023])
+
+    # Reanudación con un rango más amplio: la celda no se omite entera
+    resumed = BackfillState(str(tmp_path / "state.json"))
+    assert plan_backfill([CELL], 2018, 2023, resumed) == [(CELL, [2018, 2019, 2020])]
+
+
+def test_years_covered_in_db_are_recorded_per_year(tmp_path, monkeypatch):
+    state = BackfillState(str(tmp_path / "state.json"))
+    monkeypatch.setattr(backfill.db, "load_weather_coverage", coverage({2021: 8760, 2022: 100}))
+    assert plan_backfill([CELL], 2021, 2022, state) == [(CELL, [2022])]
+    assert state.is_done(CELL, 2021) and not state.is_done(CELL, 2022)
+
+
+def test_legacy_cell_only_state_is_ignored(tmp_path, monkeypatch):
+    path = tmp_path / "state.json"
+    path.write_text(json.dumps({"done": [list(CELL)]}))
+    monkeypatch.setattr(backfill.db, "load_weather_coverage", coverage({}))
+    assert plan_backfill([CELL], 2023, 2023, BackfillState(str(path))) == [(CELL, [2023])]
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+from models.biomass import BiomassOptimizer
+
+
+def single_path_totals(optimizer, prices, capacity_kw):
+    dispatch = optimizer.optimize_dispatch(prices, capacity_kw)
+    running = dispatch > 0
+    return {
+        "operating_hours": int(running.sum()),
+        "revenue_eur": float(np.sum(dispatch * prices) / 1000.0),
+        "margin_eur": float(np.sum(dispatch * (prices - optimizer.marginal_cost_eur_mwh())) / 1000.0)
+    }
+
+
+@pytest.mark.parametrize("tech_params", [
+    {}, # combustible ilimitado
+    {"max_fuel_ton": 800}, # combustible limitado: solo las horas más caras
+    {"max_fuel_ton": 0} # sin combustible: ninguna hora
+])
+def test_dispatch_paths_matches_optimize_dispatch_on_one_path(tech_params):
+    optimizer = BiomassOptimizer(tech_params=tech_params)
+    prices = np.random.default_rng(7).normal(120, 40, 8760)
+    capacity_kw = 500
+
+    expected = single_path_totals(optimizer, prices, capacity_kw)
+    paths = optimizer.dispatch_paths(prices, capacity_kw)
+
+    assert paths["operating_hours"].shape == (1,)
+    assert paths["operating_hours"][0] == expected["operating_hours"]
+    assert paths["generation_kwh"][0] == pytest.approx(expected["operating_hours"] * capacity_kw)
+    assert paths["revenue_eur"][0] == pytest.approx(expected["revenue_eur"])
+    assert paths["margin_eur"][0] == pytest.approx(expected["margin_eur"])
+
+
+def test_dispatch_paths_is_row_wise():
+    optimizer = BiomassOptimizer(tech_params={"max_fuel_ton": 500})
+    prices = np.random.default_rng(3).normal(100, 50, (4, 8760))
+    batch = optimizer.dispatch_paths(prices, 300)
+    for i, row in enumerate(prices):
+        single = optimizer.dispatch_paths(row, 300)
+        for field, values in batch.items():
+            assert values[i] == pytest.approx(single[field][0])
+
+
+def test_limited_fuel_caps_operating_hours():
+    optimizer = BiomassOptimizer(tech_params={"max_fuel_ton": 100})
+    prices = np.full(8760, 500.0)
+    max_hours = optimizer.max_operating_hours(1000)
+    assert optimizer.optimize_dispatch(prices, 1000).astype(bool).sum() == max_hours
+    assert optimizer.dispatch_paths(prices, 1000)["operating_hours"][0] == max_hours
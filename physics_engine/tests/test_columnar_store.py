@@ -0,0 +1,83 @@
+import os
+import threading
+import numpy as np
+from etl.columnar_store import ColumnarWeatherStore
+
+VARIABLES = ("temperature",)
+
+
+def year_arrays(value, hours=8760):
+    return {
+        "date": np.datetime64("2023-01-01T00", "h") + np.arange(hours).astype("timedelta64[h]"),
+        "temperature": np.full(hours, float(value))
+    }
+
+
+def test_round_trip(tmp_path):
+    store = ColumnarWeatherStore(str(tmp_path), max_bytes=1 << 30)
+    assert store.read(40.4, -3.7, 2023, VARIABLES) is None
+    assert store.write(40.4, -3.7, 2023, year_arrays(1.5))
+    arrays = store.read(40.4, -3.7, 2023, VARIABLES)
+    np.testing.assert_array_equal(arrays["temperature"], np.full(8760, 1.5))
+    assert store.stats()["hits"] == 1 and store.stats()["misses"] == 1
+
+
+def test_rewrites_never_expose_a_missing_year(tmp_path):
+    store = ColumnarWeatherStore(str(tmp_path), max_bytes=1 << 30)
+    store.write(40.4, -3.7, 2023, year_arrays(0, hours=24))
+    stop = threading.Event()
+    missing = []
+
+    def reader():
+        while not stop.is_set():
+            if store.read(40.4, -3.7, 2023, VARIABLES) is None:
+                missing.append(1)
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    for value in range(1, 100):
+        store.write(40.4, -3.7, 2023, year_arrays(value, hours=24))
+    stop.set()
+    thread.join()
+
+    assert missing == []
+    assert store.read(40.4, -3.7, 2023, VARIABLES)["temperature"][0] == 99
+    # Solo queda la versión enlazada del año
+    cell_dir = os.path.dirname(store._year_dir(40.4, -3.7, 2023))
+    assert sorted(os.listdir(cell_dir))[0] == "2023" and len(os.listdir(cell_dir)) == 2
+
+
+def test_size_cap_evicts_least_recently_used_and_scans_only_when_exceeded(tmp_path, monkeypatch):
+    probe = ColumnarWeatherStore(str(tmp_path / "probe"), max_bytes=1 << 30)
+    probe.write(0.0, 0.0, 2000, year_arrays(0))
+    year_bytes = probe.stats()["bytes"]
+
+    store = ColumnarWeatherStore(str(tmp_path / "store"), max_bytes=int(2.5 * year_bytes))
+    scans = []
+    original = store._scan_and_evict
+    monkeypatch.setattr(store, "_scan_and_evict", lambda: scans.append(1) or original())
+
+    store.write(40.4, -3.7, 2021, year_arrays(1))
+    store.write(40.4, -3.7, 2022, year_arrays(2))
+    os.utime(store._year_dir(40.4, -3.7, 2021), (1, 1)) # 2021 es el menos usado
+    assert len(scans) == 1 # solo el recorrido inicial
+
+    store.write(40.4, -3.7, 2023, year_arrays(3))
+    assert len(scans) == 2
+    assert store.read(40.4, -3.7, 2021, VARIABLES) is None
+    assert store.read(40.4, -3.7, 2022, VARIABLES) is not None
+    assert store.stats()["evictions"] == 1 and store.stats()["bytes"] == 2 * year_bytes
+
+
+def test_rewrite_replaces_legacy_year_directory(tmp_path):
+    store = ColumnarWeatherStore(str(tmp_path), max_bytes=1 << 30)
+    legacy = store._year_dir(40.4, -3.7, 2023)
+    os.makedirs(legacy)
+    for name, values in year_arrays(1, hours=24).items():
+        np.save(os.path.join(legacy, f"{name}.npy"), values)
+    assert store.read(40.4, -3.7, 2023, VARIABLES)["temperature"][0] == 1
+
+    store.write(40.4, -3.7, 2023, year_arrays(2, hours=24))
+    assert os.path.islink(legacy)
+    assert store.read(40.4, -3.7, 2023, VARIABLES)["temperature"][0] == 2
+    assert len(os.listdir(os.path.dirname(legacy))) == 2
@@ -0,0 +1,56 @@
+import threading
+import time
+import pytest
+from etl import grid_index as grid_index_module
+from etl.grid_index import GridIndex
+
+
+def test_rejects_tolerance_larger_than_half_the_resolution():
+    with pytest.raises(ValueError):
+        GridIndex(resolution=0.1, tolerance=0.06)
+    GridIndex(resolution=0.1, tolerance=0.05)
+
+
+def test_concurrent_first_lookups_load_once(monkeypatch):
+    loads = []
+
+    def load_weather_cells():
+        loads.append(1)
+        time.sleep(0.05)
+        return [(40.4, -3.7), (41.4, 2.1)]
+
+    monkeypatch.setattr(grid_index_module.db, "load_weather_cells", load_weather_cells)
+    index = GridIndex(resolution=0.1, tolerance=0.05)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(index.snap(40.41, -3.71))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert loads == [1]
+    assert results == [(40.4, -3.7)] * 8
+
+
+def test_cells_registered_during_a_reload_are_kept(monkeypatch):
+    index = GridIndex(resolution=0.1, tolerance=0.05)
+
+    def load_weather_cells():
+        index.register(43.3, -8.4) # escrita en BD después de que empezara la consulta
+        return [(40.4, -3.7)]
+
+    monkeypatch.setattr(grid_index_module.db, "load_weather_cells", load_weather_cells)
+    assert index.snap(43.31, -8.41) == (43.3, -8.4)
+    assert index.snap(40.42, -3.69) == (40.4, -3.7)
+
+
+def test_high_latitude_matches_beyond_the_adjacent_bucket(monkeypatch):
+    # A 70º, 0.05º de tolerancia equivalen a ~0.146º de longitud: más que un cubo vecino
+    monkeypatch.setattr(grid_index_module.db, "load_weather_cells", lambda: [(70.0, 20.1)])
+    index = GridIndex(resolution=0.1, tolerance=0.05)
+    assert index.snap(70.0, 19.96) == (70.0, 20.1) # dos cubos a la izquierda
+    assert index.snap(70.0, 19.94) == (70.0, 19.9)
+
+
+def test_falls_back_to_the_regular_grid_cell(monkeypatch):
+    monkeypatch.setattr(grid_index_module.db, "load_weather_cells", lambda: [])
+    assert GridIndex(resolution=0.1, tolerance=0.05).snap(40.4168, -3.7038) == (40.4, -3.7)
@@ -0,0 +1,22 @@
+import numpy as np
+import pandas as pd
+import pytest
+from models.hydro import rolling_mean
+
+
+@pytest.mark.parametrize("window", [1, 2, 24, 120, 1000])
+def test_rolling_mean_matches_pandas(window):
+    values = np.random.default_rng(5).gamma(0.3, 2.0, 500)
+    expected = pd.Series(values).rolling(window=window, min_periods=1).mean().to_numpy()
+    np.testing.assert_allclose(rolling_mean(values, window), expected, rtol=1e-9, atol=1e-12)
+
+
+def test_rolling_mean_long_series_has_no_drift():
+    # Suma acumulada sobre varios años de horas: el error de redondeo debe seguir siendo despreciable
+    values = np.random.default_rng(6).gamma(0.3, 2.0, 3 * 8784) + 1e3
+    expected = pd.Series(values).rolling(window=120, min_periods=1).mean().to_numpy()
+    np.testing.assert_allclose(rolling_mean(values, 120), expected, rtol=1e-9)
+
+
+def test_rolling_mean_empty():
+    assert rolling_mean([], 24).shape == (0,)
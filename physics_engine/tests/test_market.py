@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+from models.market import MarketModel
+
+
+def reference_paths(model, num_paths, year, phi):
+    """Recurrencia AR(1) hora a hora (implementación directa) con el mismo generador."""
+    sigma = model.base_price * model.volatility
+    noise = model._rng(year).standard_normal((model.HOURS, num_paths))
+    noise[0] *= sigma
+    for t in range(1, model.HOURS):
+        noise[t] = phi * noise[t - 1] + np.sqrt(1.0 - phi ** 2) * sigma * noise[t]
+    return np.maximum(model.deterministic_curve(year) + noise.T, 0.0)
+
+
+@pytest.mark.parametrize("phi", [0.0, 0.5, 0.9, 0.999])
+@pytest.mark.parametrize("num_paths", [1, 37])
+def test_price_paths_match_hourly_recurrence(phi, num_paths):
+    model = MarketModel(base_price=60.0, volatility=0.3, seed=11)
+    paths = model.generate_price_paths(num_paths, year=2024, autocorrelation=phi)
+    assert paths.shape == (num_paths, 8760)
+    np.testing.assert_allclose(paths, reference_paths(model, num_paths, 2024, phi), rtol=1e-9, atol=1e-9)
+
+
+def test_price_paths_are_reproducible_with_a_seed():
+    a = MarketModel(seed=5).generate_price_paths(4, year=2023)
+    b = MarketModel(seed=5).generate_price_paths(4, year=2023)
+    np.testing.assert_array_equal(a, b)
+    assert not np.array_equal(a, MarketModel(seed=6).generate_price_paths(4, year=2023))
+
+
+def test_stationary_volatility_is_preserved():
+    model = MarketModel(base_price=50.0, volatility=0.2, seed=1)
+    noise = model.generate_price_paths(400, autocorrelation=0.9) - model.deterministic_curve()
+    # Sin recorte apreciable (precio medio 50, sigma 10): la desviación típica estacionaria es sigma
+    assert noise.std() == pytest.approx(10.0, rel=0.05)
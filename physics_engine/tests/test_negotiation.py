@@ -0,0 +1,130 @@
+import json
+import struct
+import numpy as np
+import pytest
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+from routers import negotiation
+from routers.negotiation import (NegotiatedRoute, encode_float32, encode_arrow, preferred_format, stream_rows,
+                                 ARROW_MEDIA_TYPE, FLOAT32_MEDIA_TYPE, JSON_MEDIA_TYPE)
+
+PAYLOAD = {
+    "annual_generation_kwh": 1234.5,
+    "monthly": np.arange(12, dtype=float) * 1.5,
+    "hourly": np.random.default_rng(0).random(8760),
+    "batch": np.arange(6, dtype=float).reshape(2, 3),
+    "meta": {"technology": "solar", "years": 3}
+}
+
+
+def decode_float32(body):
+    """Decodificador de referencia del formato application/x-float32-columns."""
+    (header_length,) = struct.unpack_from("<I", body)
+    header = json.loads(body[4:4 + header_length])
+    data = np.frombuffer(body, dtype="<f4", offset=4 + header_length)
+
+    def resolve(value):
+        if isinstance(value, dict) and "__array__" in value:
+            spec = value["__array__"]
+            size = int(np.prod(spec["shape"]))
+            return data[spec["offset"]:spec["offset"] + size].reshape(spec["shape"])
+        if isinstance(value, dict):
+            return {k: resolve(v) for k, v in value.items()}
+        return value
+
+    return resolve(header)
+
+
+def test_float32_round_trip():
+    decoded = decode_float32(encode_float32(PAYLOAD))
+    assert decoded["annual_generation_kwh"] == 1234.5
+    assert decoded["meta"] == PAYLOAD["meta"]
+    for field in ("monthly", "hourly", "batch"):
+        np.testing.assert_array_equal(decoded[field], PAYLOAD[field].astype(np.float32))
+
+
+def test_float32_data_is_aligned():
+    body = encode_float32({"a": np.ones(3), "b": "x"})
+    (header_length,) = struct.unpack_from("<I", body)
+    assert (4 + header_length) % 4 == 0
+
+
+def test_arrow_round_trip():
+    pa = pytest.importorskip("pyarrow")
+    table = pa.ipc.open_stream(encode_arrow(PAYLOAD)).read_all()
+    assert table.num_rows == 1
+    row = table.to_pylist()[0]
+    assert row["annual_generation_kwh"] == 1234.5
+    assert row["meta"] == PAYLOAD["meta"]
+    assert table.schema.field("hourly").type == pa.list_(pa.float32())
+    np.testing.assert_array_equal(np.asarray(row["hourly"], dtype=np.float32), PAYLOAD["hourly"].astype(np.float32))
+    np.testing.assert_array_equal(np.asarray(row["batch"], dtype=np.float32), PAYLOAD["batch"].astype(np.float32))
+
+
+def test_preferred_format_honours_q_values(monkeypatch):
+    assert preferred_format("") == "json"
+    assert preferred_format(f"{FLOAT32_MEDIA_TYPE}") == "float32"
+    assert preferred_format(f"{JSON_MEDIA_TYPE};q=0.5, {FLOAT32_MEDIA_TYPE}") == "float32"
+    assert preferred_format(f"{FLOAT32_MEDIA_TYPE};q=0.2, {JSON_MEDIA_TYPE}") == "json"
+    monkeypatch.setattr(negotiation, "pa", None)
+    assert preferred_format(ARROW_MEDIA_TYPE) is None
+    assert preferred_format(f"{ARROW_MEDIA_TYPE}, {FLOAT32_MEDIA_TYPE};q=0.5") == "float32"
+
+
+def make_client():
+    router = APIRouter(route_class=NegotiatedRoute)
+
+    @router.get("/result")
+    def get_result():
+        return PAYLOAD
+
+    @router.get("/stream")
+    def get_stream():
+        base = np.arange(4, dtype=float)
+        rows = (({"year": year}, base * (0.5 ** year)) for year in range(3))
+        return stream_rows({"years": 3}, "hourly", rows, (3, 4))
+
+    app = FastAPI()
+    app.include_router(router)
+    return TestClient(app)
+
+
+def test_negotiated_route_encodes_by_accept():
+    client = make_client()
+    as_json = client.get("/result").json()
+    assert as_json["monthly"] == PAYLOAD["monthly"].tolist()
+
+    response = client.get("/result", headers={"Accept": FLOAT32_MEDIA_TYPE})
+    assert response.headers["content-type"] == FLOAT32_MEDIA_TYPE and response.headers["vary"] == "Accept"
+    np.testing.assert_array_equal(decode_float32(response.content)["monthly"], PAYLOAD["monthly"].astype(np.float32))
+
+
+def test_json_is_rendered_without_the_default_encoder():
+    from routers.negotiation import negotiate
+    response = negotiate({"hourly": np.array([1.5, np.nan]), "name": "ñ"})
+    assert response.media_type == JSON_MEDIA_TYPE
+    assert json.loads(response.body) == {"hourly": [1.5, None], "name": "ñ"}
+
+
+def test_negotiated_route_answers_406_without_pyarrow(monkeypatch):
+    monkeypatch.setattr(negotiation, "pa", None)
+    assert make_client().get("/result", headers={"Accept": ARROW_MEDIA_TYPE}).status_code == 406
+
+
+def test_streamed_rows_round_trip():
+    client = make_client()
+    expected = np.arange(4, dtype=float) * (0.5 ** np.arange(3))[:, None]
+
+    decoded = decode_float32(client.get("/stream", headers={"Accept": FLOAT32_MEDIA_TYPE}).content)
+    assert decoded["years"] == 3
+    np.testing.assert_array_equal(decoded["hourly"], expected.astype(np.float32))
+
+    lines = client.get("/stream").text.splitlines()
+    assert json.loads(lines[0]) == {"years": 3}
+    assert [json.loads(line)["hourly"] for line in lines[1:]] == expected.tolist()
+
+    pa = pytest.importorskip("pyarrow")
+    table = pa.ipc.open_stream(client.get("/stream", headers={"Accept": ARROW_MEDIA_TYPE}).content).read_all()
+    assert json.loads(table.schema.metadata[b"header"]) == {"years": 3}
+    assert table.column("year").to_pylist() == [0, 1, 2]
+    np.testing.assert_array_equal(np.array(table.column("hourly").to_pylist(), dtype=np.float32), expected.astype(np.float32))
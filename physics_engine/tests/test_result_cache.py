@@ -0,0 +1,177 @@
+import asyncio
+import os
+import numpy as np
+import pytest
+from pydantic import BaseModel
+from typing import Dict
+from routers.result_cache import ResultCache, FINGERPRINT_SOURCES, skip_result_cache
+
+
+class Request(BaseModel):
+    latitude: float
+    capacity_kw: float
+    parameters: Dict = {}
+
+
+def result(n, value=1.0):
+    return {"hourly": np.full(n, value), "annual": float(value)}
+
+
+def test_key_is_stable_across_instances_and_canonical():
+    a = ResultCache(max_bytes=1 << 20, ttl_seconds=60)
+    b = ResultCache(max_bytes=1 << 20, ttl_seconds=60)
+    request = Request(latitude=40.4, capacity_kw=100, parameters={"tilt": 30, "azimuth": 180})
+    same = Request(latitude=40.4, capacity_kw=100.0, parameters={"azimuth": 180.0, "tilt": 30.0})
+    assert a.make_key("/solar", [request]) == b.make_key("/solar", [same])
+    assert len(a.make_key("/solar", [request])) == 64
+
+
+def test_large_seeds_do_not_collide():
+    cache = ResultCache(max_bytes=1 << 20, ttl_seconds=60)
+    seed = 2 ** 53
+    keys = {cache.make_key("/biomass/monte-carlo", [Request(latitude=40.4, capacity_kw=100, parameters={"seed": s})])
+            for s in (seed, seed + 1, 2 ** 63 - 1, 2 ** 63 - 2)}
+    assert len(keys) == 4
+    # Un float entero sigue equivaliendo a su int
+    assert (cache.make_key("/biomass", [Request(latitude=40.4, capacity_kw=100, parameters={"price_seed": 7})])
+            == cache.make_key("/biomass", [Request(latitude=40.4, capacity_kw=100, parameters={"price_seed": 7.0})]))
+
+
+def test_key_depends_on_endpoint_request_and_fingerprint():
+    cache = ResultCache(max_bytes=1 << 20, ttl_seconds=60)
+    request = Request(latitude=40.4, capacity_kw=100)
+    key = cache.make_key("/solar", [request])
+    assert key != cache.make_key("/wind", [request])
+    assert key != cache.make_key("/solar", [Request(latitude=40.4, capacity_kw=101)])
+    cache.fingerprint = "otra-version"
+    assert key != cache.make_key("/solar", [request])
+
+
+def test_put_get_returns_read_only_detached_copy():
+    cache = ResultCache(max_bytes=1 << 20, ttl_seconds=60)
+    original = result(10)
+    cache.put("k", original)
+    original["hourly"][0] = 99.0 # el llamador puede seguir usando su array
+    entry = cache.get("k")
+    assert entry.result["hourly"][0] == 1.0
+    with pytest.raises(ValueError):
+        entry.result["hourly"][0] = 5.0
+
+
+def test_ttl_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("routers.result_cache.time.monotonic", lambda: now[0])
+    cache = ResultCache(max_bytes=1 << 20, ttl_seconds=60)
+    cache.put("k", result(10))
+    now[0] += 61
+    assert cache.get("k") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_lru_eviction_by_bytes():
+    entry_bytes = ResultCache(max_bytes=1 << 20, ttl_seconds=60).put("x", result(1000)).nbytes
+    cache = ResultCache(max_bytes=2 * entry_bytes, ttl_seconds=60)
+    cache.put("a", result(1000))
+    cache.put("b", result(1000))
+    cache.get("a")
+    cache.put("c", result(1000))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_encodings_count_towards_the_budget():
+    cache = ResultCache(max_bytes=1 << 20, ttl_seconds=60)
+    entry = cache.put("k", result(10))
+    before = cache.stats()["bytes"]
+    body = entry.encoding("json", lambda r: b"x" * 500)
+    assert entry.encoding("json", lambda r: pytest.fail("se codifica una sola vez")) is body
+    assert cache.stats()["bytes"] == before + 500
+
+
+def test_disk_tier_survives_a_new_instance(tmp_path):
+    first = ResultCache(max_bytes=1 << 20, ttl_seconds=60, disk_dir=str(tmp_path), disk_max_bytes=1 << 20)
+    stored = {
+        **result(10, 3.0),
+        "dates": np.arange("2023-01", "2023-04", dtype="datetime64[M]"),
+        "batch": [{"tilt": 30, "monthly": np.arange(12.0)}],
+        "meta": {"technology": "solar", "seed": 2 ** 60}
+    }
+    first.put("ab" * 32, stored)
+    second = ResultCache(max_bytes=1 << 20, ttl_seconds=60, disk_dir=str(tmp_path), disk_max_bytes=1 << 20)
+    entry = second.get("ab" * 32)
+    assert entry is not None and entry.result["annual"] == 3.0
+    np.testing.assert_array_equal(entry.result["hourly"], stored["hourly"])
+    np.testing.assert_array_equal(entry.result["dates"], stored["dates"])
+    np.testing.assert_array_equal(entry.result["batch"][0]["monthly"], np.arange(12.0))
+    assert entry.result["meta"] == stored["meta"]
+    assert not entry.result["hourly"].flags.writeable
+    assert second.stats()["disk_hits"] == 1
+
+
+def test_disk_tier_never_unpickles(tmp_path):
+    import pickle
+
+    class Exploit:
+        def __reduce__(self):
+            return (os.system, ("touch " + str(tmp_path / "pwned"),))
+
+    cache = ResultCache(max_bytes=1 << 20, ttl_seconds=60, disk_dir=str(tmp_path), disk_max_bytes=1 << 20)
+    path = cache._disk_path("cd" * 32)
+    os.makedirs(os.path.dirname(path))
+    with open(path, "wb") as f:
+        pickle.dump(Exploit(), f)
+    assert cache.get("cd" * 32) is None
+    assert not (tmp_path / "pwned").exists()
+
+
+def test_fingerprint_covers_weather_assembly_and_unit_profiles():
+    sources = {source for source, _ in FINGERPRINT_SOURCES}
+    assert {"models", "etl", "routers/simulation.py", "routers/unit_profiles.py"} <= sources
+
+
+def test_cached_decorator_coalesces_and_honours_when():
+    cache = ResultCache(max_bytes=1 << 20, ttl_seconds=60)
+    calls = []
+
+    @cache.cached("/solar", when=lambda request: "seed" in request.parameters)
+    async def endpoint(request: Request):
+        calls.append(request.capacity_kw)
+        await asyncio.sleep(0.01)
+        return result(10, request.capacity_kw)
+
+    async def main():
+        seeded = Request(latitude=40.4, capacity_kw=5, parameters={"seed": 1})
+        first = await asyncio.gather(*(endpoint(seeded) for _ in range(3)))
+        again = await endpoint(seeded)
+        unseeded = await endpoint(Request(latitude=40.4, capacity_kw=7))
+        return first, again, unseeded
+
+    first, again, unseeded = asyncio.run(main())
+    assert calls == [5, 7] # una simulación para las 3 concurrentes + la repetida; la no cacheable aparte
+    assert all(entry is first[0] for entry in first) and again is first[0]
+    assert isinstance(unseeded, dict)
+
+
+def test_results_marked_with_skip_result_cache_are_not_stored(tmp_path):
+    cache = ResultCache(max_bytes=1 << 20, ttl_seconds=60, disk_dir=str(tmp_path), disk_max_bytes=1 << 20)
+
+    def degraded_weather():
+        skip_result_cache() # p.ej. clima de respaldo, marcado desde el threadpool
+        return result(10)
+
+    @cache.cached("/solar")
+    async def endpoint(request: Request):
+        return await asyncio.to_thread(degraded_weather)
+
+    @cache.cached("/wind")
+    def sync_endpoint(request: Request):
+        return degraded_weather()
+
+    request = Request(latitude=40.4, capacity_kw=5)
+    assert isinstance(asyncio.run(endpoint(request)), dict)
+    assert isinstance(sync_endpoint(request), dict)
+    assert cache.stats()["entries"] == 0
+    assert not any(tmp_path.iterdir())
+    # Fuera de un endpoint cacheado la marca no tiene efecto
+    skip_result_cache()
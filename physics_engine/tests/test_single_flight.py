@@ -0,0 +1,116 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from etl.single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def load():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "clima"
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        leader = executor.submit(flight.do, "celda", load)
+        started.wait(5)
+        followers = [executor.submit(flight.do, "celda", load) for _ in range(3)]
+        # Esperar a que los seguidores se hayan unido a la llamada en curso
+        while flight.stats()["coalesced"] < 3:
+            threading.Event().wait(0.001)
+        release.set()
+        results = [leader.result(5)] + [f.result(5) for f in followers]
+
+    assert results == ["clima"] * 4
+    assert calls == [1]
+    assert flight.stats() == {"leaders": 1, "coalesced": 3, "in_flight": 0}
+
+
+def test_key_is_released_after_completion():
+    flight = SingleFlight()
+    assert flight.do("k", lambda: 1) == 1
+    assert flight.do("k", lambda: 2) == 2
+    assert flight.stats()["leaders"] == 2
+
+
+def test_errors_propagate_to_leader_and_followers():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def load():
+        started.set()
+        release.wait(5)
+        raise RuntimeError("Open-Meteo caído")
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        leader = executor.submit(flight.do, "celda", load)
+        started.wait(5)
+        follower = executor.submit(flight.do, "celda", load)
+        while flight.stats()["coalesced"] < 1:
+            threading.Event().wait(0.001)
+        release.set()
+        for future in (leader, follower):
+            with pytest.raises(RuntimeError, match="Open-Meteo caído"):
+                future.result(5)
+
+    # Tras el error la clave queda libre: el siguiente intento vuelve a ejecutar la carga
+    assert flight.do("celda", lambda: "ok") == "ok"
+
+
+def test_async_coalescing_and_error_propagation():
+    flight = SingleFlight()
+    calls = []
+
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "clima"
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise ValueError("sin datos")
+
+    async def main():
+        results = await asyncio.gather(*(flight.do_async("celda", load) for _ in range(5)))
+        errors = await asyncio.gather(*(flight.do_async("otra", failing) for _ in range(3)), return_exceptions=True)
+        return results, errors
+
+    results, errors = asyncio.run(main())
+    assert results == ["clima"] * 5
+    assert calls == [1]
+    assert all(isinstance(e, ValueError) for e in errors)
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_sync_and_async_callers_share_the_same_call():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def load():
+        started.set()
+        release.wait(5)
+        return 42
+
+    async def follower():
+        return await flight.do_async("celda", lambda: asyncio.sleep(0, result=-1))
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        leader = executor.submit(flight.do, "celda", load)
+        started.wait(5)
+
+        async def main():
+            task = asyncio.ensure_future(follower())
+            await asyncio.sleep(0.01)
+            release.set()
+            return await task
+
+        assert asyncio.run(main()) == 42
+        assert leader.result(5) == 42
@@ -0,0 +1,110 @@
+import numpy as np
+import pytest
+from etl.weather_cache import WeatherCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr("etl.weather_cache.time.monotonic", clock)
+    return clock
+
+
+def arrays(n, value=1.0):
+    return {"temperature": np.full(n, value)}
+
+
+def test_fresh_hit_within_ttl(clock):
+    cache = WeatherCache(max_bytes=1 << 20, ttl_seconds=60, stale_seconds=0)
+    cache.put("k", arrays(10))
+    clock.now += 59
+    assert cache.get("k") is not None
+    assert cache.stats()["hits"] == 1
+
+
+def test_expired_entry_is_a_miss_and_removed(clock):
+    cache = WeatherCache(max_bytes=1 << 20, ttl_seconds=60, stale_seconds=0)
+    cache.put("k", arrays(10))
+    clock.now += 61
+    assert cache.get("k") is None
+    stats = cache.stats()
+    assert stats["misses"] == 1 and stats["entries"] == 0 and stats["bytes"] == 0
+
+
+def test_stale_entry_is_served_and_refreshed_once(clock):
+    cache = WeatherCache(max_bytes=1 << 20, ttl_seconds=60, stale_seconds=120)
+    cache.put("k", arrays(10, 1.0))
+    clock.now += 90
+    calls = []
+
+    def refresh():
+        calls.append(1)
+        return arrays(10, 2.0)
+
+    # Obsoleta pero servible: se devuelve el valor antiguo y se programa un solo refresco
+    assert cache.get("k", refresh=refresh)["temperature"][0] == 1.0
+    cache._executor.shutdown(wait=True)
+    assert calls == [1]
+    assert cache.get("k")["temperature"][0] == 2.0
+    stats = cache.stats()
+    assert stats["stale_hits"] == 1 and stats["refreshes"] == 1
+
+
+def test_refresh_errors_keep_serving_stale_value(clock):
+    cache = WeatherCache(max_bytes=1 << 20, ttl_seconds=60, stale_seconds=120)
+    cache.put("k", arrays(10))
+
+    def refresh():
+        raise RuntimeError("BD caída")
+
+    clock.now += 90
+    assert cache.get("k", refresh=refresh) is not None
+    cache._executor.shutdown(wait=True)
+    assert cache.stats()["refresh_errors"] == 1
+    assert cache.get("k") is not None
+
+
+def test_past_stale_window_is_a_miss(clock):
+    cache = WeatherCache(max_bytes=1 << 20, ttl_seconds=60, stale_seconds=120)
+    cache.put("k", arrays(10))
+    clock.now += 181
+    assert cache.get("k", refresh=lambda: arrays(10)) is None
+
+
+def test_lru_eviction_by_bytes(clock):
+    entry_bytes = arrays(100)["temperature"].nbytes
+    cache = WeatherCache(max_bytes=2 * entry_bytes, ttl_seconds=60, stale_seconds=0)
+    cache.put("a", arrays(100))
+    cache.put("b", arrays(100))
+    cache.get("a") # "a" pasa a ser la más reciente: se desaloja "b"
+    cache.put("c", arrays(100))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    stats = cache.stats()
+    assert stats["evictions"] == 1 and stats["bytes"] == 2 * entry_bytes
+
+
+def test_oversized_entry_is_not_stored(clock):
+    cache = WeatherCache(max_bytes=100, ttl_seconds=60, stale_seconds=0)
+    assert cache.put("k", arrays(100)) is False
+    assert cache.stats()["entries"] == 0
+
+
+def test_stored_arrays_are_read_only(clock):
+    cache = WeatherCache(max_bytes=1 << 20, ttl_seconds=60, stale_seconds=0)
+    cache.put("k", arrays(10))
+    with pytest.raises(ValueError):
+        cache.get("k")["temperature"][0] = 5.0
+
+
+def test_make_key_rounds_coordinates_and_sorts_variables():
+    assert (WeatherCache.make_key(40.41681, -3.70379, 2023, ["b", "a"])
+            == WeatherCache.make_key(40.4168, -3.7038, "2023", ("a", "b")))